@@ -0,0 +1,395 @@
+"""Almacén en memoria de la flota con índices primarios y secundarios."""
+import base64
+import binascii
+import heapq
+import json
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+
+def codificar_cursor(clave):
+    """Convierte una clave de orden en un token opaco para la URL."""
+    crudo = json.dumps(list(clave), separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(crudo).rstrip(b"=").decode()
+
+
+def decodificar_cursor(token, longitud=2):
+    """Inverso de ``codificar_cursor``; lanza ``ValueError`` si el token no es válido.
+
+    Las claves de orden son pares ((placa, id) o (fecha, id)): un token bien
+    formado con otro número de elementos también se rechaza.
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        clave = json.loads(crudo)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Cursor inválido") from exc
+    if not isinstance(clave, list) or len(clave) != longitud or not all(isinstance(c, str) for c in clave):
+        raise ValueError("Cursor inválido")
+    return tuple(clave)
+
+
+class IndiceOrdenado:
+    """Lista ordenada de claves con recorrido por rangos (keyset)."""
+
+    def __init__(self, claves=()):
+        self._claves = sorted(claves)
+
+    def __len__(self):
+        return len(self._claves)
+
+    def insertar(self, clave):
+        insort(self._claves, clave)
+
+    def insertar_varios(self, claves):
+        """Carga masiva: un solo ordenamiento en lugar de una inserción por clave."""
+        self._claves.extend(claves)
+        self._claves.sort()
+
+    def eliminar(self, clave):
+        posicion = bisect_left(self._claves, clave)
+        if posicion < len(self._claves) and self._claves[posicion] == clave:
+            del self._claves[posicion]
+
+    def recorrer(self, despues=None, descendente=False):
+        """Itera las claves estrictamente posteriores a ``despues`` en el sentido pedido."""
+        claves = self._claves
+        if descendente:
+            fin = bisect_left(claves, despues) if despues is not None else len(claves)
+            return (claves[i] for i in range(fin - 1, -1, -1))
+        inicio = bisect_right(claves, despues) if despues is not None else 0
+        return (claves[i] for i in range(inicio, len(claves)))
+
+
+class IndiceCombinado:
+    """Vista de varios ``IndiceOrdenado`` disjuntos como uno solo (mezcla ordenada)."""
+
+    def __init__(self, indices):
+        self._indices = indices
+
+    def __len__(self):
+        return sum(len(indice) for indice in self._indices)
+
+    def recorrer(self, despues=None, descendente=False):
+        return heapq.merge(*(i.recorrer(despues, descendente) for i in self._indices), reverse=descendente)
+
+
+def _paginar(claves, candidatos, total, resolver, despues, limite, predicado, descendente, indice):
+    """Toma ``limite`` registros tras ``despues`` y devuelve ``(registros, clave_siguiente)``.
+
+    Si los candidatos son pocos se ordenan directamente; si son muchos
+    conviene recorrer el índice ordenado saltando los que no pertenecen.
+    """
+    if candidatos is not None and len(candidatos) ** 2 < (limite + 1) * total:
+        seleccion = [claves(i) for i in candidatos]
+        if despues is not None:
+            seleccion = [c for c in seleccion if (c < despues if descendente else c > despues)]
+        if predicado is None:
+            seleccion = (heapq.nlargest if descendente else heapq.nsmallest)(limite + 1, seleccion)
+        else:
+            seleccion.sort(reverse=descendente)
+    else:
+        seleccion = indice.recorrer(despues, descendente)
+        if candidatos is not None:
+            seleccion = (c for c in seleccion if c[-1] in candidatos)
+    registros = (resolver(c[-1]) for c in seleccion)
+    if predicado is not None:
+        registros = filter(predicado, registros)
+    pagina = list(islice(registros, limite + 1))
+    if len(pagina) <= limite:
+        return pagina, None
+    pagina.pop()
+    return pagina, pagina[-1]
+
+
+class AlmacenFlota:
+    """Repositorio de vehículos indexado por id, placa, estado, tipo y unidad.
+
+    Toda mutación debe pasar por ``agregar``/``actualizar``/``eliminar`` para
+    que los índices sigan siendo consistentes. Los registros se reemplazan
+    (copy-on-write) en cada actualización, así que los diccionarios
+    entregados a los consumidores nunca cambian bajo sus pies.
+    """
+
+    CAMPOS_INDEXADOS = ("estado", "tipo", "unidad_operativa")
+
+    def __init__(self, vehiculos=()):
+        self._por_id = {}
+        self._id_por_placa = {}
+        # Orden estable (placa, id) para la paginación por cursor
+        self._orden = IndiceOrdenado()
+        # campo -> valor normalizado -> set(ids)
+        self._indices = {campo: {} for campo in self.CAMPOS_INDEXADOS}
+        self._suscriptores = []
+        self.agregar_varios(vehiculos)
+
+    # ---------- Lectura ----------
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def __iter__(self):
+        return iter(self._por_id.values())
+
+    def __contains__(self, vehiculo_id):
+        return vehiculo_id in self._por_id
+
+    def obtener(self, vehiculo_id):
+        return self._por_id.get(vehiculo_id)
+
+    def obtener_por_placa(self, placa):
+        vehiculo_id = self._id_por_placa.get(placa.upper())
+        return self._por_id.get(vehiculo_id) if vehiculo_id else None
+
+    def valores(self, campo):
+        """Valores distintos de un campo indexado."""
+        return list(self._indices[campo])
+
+    def conteos(self, campo):
+        """``valor normalizado -> cantidad`` de vehículos para un campo indexado."""
+        return {valor: len(ids) for valor, ids in self._indices[campo].items()}
+
+    def candidatos(self, estado=None, tipo=None, unidad=None, ids=None):
+        """Ids que cumplen los filtros, o ``None`` si no hay filtros.
+
+        ``estado`` y ``tipo`` son coincidencias exactas sin distinguir
+        mayúsculas; ``unidad`` es una subcadena, resuelta sobre los pocos
+        valores distintos del índice y no sobre cada vehículo. ``ids`` es
+        un conjunto ya resuelto por otro índice (p. ej. la búsqueda de texto).
+        """
+        listas = [] if ids is None else [ids]
+        if estado:
+            listas.append(self._indices["estado"].get(estado.lower(), set()))
+        if tipo:
+            listas.append(self._indices["tipo"].get(tipo.lower(), set()))
+        if unidad:
+            unidad = unidad.lower()
+            coincidencias = [ids for valor, ids in self._indices["unidad_operativa"].items() if unidad in valor]
+            listas.append(set().union(*coincidencias) if len(coincidencias) != 1 else coincidencias[0])
+        if not listas:
+            return None
+        listas.sort(key=len)
+        return listas[0].intersection(*listas[1:])
+
+    @staticmethod
+    def clave_orden(vehiculo):
+        return (vehiculo["placa"], vehiculo["id"])
+
+    def buscar(self, estado=None, tipo=None, unidad=None, ids=None, predicado=None, limite=50, despues=None):
+        """Página de vehículos filtrados en orden (placa, id).
+
+        Devuelve ``(vehiculos, cursor_siguiente)``; el cursor es la clave
+        del último vehículo entregado o ``None`` si no quedan más.
+        """
+        ids = self.candidatos(estado=estado, tipo=tipo, unidad=unidad, ids=ids)
+        pagina, ultimo = _paginar(
+            lambda i: self.clave_orden(self._por_id[i]), ids, len(self._por_id),
+            self._por_id.__getitem__, despues, limite, predicado, False, self._orden,
+        )
+        return pagina, (self.clave_orden(ultimo) if ultimo else None)
+
+    # ---------- Escritura ----------
+
+    def suscribir(self, funcion):
+        """Registra ``funcion(anterior, nuevo)`` para cada mutación.
+
+        ``anterior`` es ``None`` en una inserción y ``nuevo`` es ``None``
+        en una eliminación.
+        """
+        self._suscriptores.append(funcion)
+
+    def agregar(self, vehiculo):
+        self._insertar(vehiculo)
+        self._orden.insertar(self.clave_orden(vehiculo))
+        self._notificar(None, vehiculo)
+        return vehiculo
+
+    def agregar_varios(self, vehiculos):
+        """Carga masiva; el índice ordenado se reconstruye una sola vez."""
+        nuevos = [self._insertar(v) for v in vehiculos]
+        self._orden.insertar_varios(self.clave_orden(v) for v in nuevos)
+        for vehiculo in nuevos:
+            self._notificar(None, vehiculo)
+        return nuevos
+
+    def actualizar(self, vehiculo_id, cambios):
+        anterior = self._por_id.get(vehiculo_id)
+        if anterior is None:
+            raise KeyError(vehiculo_id)
+        if "id" in cambios and cambios["id"] != vehiculo_id:
+            raise ValueError("No se puede cambiar el id de un vehículo")
+        nuevo = {**anterior, **cambios}
+        placa = nuevo["placa"].upper()
+        if placa != anterior["placa"].upper() and placa in self._id_por_placa:
+            raise ValueError(f"Placa duplicada: {nuevo['placa']}")
+        self._desindexar(anterior)
+        self._por_id[vehiculo_id] = nuevo
+        self._indexar(nuevo)
+        if self.clave_orden(nuevo) != self.clave_orden(anterior):
+            self._orden.eliminar(self.clave_orden(anterior))
+            self._orden.insertar(self.clave_orden(nuevo))
+        self._notificar(anterior, nuevo)
+        return nuevo
+
+    def cargar(self, vehiculos):
+        """Reemplaza el contenido completo (p. ej. al hidratar desde la base)."""
+        for vehiculo_id in list(self._por_id):
+            self.eliminar(vehiculo_id)
+        return self.agregar_varios(vehiculos)
+
+    def eliminar(self, vehiculo_id):
+        anterior = self._por_id.get(vehiculo_id)
+        if anterior is None:
+            raise KeyError(vehiculo_id)
+        self._desindexar(anterior)
+        self._orden.eliminar(self.clave_orden(anterior))
+        del self._por_id[vehiculo_id]
+        self._notificar(anterior, None)
+        return anterior
+
+    # ---------- Internos ----------
+
+    def _insertar(self, vehiculo):
+        vehiculo_id = vehiculo["id"]
+        if vehiculo_id in self._por_id:
+            raise ValueError(f"Vehículo duplicado: {vehiculo_id}")
+        if vehiculo["placa"].upper() in self._id_por_placa:
+            raise ValueError(f"Placa duplicada: {vehiculo['placa']}")
+        self._por_id[vehiculo_id] = vehiculo
+        self._indexar(vehiculo)
+        return vehiculo
+
+    def _indexar(self, vehiculo):
+        vehiculo_id = vehiculo["id"]
+        self._id_por_placa[vehiculo["placa"].upper()] = vehiculo_id
+        for campo, indice in self._indices.items():
+            indice.setdefault(vehiculo[campo].lower(), set()).add(vehiculo_id)
+
+    def _desindexar(self, vehiculo):
+        vehiculo_id = vehiculo["id"]
+        del self._id_por_placa[vehiculo["placa"].upper()]
+        for campo, indice in self._indices.items():
+            clave = vehiculo[campo].lower()
+            ids = indice[clave]
+            ids.discard(vehiculo_id)
+            if not ids:
+                del indice[clave]
+
+    def _notificar(self, anterior, nuevo):
+        for funcion in self._suscriptores:
+            funcion(anterior, nuevo)
+
+
+class AlmacenAlertas:
+    """Alertas indexadas por id y ordenadas por (fecha, id), más recientes primero.
+
+    Además del orden global hay un índice ordenado por cada combinación
+    (severidad, atendida): un listado filtrado recorre solo los grupos
+    que coinciden (mezclándolos si son varios) en lugar de filtrar todas
+    las alertas.
+    """
+
+    def __init__(self, alertas=()):
+        self._por_id = {}
+        grupos = {}
+        for alerta in alertas:
+            if alerta["id"] in self._por_id:
+                raise ValueError(f"Alerta duplicada: {alerta['id']}")
+            self._por_id[alerta["id"]] = alerta
+            grupos.setdefault(self.grupo(alerta), []).append(self.clave_orden(alerta))
+        self._orden = IndiceOrdenado(self.clave_orden(a) for a in self._por_id.values())
+        self._grupos = {grupo: IndiceOrdenado(claves) for grupo, claves in grupos.items()}
+        self._suscriptores = []
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def __iter__(self):
+        return iter(self._por_id.values())
+
+    def obtener(self, alerta_id):
+        return self._por_id.get(alerta_id)
+
+    @staticmethod
+    def clave_orden(alerta):
+        return (alerta["fecha"], alerta["id"])
+
+    @staticmethod
+    def grupo(alerta):
+        return (alerta["severidad"], alerta["atendida"])
+
+    def suscribir(self, funcion):
+        """Registra ``funcion(anterior, nuevo)`` como en ``AlmacenFlota.suscribir``."""
+        self._suscriptores.append(funcion)
+
+    def agregar(self, alerta):
+        if alerta["id"] in self._por_id:
+            raise ValueError(f"Alerta duplicada: {alerta['id']}")
+        self._por_id[alerta["id"]] = alerta
+        self._orden.insertar(self.clave_orden(alerta))
+        self._agrupar(alerta)
+        self._notificar(None, alerta)
+        return alerta
+
+    def actualizar(self, alerta_id, cambios):
+        anterior = self._por_id.get(alerta_id)
+        if anterior is None:
+            raise KeyError(alerta_id)
+        nuevo = {**anterior, **cambios}
+        self._por_id[alerta_id] = nuevo
+        if self.clave_orden(nuevo) != self.clave_orden(anterior):
+            self._orden.eliminar(self.clave_orden(anterior))
+            self._orden.insertar(self.clave_orden(nuevo))
+        if self.clave_orden(nuevo) != self.clave_orden(anterior) or self.grupo(nuevo) != self.grupo(anterior):
+            self._desagrupar(anterior)
+            self._agrupar(nuevo)
+        self._notificar(anterior, nuevo)
+        return nuevo
+
+    def eliminar(self, alerta_id):
+        anterior = self._por_id.pop(alerta_id, None)
+        if anterior is None:
+            raise KeyError(alerta_id)
+        self._orden.eliminar(self.clave_orden(anterior))
+        self._desagrupar(anterior)
+        self._notificar(anterior, None)
+        return anterior
+
+    def cargar(self, alertas):
+        """Reemplaza el contenido completo (p. ej. al hidratar desde la base)."""
+        for alerta_id in list(self._por_id):
+            self.eliminar(alerta_id)
+        for alerta in alertas:
+            self.agregar(alerta)
+
+    def buscar(self, severidad=None, atendida=None, limite=50, despues=None):
+        """Página de alertas filtradas; devuelve ``(alertas, cursor_siguiente)``."""
+        if severidad is None and atendida is None:
+            indice = self._orden
+        else:
+            indice = IndiceCombinado([
+                claves for (s, a), claves in self._grupos.items()
+                if (severidad is None or s == severidad) and (atendida is None or a == atendida)
+            ])
+        pagina, ultimo = _paginar(
+            None, None, len(self._por_id), self._por_id.__getitem__,
+            despues, limite, None, True, indice,
+        )
+        return pagina, (self.clave_orden(ultimo) if ultimo else None)
+
+    def conteos(self):
+        """``(severidad, atendida) -> cantidad`` a partir de los índices por grupo."""
+        return {grupo: len(claves) for grupo, claves in self._grupos.items()}
+
+    def _agrupar(self, alerta):
+        indice = self._grupos.get(self.grupo(alerta))
+        if indice is None:
+            indice = self._grupos[self.grupo(alerta)] = IndiceOrdenado()
+        indice.insertar(self.clave_orden(alerta))
+
+    def _desagrupar(self, alerta):
+        self._grupos[self.grupo(alerta)].eliminar(self.clave_orden(alerta))
+
+    def _notificar(self, anterior, nuevo):
+        for funcion in self._suscriptores:
+            funcion(anterior, nuevo)
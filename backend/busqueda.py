@@ -0,0 +1,164 @@
+"""Índice de n-gramas para la búsqueda de texto sobre la flota."""
+import unicodedata
+from functools import lru_cache
+from itertools import chain
+
+from almacen import IndiceOrdenado
+
+CAMPOS_BUSQUEDA = ("placa", "marca_modelo", "responsable")
+LONGITUD_GRAMA = 3
+
+
+@lru_cache(maxsize=4096)
+def _sin_tildes(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: "Núñez" -> "nunez"."""
+    if texto.isascii():
+        return texto.lower()
+    return _sin_tildes(texto)
+
+
+def compactar_placa(placa):
+    """Placa normalizada solo con letras y dígitos: "GSA-1234" -> "gsa1234"."""
+    return "".join(filter(str.isalnum, normalizar(placa)))
+
+
+def gramas(texto):
+    """Todos los n-gramas de longitud 1 a ``LONGITUD_GRAMA`` del texto."""
+    return {
+        texto[i:i + n]
+        for n in range(1, LONGITUD_GRAMA + 1)
+        for i in range(len(texto) - n + 1)
+    }
+
+
+class IndiceBusqueda:
+    """Índice invertido de n-gramas sobre placa, marca/modelo y responsable.
+
+    Se indexan los valores distintos (términos) y no cada vehículo: la
+    marca y el responsable se repiten en toda la flota, así que el índice
+    crece con el número de placas y no con campos × vehículos. Las
+    consultas de hasta tres caracteres se responden con una sola lista de
+    postings; las más largas intersectan sus trigramas y verifican la
+    subcadena solo sobre los términos sobrevivientes.
+    """
+
+    def __init__(self, vehiculos=()):
+        self._vehiculos_por_termino = {}
+        self._terminos_por_grama = {}
+        self._terminos_por_vehiculo = {}
+        self._placas = IndiceOrdenado()
+        self._placa_por_vehiculo = {}
+        self._vehiculo_por_placa = {}
+        for vehiculo in vehiculos:
+            self._indexar(vehiculo)
+        self._placas.insertar_varios(c for _, c in self._placa_por_vehiculo.values())
+
+    def __len__(self):
+        return len(self._terminos_por_vehiculo)
+
+    # ---------- Mantenimiento incremental ----------
+
+    def agregar(self, vehiculo):
+        self._placas.insertar(self._indexar(vehiculo))
+
+    def _indexar(self, vehiculo):
+        vehiculo_id = vehiculo["id"]
+        terminos = tuple({normalizar(vehiculo[campo]) for campo in CAMPOS_BUSQUEDA})
+        self._terminos_por_vehiculo[vehiculo_id] = terminos
+        for termino in terminos:
+            ids = self._vehiculos_por_termino.get(termino)
+            if ids is None:
+                ids = self._vehiculos_por_termino[termino] = set()
+                for grama in gramas(termino):
+                    self._terminos_por_grama.setdefault(grama, set()).add(termino)
+            ids.add(vehiculo_id)
+        placa = normalizar(vehiculo["placa"])
+        clave = (compactar_placa(placa), vehiculo_id)
+        self._placa_por_vehiculo[vehiculo_id] = (placa, clave)
+        self._vehiculo_por_placa[placa] = vehiculo_id
+        return clave
+
+    def eliminar(self, vehiculo_id):
+        for termino in self._terminos_por_vehiculo.pop(vehiculo_id, ()):
+            ids = self._vehiculos_por_termino[termino]
+            ids.discard(vehiculo_id)
+            if not ids:
+                del self._vehiculos_por_termino[termino]
+                for grama in gramas(termino):
+                    terminos = self._terminos_por_grama[grama]
+                    terminos.discard(termino)
+                    if not terminos:
+                        del self._terminos_por_grama[grama]
+        if vehiculo_id in self._placa_por_vehiculo:
+            placa, clave = self._placa_por_vehiculo.pop(vehiculo_id)
+            del self._vehiculo_por_placa[placa]
+            self._placas.eliminar(clave)
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de ``AlmacenFlota``: reindexa solo si cambió un campo buscable."""
+        if anterior is not None and nuevo is not None and all(
+            anterior[campo] == nuevo[campo] for campo in CAMPOS_BUSQUEDA
+        ):
+            return
+        if anterior is not None:
+            self.eliminar(anterior["id"])
+        if nuevo is not None:
+            self.agregar(nuevo)
+
+    # ---------- Consultas ----------
+
+    def _terminos(self, consulta):
+        if len(consulta) <= LONGITUD_GRAMA:
+            return self._terminos_por_grama.get(consulta, ())
+        postings = []
+        for i in range(len(consulta) - LONGITUD_GRAMA + 1):
+            terminos = self._terminos_por_grama.get(consulta[i:i + LONGITUD_GRAMA])
+            if not terminos:
+                return ()
+            postings.append(terminos)
+        postings.sort(key=len)
+        candidatos = postings[0].intersection(*postings[1:])
+        return [t for t in candidatos if consulta in t]
+
+    def buscar(self, texto):
+        """Ids de vehículos cuyo campo buscable contiene ``texto`` como subcadena."""
+        consulta = normalizar(texto.strip())
+        if not consulta:
+            return None
+        conjuntos = [self._vehiculos_por_termino[t] for t in self._terminos(consulta)]
+        if len(conjuntos) == 1:
+            return conjuntos[0]
+        return set(chain.from_iterable(conjuntos))
+
+    def autocompletar_placa(self, prefijo, limite=10):
+        """Ids de vehículos por placa: coincidencia exacta, prefijo y luego subcadena.
+
+        El prefijo ignora guiones y tildes ("gsa1" encuentra "GSA-1234"), se
+        resuelve con una búsqueda binaria sobre las placas ordenadas y solo
+        si no alcanza el límite se completa con coincidencias internas de
+        placa, ordenadas por la posición donde aparece el texto.
+        """
+        consulta = compactar_placa(prefijo)
+        if not consulta:
+            return []
+        resultado = []
+        for placa, vehiculo_id in self._placas.recorrer((consulta,)):
+            if not placa.startswith(consulta) or len(resultado) >= limite:
+                break
+            resultado.append(vehiculo_id)
+        texto = normalizar(prefijo.strip())
+        if len(resultado) < limite and len(texto) > 1:
+            vistos = set(resultado)
+            internos = []
+            for termino in self._terminos(texto):
+                vehiculo_id = self._vehiculo_por_placa.get(termino)
+                if vehiculo_id is not None and vehiculo_id not in vistos:
+                    internos.append((termino.find(texto), termino, vehiculo_id))
+            internos.sort()
+            resultado.extend(i for _, _, i in internos[:limite - len(resultado)])
+        return resultado
@@ -0,0 +1,86 @@
+"""Caché en proceso de respuestas JSON ya serializadas, invalidada por versiones de colección."""
+from collections import OrderedDict
+
+
+class CacheRespuestas:
+    """LRU de ``clave -> (versiones, bytes, cabeceras, variantes)`` acotada en entradas y en bytes.
+
+    Una entrada solo es válida mientras las versiones de las colecciones
+    de las que depende (``RegistroVersiones.version``) sigan siendo las
+    mismas con que se guardó: una mutación incrementa la versión y la
+    entrada se descarta en la siguiente lectura, sin invalidación explícita.
+
+    ``variantes`` guarda junto a los bytes originales sus versiones
+    comprimidas (``codificacion -> bytes``), calculadas la primera vez que
+    se piden: cada versión de los datos se comprime una sola vez.
+    """
+
+    def __init__(self, max_entradas=512, max_bytes=32 * 1024 * 1024):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._entradas = OrderedDict()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave, versiones):
+        """``(contenido, cabeceras)`` si hay una entrada vigente, si no ``None``."""
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada[0] == versiones:
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1], entrada[2]
+        if entrada is not None:
+            self._quitar(clave)
+        self.fallos += 1
+        return None
+
+    def guardar(self, clave, versiones, contenido, cabeceras=None):
+        if len(contenido) > self.max_bytes:
+            return
+        if clave in self._entradas:
+            self._quitar(clave)
+        self._entradas[clave] = (versiones, contenido, cabeceras or {}, {})
+        self.bytes += len(contenido)
+        self._ajustar()
+
+    def variante(self, clave, codificacion, calcular):
+        """Bytes de ``clave`` codificados con ``codificacion``; ``calcular()`` solo si aún no están."""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return calcular()
+        variantes = entrada[3]
+        contenido = variantes.get(codificacion)
+        if contenido is None:
+            contenido = variantes[codificacion] = calcular()
+            self.bytes += len(contenido)
+            self._ajustar()
+        return contenido
+
+    def _ajustar(self):
+        while len(self._entradas) > self.max_entradas or self.bytes > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+            self.desalojos += 1
+
+    def limpiar(self):
+        self._entradas.clear()
+        self.bytes = 0
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self.bytes,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+        }
+
+    def _quitar(self, clave):
+        _, contenido, _, variantes = self._entradas.pop(clave)
+        self.bytes -= len(contenido) + sum(map(len, variantes.values()))
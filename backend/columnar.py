@@ -0,0 +1,142 @@
+"""Réplica columnar (struct-of-arrays) de la flota para estadísticas vectorizadas."""
+import numpy as np
+
+COLUMNAS_CATEGORICAS = ("estado", "tipo", "unidad_operativa")
+COLUMNAS_NUMERICAS = {
+    "kilometraje": np.int64,
+    "consumo_promedio": np.float64,
+    "nivel_combustible": np.int32,
+    "tanque_capacidad": np.int32,
+}
+
+
+class Categorias:
+    """Diccionario valor <-> código entero, en orden de aparición."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def codigo(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def buscar(self, valor):
+        return self._codigos.get(valor)
+
+
+class FlotaColumnar:
+    """Columnas NumPy densas sincronizadas con ``AlmacenFlota``.
+
+    Las filas activas ocupan siempre ``[0, n)``: al eliminar un vehículo
+    la última fila se mueve al hueco, así las reducciones trabajan sobre
+    vistas sin máscaras ni copias.
+    """
+
+    def __init__(self, vehiculos=(), capacidad=1024):
+        vehiculos = list(vehiculos)
+        capacidad = max(capacidad, len(vehiculos))
+        self.n = 0
+        self.categorias = {columna: Categorias() for columna in COLUMNAS_CATEGORICAS}
+        self._columnas = {columna: np.zeros(capacidad, np.int32) for columna in COLUMNAS_CATEGORICAS}
+        self._columnas.update(
+            {columna: np.zeros(capacidad, tipo) for columna, tipo in COLUMNAS_NUMERICAS.items()}
+        )
+        self._fila_por_id = {}
+        self._id_por_fila = []
+        self._cargar(vehiculos)
+
+    def __len__(self):
+        return self.n
+
+    def columna(self, nombre):
+        """Vista de solo lectura de las filas activas."""
+        vista = self._columnas[nombre][:self.n]
+        vista.flags.writeable = False
+        return vista
+
+    # ---------- Mantenimiento ----------
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de ``AlmacenFlota``."""
+        if nuevo is None:
+            self._eliminar(anterior["id"])
+        elif anterior is None:
+            self._agregar(nuevo)
+        else:
+            self._escribir(self._fila_por_id[nuevo["id"]], nuevo)
+
+    def _cargar(self, vehiculos):
+        n = len(vehiculos)
+        for columna in COLUMNAS_CATEGORICAS:
+            codigo = self.categorias[columna].codigo
+            self._columnas[columna][:n] = [codigo(v[columna]) for v in vehiculos]
+        for columna in COLUMNAS_NUMERICAS:
+            self._columnas[columna][:n] = [v[columna] for v in vehiculos]
+        self._id_por_fila = [v["id"] for v in vehiculos]
+        self._fila_por_id = {vehiculo_id: fila for fila, vehiculo_id in enumerate(self._id_por_fila)}
+        self.n = n
+
+    def _agregar(self, vehiculo):
+        if self.n == len(self._columnas["kilometraje"]):
+            for columna, arreglo in self._columnas.items():
+                self._columnas[columna] = np.concatenate([arreglo, np.zeros_like(arreglo)])
+        fila = self.n
+        self.n += 1
+        self._fila_por_id[vehiculo["id"]] = fila
+        self._id_por_fila.append(vehiculo["id"])
+        self._escribir(fila, vehiculo)
+
+    def _escribir(self, fila, vehiculo):
+        for columna in COLUMNAS_CATEGORICAS:
+            self._columnas[columna][fila] = self.categorias[columna].codigo(vehiculo[columna])
+        for columna in COLUMNAS_NUMERICAS:
+            self._columnas[columna][fila] = vehiculo[columna]
+
+    def _eliminar(self, vehiculo_id):
+        fila = self._fila_por_id.pop(vehiculo_id)
+        ultima = self.n - 1
+        if fila != ultima:
+            for arreglo in self._columnas.values():
+                arreglo[fila] = arreglo[ultima]
+            movido = self._id_por_fila[ultima]
+            self._id_por_fila[fila] = movido
+            self._fila_por_id[movido] = fila
+        self._id_por_fila.pop()
+        self.n = ultima
+
+    # ---------- Consultas vectorizadas ----------
+
+    def contar_por(self, columna):
+        """Conteo por categoría con un solo ``bincount``, omitiendo las vacías."""
+        categorias = self.categorias[columna]
+        cantidades = np.bincount(self.columna(columna), minlength=len(categorias))
+        return [(categorias.valores[c], int(cantidades[c])) for c in np.flatnonzero(cantidades)]
+
+    def contar(self, columna, valor):
+        codigo = self.categorias[columna].buscar(valor)
+        if codigo is None:
+            return 0
+        return int(np.count_nonzero(self.columna(columna) == codigo))
+
+    def suma(self, columna):
+        return self.columna(columna).sum().item()
+
+    def distribucion(self, columna, percentiles=(50, 90, 95, 99)):
+        """Mínimo, máximo, media y percentiles de una columna numérica."""
+        valores = self.columna(columna)
+        if not self.n:
+            return None
+        calculados = np.percentile(valores, percentiles)
+        return {
+            "minimo": valores.min().item(),
+            "maximo": valores.max().item(),
+            "promedio": round(float(valores.mean()), 2),
+            "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(percentiles, calculados)},
+        }
@@ -0,0 +1,159 @@
+"""Compresión gzip/brotli negociada con ``Accept-Encoding``."""
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+# En orden de preferencia cuando el cliente acepta varias con el mismo peso
+CODIFICACIONES = ("br", "gzip") if brotli is not None else ("gzip",)
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+def elegir_codificacion(aceptadas):
+    """Codificación preferida según el ``Accept-Encoding`` (con pesos ``q``), o ``None``."""
+    if not aceptadas:
+        return None
+    pesos = {}
+    for parte in aceptadas.split(","):
+        nombre, _, parametros = parte.partition(";")
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nombre.strip().lower()] = peso
+    comodin = pesos.get("*", 0.0)
+    candidatas = [c for c in CODIFICACIONES if pesos.get(c, comodin) > 0]
+    return max(candidatas, key=lambda c: pesos.get(c, comodin), default=None)
+
+
+def comprimir(contenido, codificacion, nivel=None):
+    """Compresión de un cuerpo completo; ``nivel`` por defecto es el máximo razonable para guardar."""
+    if codificacion == "br":
+        return brotli.compress(contenido, quality=9 if nivel is None else nivel)
+    return gzip.compress(contenido, compresslevel=9 if nivel is None else nivel, mtime=0)
+
+
+def etiqueta_codificada(etag, codificacion):
+    """ETag propio de la representación comprimida (``"v-crc"`` -> ``"v-crc-br"``)."""
+    if etag and etag.endswith('"'):
+        return f'{etag[:-1]}-{codificacion}"'
+    return etag
+
+
+def etiqueta_base(etag):
+    """Inverso de ``etiqueta_codificada``, para comparar un ``If-None-Match``."""
+    for codificacion in ("br", "gzip"):
+        sufijo = f'-{codificacion}"'
+        if etag.endswith(sufijo):
+            return etag[:-len(sufijo)] + '"'
+    return etag
+
+
+def cabeceras_codificadas(cabeceras, codificacion, longitud):
+    """Cabeceras de una respuesta comprimida a partir de las de la original."""
+    resultado = {k: v for k, v in cabeceras.items() if k.lower() not in ("content-length", "etag")}
+    etag = next((v for k, v in cabeceras.items() if k.lower() == "etag"), None)
+    if etag:
+        resultado["ETag"] = etiqueta_codificada(etag, codificacion)
+    resultado["Content-Encoding"] = codificacion
+    resultado["Content-Length"] = str(longitud)
+    resultado["Vary"] = "Accept-Encoding"
+    return resultado
+
+
+class _Compresor:
+    """Compresor incremental que vacía su salida en cada trozo (para respuestas en streaming)."""
+
+    def __init__(self, codificacion, nivel):
+        self._brotli = codificacion == "br"
+        if self._brotli:
+            self._objeto = brotli.Compressor(quality=nivel)
+        else:
+            self._objeto = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def trozo(self, datos):
+        if self._brotli:
+            return self._objeto.process(datos) + self._objeto.flush()
+        return self._objeto.compress(datos) + self._objeto.flush(zlib.Z_SYNC_FLUSH)
+
+    def fin(self):
+        return self._objeto.finish() if self._brotli else self._objeto.flush()
+
+
+class MiddlewareCompresion:
+    """Middleware ASGI que comprime las respuestas de texto de al menos ``minimo`` bytes.
+
+    Las respuestas que ya traen ``Content-Encoding`` (p. ej. las servidas
+    comprimidas desde la caché) pasan intactas, igual que los eventos SSE,
+    que no deben quedar retenidos en el compresor. Las respuestas en
+    streaming se comprimen trozo a trozo.
+    """
+
+    def __init__(self, app, minimo=1024, nivel_gzip=6, calidad_brotli=4):
+        self.app = app
+        self.minimo = minimo
+        self.niveles = {"gzip": nivel_gzip, "br": calidad_brotli}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding"))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        nivel = self.niveles[codificacion]
+        inicio = None
+        compresor = None
+        pasar = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, pasar
+            if pasar:
+                await send(mensaje)
+                return
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                return
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+            if compresor is None:
+                cabeceras = MutableHeaders(raw=inicio["headers"])
+                tipo = cabeceras.get("content-type", "").split(";")[0].strip()
+                if (
+                    "content-encoding" in cabeceras
+                    or tipo not in TIPOS_COMPRIMIBLES
+                    or (not mas and len(cuerpo) < self.minimo)
+                ):
+                    pasar = True
+                    await send(inicio)
+                    await send(mensaje)
+                    return
+                if "etag" in cabeceras:
+                    cabeceras["ETag"] = etiqueta_codificada(cabeceras["etag"], codificacion)
+                cabeceras["Content-Encoding"] = codificacion
+                cabeceras.add_vary_header("Accept-Encoding")
+                if not mas:
+                    comprimido = comprimir(cuerpo, codificacion, nivel)
+                    cabeceras["Content-Length"] = str(len(comprimido))
+                    pasar = True
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                del cabeceras["content-length"]
+                compresor = _Compresor(codificacion, nivel)
+                await send(inicio)
+            datos = compresor.trozo(cuerpo) if cuerpo else b""
+            if not mas:
+                datos += compresor.fin()
+            await send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,150 @@
+"""Difusión de cambios de posición GPS por Server-Sent Events."""
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class Suscripcion:
+    """Un cliente conectado: su caja de interés y los cambios aún no enviados.
+
+    ``pendientes`` guarda a lo sumo un fragmento por vehículo; si el cliente
+    no alcanzó a leer un tick, el siguiente reemplaza las posiciones viejas
+    en lugar de encolarlas, así un consumidor lento nunca acumula retraso.
+
+    Con caja, ``dentro`` son las filas que el cliente tiene (las del evento
+    inicial más las que entraron): una fila que aparece en la caja se
+    anota en ``entradas`` y una que la abandona en ``salidas``.
+    """
+
+    def __init__(self, bbox=None):
+        self.bbox = bbox
+        self.dentro = set()
+        self.pendientes = {}
+        self.entradas = set()
+        self.salidas = {}
+        self.descartados = 0
+        self.evento = asyncio.Event()
+
+    def entregar(self, fragmentos, salidas=()):
+        for fila, fragmento in fragmentos:
+            if fila in self.pendientes or self.salidas.pop(fila, None) is not None:
+                self.descartados += 1
+            if self.bbox is not None and fila not in self.dentro:
+                self.dentro.add(fila)
+                self.entradas.add(fila)
+            self.pendientes[fila] = fragmento
+        for fila, vehiculo_id in salidas:
+            if self.pendientes.pop(fila, None) is not None:
+                self.descartados += 1
+            self.dentro.discard(fila)
+            if fila in self.entradas:
+                # Entró y salió sin que el cliente llegara a verla
+                self.entradas.discard(fila)
+            else:
+                self.salidas[fila] = vehiculo_id
+        self.evento.set()
+
+    def tomar(self):
+        """``(fragmentos, filas_entrantes, ids_salientes)`` pendientes desde la última lectura."""
+        entradas = self.entradas
+        fragmentos = [fragmento for fila, fragmento in self.pendientes.items() if fila not in entradas]
+        resultado = (fragmentos, sorted(entradas), list(self.salidas.values()))
+        self.pendientes, self.entradas, self.salidas = {}, set(), {}
+        self.evento.clear()
+        return resultado
+
+
+class DifusorGPS:
+    """Agrupa por tick las filas de telemetría que cambiaron y reparte deltas a cada suscripción.
+
+    Cada fragmento JSON se serializa una sola vez por tick y se comparte
+    entre todos los clientes cuya caja contiene la posición; a los que la
+    tenían dentro y ya no, se les anota la salida del vehículo.
+    """
+
+    def __init__(self, telemetria, intervalo=1.0):
+        self._telemetria = telemetria
+        self.intervalo = intervalo
+        self._cambiadas = set()
+        self._suscripciones = set()
+        self.secuencia = 0
+
+    def __len__(self):
+        return len(self._suscripciones)
+
+    def marcar(self, filas):
+        """Suscriptor de ``BufferTelemetria``."""
+        if self._suscripciones:
+            self._cambiadas.update(filas.tolist())
+
+    def suscribir(self, bbox=None):
+        suscripcion = Suscripcion(bbox)
+        self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        self._suscripciones.discard(suscripcion)
+
+    def fragmentos(self, filas):
+        """``[(fila, lng, lat, json)]`` de la última posición de cada fila."""
+        filas = np.fromiter(filas, np.int64, len(filas))
+        lat, lng, velocidad, marca_tiempo, hay_dato = self._telemetria.ultimas(filas)
+        resultado = []
+        for fila, la, ln, ve, ts, dato in zip(
+            filas.tolist(), lat.tolist(), lng.tolist(), velocidad.tolist(), marca_tiempo.tolist(), hay_dato.tolist()
+        ):
+            if not dato:
+                continue
+            fragmento = json.dumps({
+                "id": self._telemetria.vehiculo(fila),
+                "lat": la,
+                "lng": ln,
+                "velocidad": round(ve),
+                "ultimo_reporte": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            }, separators=(",", ":"))
+            resultado.append((fila, ln, la, fragmento))
+        return resultado
+
+    @staticmethod
+    def filtrar(fragmentos, bbox):
+        if bbox is None:
+            return [(fila, fragmento) for fila, _, _, fragmento in fragmentos]
+        oeste, sur, este, norte = bbox
+        return [
+            (fila, fragmento) for fila, lng, lat, fragmento in fragmentos
+            if oeste <= lng <= este and sur <= lat <= norte
+        ]
+
+    def tick(self):
+        """Envía a cada suscripción los cambios acumulados desde el tick anterior."""
+        if not self._cambiadas:
+            return 0
+        cambiadas, self._cambiadas = self._cambiadas, set()
+        fragmentos = self.fragmentos(cambiadas)
+        self.secuencia += 1
+        for suscripcion in self._suscripciones:
+            visibles = self.filtrar(fragmentos, suscripcion.bbox)
+            salidas = []
+            if suscripcion.bbox is not None and suscripcion.dentro:
+                adentro = {fila for fila, _ in visibles}
+                salidas = [
+                    (fila, self._telemetria.vehiculo(fila)) for fila, _, _, _ in fragmentos
+                    if fila in suscripcion.dentro and fila not in adentro
+                ]
+            if visibles or salidas:
+                suscripcion.entregar(visibles, salidas)
+        return len(fragmentos)
+
+    async def ejecutar(self):
+        """Bucle de ticks; se lanza como tarea de fondo al iniciar la aplicación."""
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Falló el tick de difusión GPS")
@@ -0,0 +1,133 @@
+"""Índice espacial de rejilla uniforme sobre la última posición de cada vehículo."""
+import math
+
+import numpy as np
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = 111.19
+
+
+def distancia_km(lat, lng, lats, lngs):
+    """Distancia haversine desde un punto a arreglos de puntos."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a))
+
+
+class IndiceEspacial:
+    """Rejilla de celdas de ``tam_celda`` grados con las filas de telemetría de cada una.
+
+    Se alimenta de los lotes ingeridos en ``BufferTelemetria`` y solo
+    toca las filas que cambiaron de celda. Las consultas visitan las
+    celdas que cubren el área pedida, de modo que su costo depende del
+    número de resultados y no del tamaño de la flota.
+    """
+
+    def __init__(self, telemetria, tam_celda=0.05):
+        self._telemetria = telemetria
+        self.tam_celda = tam_celda
+        self._columnas = math.ceil(360 / tam_celda)
+        self._celda_por_fila = np.full(1024, -1, np.int64)
+        self._filas_por_celda = {}
+
+    def __len__(self):
+        return len(self._filas_por_celda)
+
+    def _celdas(self, lat, lng):
+        fila = np.floor((np.asarray(lat) + 90) / self.tam_celda).astype(np.int64)
+        columna = np.floor((np.asarray(lng) + 180) / self.tam_celda).astype(np.int64)
+        return fila * self._columnas + columna
+
+    # ---------- Mantenimiento ----------
+
+    def sincronizar(self, filas):
+        """Suscriptor de ``BufferTelemetria``: reubica las filas cuya última posición cambió de celda."""
+        filas = np.asarray(filas, np.int64)
+        if not len(filas):
+            return
+        if filas.max() >= len(self._celda_por_fila):
+            nuevo = np.full(max(len(self._celda_por_fila) * 2, filas.max() + 1), -1, np.int64)
+            nuevo[:len(self._celda_por_fila)] = self._celda_por_fila
+            self._celda_por_fila = nuevo
+        lat, lng, _, _, hay_dato = self._telemetria.ultimas(filas)
+        celdas = np.where(hay_dato, self._celdas(lat, lng), -1)
+        cambios = np.flatnonzero(celdas != self._celda_por_fila[filas])
+        for fila, anterior, nueva in zip(
+            filas[cambios].tolist(), self._celda_por_fila[filas[cambios]].tolist(), celdas[cambios].tolist()
+        ):
+            if anterior >= 0:
+                ocupantes = self._filas_por_celda[anterior]
+                ocupantes.discard(fila)
+                if not ocupantes:
+                    del self._filas_por_celda[anterior]
+            if nueva >= 0:
+                self._filas_por_celda.setdefault(nueva, set()).add(fila)
+        self._celda_por_fila[filas[cambios]] = celdas[cambios]
+
+    # ---------- Consultas ----------
+
+    def _filas_en_rango(self, lat_min, lng_min, lat_max, lng_max):
+        """Filas de las celdas que intersectan la caja (candidatos, sin filtro exacto)."""
+        fila_min, col_min = (int(x) for x in np.floor(
+            (np.array([lat_min, lng_min]) + [90, 180]) / self.tam_celda))
+        fila_max, col_max = (int(x) for x in np.floor(
+            (np.array([lat_max, lng_max]) + [90, 180]) / self.tam_celda))
+        total_celdas = (fila_max - fila_min + 1) * (col_max - col_min + 1)
+        if total_celdas > len(self._filas_por_celda):
+            # Caja muy grande: más barato recorrer solo las celdas ocupadas
+            celdas = (
+                c for c in self._filas_por_celda
+                if fila_min <= c // self._columnas <= fila_max and col_min <= c % self._columnas <= col_max
+            )
+        else:
+            celdas = (
+                f * self._columnas + c
+                for f in range(fila_min, fila_max + 1)
+                for c in range(col_min, col_max + 1)
+            )
+        filas = []
+        for celda in celdas:
+            filas.extend(self._filas_por_celda.get(celda, ()))
+        return np.array(filas, np.int64)
+
+    def en_caja(self, lng_min, lat_min, lng_max, lat_max):
+        """Filas cuya última posición cae dentro de la caja (orden GeoJSON: oeste, sur, este, norte)."""
+        filas = self._filas_en_rango(lat_min, lng_min, lat_max, lng_max)
+        if not len(filas):
+            return filas
+        lat, lng, _, _, _ = self._telemetria.ultimas(filas)
+        dentro = (lat >= lat_min) & (lat <= lat_max) & (lng >= lng_min) & (lng <= lng_max)
+        return filas[dentro]
+
+    def en_radio(self, lat, lng, radio_km):
+        """``(filas, distancias)`` a menos de ``radio_km`` del punto, de la más cercana a la más lejana."""
+        delta_lat = radio_km / KM_POR_GRADO
+        delta_lng = radio_km / (KM_POR_GRADO * max(math.cos(math.radians(min(abs(lat) + delta_lat, 89.9))), 1e-6))
+        filas = self._filas_en_rango(lat - delta_lat, lng - delta_lng, lat + delta_lat, lng + delta_lng)
+        if not len(filas):
+            return filas, np.zeros(0)
+        lats, lngs, _, _, _ = self._telemetria.ultimas(filas)
+        distancias = distancia_km(lat, lng, lats, lngs)
+        dentro = np.flatnonzero(distancias <= radio_km)
+        orden = dentro[np.argsort(distancias[dentro], kind="stable")]
+        return filas[orden], distancias[orden]
+
+    def cercanos(self, lat, lng, cantidad, aceptar=None, radio_max_km=None):
+        """Las ``cantidad`` filas más cercanas al punto que cumplan ``aceptar(fila)``.
+
+        Busca en radios crecientes (se duplica en cada vuelta, empezando por
+        una celda) y se detiene en cuanto el círculo contiene suficientes
+        candidatos aceptados: todo lo que queda fuera está más lejos.
+        """
+        radio_km = self.tam_celda * KM_POR_GRADO * math.cos(math.radians(min(abs(lat), 89.9)))
+        limite = radio_max_km if radio_max_km is not None else 2 * math.pi * RADIO_TIERRA_KM
+        while True:
+            buscado = min(radio_km, limite)
+            filas, distancias = self.en_radio(lat, lng, buscado)
+            if aceptar is not None and len(filas):
+                validas = np.fromiter((aceptar(f) for f in filas.tolist()), bool, len(filas))
+                filas, distancias = filas[validas], distancias[validas]
+            if len(filas) >= cantidad or buscado >= limite or radio_km > 4 * RADIO_TIERRA_KM:
+                return filas[:cantidad], distancias[:cantidad]
+            radio_km *= 2
@@ -0,0 +1,73 @@
+"""Fragmentos JSON por registro, serializados una vez y concatenados en los listados."""
+import json
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def volcar(datos):
+    """JSON compacto en UTF-8 (orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespuestaJSON(Response):
+    """Respuesta JSON que acepta bytes ya serializados tal cual y vuelca el resto con ``volcar``."""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        if isinstance(content, bytes):
+            return content
+        return volcar(content)
+
+
+class CacheFragmentos:
+    """``id -> (registro, bytes)`` con el JSON de cada registro según su modelo de respuesta.
+
+    El fragmento solo incluye los campos del modelo, en su orden. Como los
+    almacenes reemplazan el registro en cada mutación (copy-on-write), un
+    fragmento es válido mientras el registro guardado sea el mismo objeto;
+    ``sincronizar`` (suscriptor del almacén) además lo libera al cambiar.
+
+    Con ``validar`` cada fragmento se construye pasando por el modelo
+    Pydantic, para detectar en depuración datos que no cumplen el esquema.
+    """
+
+    def __init__(self, modelo, validar=False):
+        self._modelo = modelo
+        self._campos = tuple(modelo.model_fields)
+        self.validar = validar
+        self._fragmentos = {}
+        self.serializados = 0
+
+    def __len__(self):
+        return len(self._fragmentos)
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de ``AlmacenFlota``/``AlmacenAlertas``."""
+        self._fragmentos.pop((nuevo or anterior)["id"], None)
+
+    def limpiar(self):
+        self._fragmentos.clear()
+
+    def fragmento(self, registro):
+        entrada = self._fragmentos.get(registro["id"])
+        if entrada is not None and entrada[0] is registro:
+            return entrada[1]
+        if self.validar:
+            contenido = self._modelo.model_validate(registro).model_dump_json().encode()
+        else:
+            contenido = volcar({campo: registro.get(campo) for campo in self._campos})
+        self._fragmentos[registro["id"]] = (registro, contenido)
+        self.serializados += 1
+        return contenido
+
+    def lista(self, registros):
+        """Arreglo JSON de los registros, concatenando sus fragmentos."""
+        return b"[" + b",".join(map(self.fragmento, registros)) + b"]"
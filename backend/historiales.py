@@ -0,0 +1,261 @@
+"""Series temporales por vehículo (mantenimiento, combustible) en columnas compactas."""
+from datetime import datetime, timezone
+
+import numpy as np
+
+MICROS_DIA = 86_400_000_000
+# 1970-01-01 fue jueves: desplazar 3 días para que las semanas empiecen en lunes
+PERIODOS = {"dia": (MICROS_DIA, 0), "semana": (7 * MICROS_DIA, 3 * MICROS_DIA)}
+
+
+def a_micros(fecha):
+    """Fecha ISO o ``datetime`` (ingenua = UTC) a microsegundos desde epoch."""
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    delta = fecha - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def desde_micros(micros):
+    return datetime.fromtimestamp(micros // 1_000_000, timezone.utc).replace(
+        microsecond=micros % 1_000_000
+    ).isoformat()
+
+
+class EsquemaSerie:
+    """Columnas numéricas (con su dtype y cómo se agregan) y de texto de un tipo de registro."""
+
+    def __init__(self, numericas, textos, agregaciones):
+        self.numericas = numericas
+        self.textos = textos
+        self.agregaciones = agregaciones
+
+
+ESQUEMA_MANTENIMIENTO = EsquemaSerie(
+    numericas={"kilometraje": np.int64, "costo": np.float64},
+    textos=("id", "tipo", "categoria", "proveedor", "observaciones"),
+    agregaciones={"costo": "suma", "kilometraje": "maximo"},
+)
+
+ESQUEMA_COMBUSTIBLE = EsquemaSerie(
+    numericas={"galones": np.float64, "costo_galon": np.float64, "kilometraje_actual": np.int64},
+    textos=("id", "estacion", "autorizado_por"),
+    agregaciones={"galones": "suma", "costo_galon": "promedio", "kilometraje_actual": "maximo"},
+)
+
+
+class Serie:
+    """Registros de un vehículo ordenados por fecha.
+
+    Las columnas numéricas son arreglos NumPy con holgura que se duplican
+    al llenarse; los textos, listas paralelas. Un registro que llega en
+    orden se agrega al final sin mover nada; uno atrasado se inserta en su
+    posición, así las lecturas nunca ordenan.
+    """
+
+    def __init__(self, esquema, capacidad=8):
+        self._esquema = esquema
+        self._n = 0
+        self.fecha = np.empty(capacidad, np.int64)
+        self._numericas = {c: np.empty(capacidad, dtype) for c, dtype in esquema.numericas.items()}
+        self._textos = {c: [] for c in esquema.textos}
+
+    def __len__(self):
+        return self._n
+
+    def columna(self, nombre):
+        return self.fecha[:self._n] if nombre == "fecha" else self._numericas[nombre][:self._n]
+
+    def _reservar(self, cantidad):
+        necesaria = self._n + cantidad
+        if necesaria <= len(self.fecha):
+            return
+        capacidad = max(necesaria, 2 * len(self.fecha))
+        for nombre, arreglo in [("fecha", self.fecha)] + list(self._numericas.items()):
+            nuevo = np.empty(capacidad, arreglo.dtype)
+            nuevo[:self._n] = arreglo[:self._n]
+            if nombre == "fecha":
+                self.fecha = nuevo
+            else:
+                self._numericas[nombre] = nuevo
+
+    def agregar(self, fecha, registro):
+        self._reservar(1)
+        n = self._n
+        if n == 0 or fecha >= self.fecha[n - 1]:
+            posicion = n
+        else:
+            posicion = int(np.searchsorted(self.fecha[:n], fecha, side="right"))
+            self.fecha[posicion + 1:n + 1] = self.fecha[posicion:n]
+            for arreglo in self._numericas.values():
+                arreglo[posicion + 1:n + 1] = arreglo[posicion:n]
+        self.fecha[posicion] = fecha
+        for nombre, arreglo in self._numericas.items():
+            arreglo[posicion] = registro[nombre]
+        for nombre, lista in self._textos.items():
+            lista.insert(posicion, registro.get(nombre))
+        self._n += 1
+
+    def extender(self, fechas, registros):
+        """Carga en bloque; ``fechas`` ya ordenadas y no anteriores al último registro."""
+        self._reservar(len(fechas))
+        inicio, fin = self._n, self._n + len(fechas)
+        self.fecha[inicio:fin] = fechas
+        for nombre, arreglo in self._numericas.items():
+            arreglo[inicio:fin] = [r[nombre] for r in registros]
+        for nombre, lista in self._textos.items():
+            lista.extend(r.get(nombre) for r in registros)
+        self._n = fin
+
+    def rango(self, desde=None, hasta=None):
+        """Posiciones ``[i, j)`` con ``desde <= fecha <= hasta`` (búsqueda binaria)."""
+        fechas = self.fecha[:self._n]
+        i = 0 if desde is None else int(np.searchsorted(fechas, desde, side="left"))
+        j = self._n if hasta is None else int(np.searchsorted(fechas, hasta, side="right"))
+        return i, max(i, j)
+
+    def registros(self, i, j, vehiculo_id):
+        """Registros ``[i, j)`` como diccionarios, del más reciente al más antiguo."""
+        columnas = {nombre: arreglo[i:j].tolist() for nombre, arreglo in self._numericas.items()}
+        fechas = self.fecha[i:j].tolist()
+        resultado = []
+        for k in range(j - i - 1, -1, -1):
+            registro = {"vehiculo_id": vehiculo_id, "fecha": desde_micros(fechas[k])}
+            for nombre, lista in self._textos.items():
+                registro[nombre] = lista[i + k]
+            for nombre, valores in columnas.items():
+                registro[nombre] = valores[k]
+            resultado.append(registro)
+        return resultado
+
+    def agrupar(self, i, j, periodo):
+        """Totales por día o semana de los registros ``[i, j)``, del periodo más reciente al más antiguo."""
+        if i == j:
+            return []
+        ancho, desplazamiento = PERIODOS[periodo]
+        cubetas = (self.fecha[i:j] + desplazamiento) // ancho
+        inicios = np.flatnonzero(np.r_[True, cubetas[1:] != cubetas[:-1]])
+        cantidades = np.diff(np.r_[inicios, j - i])
+        agregados = {}
+        for nombre, operacion in self._esquema.agregaciones.items():
+            valores = self._numericas[nombre][i:j]
+            if operacion == "maximo":
+                agregados[nombre] = np.maximum.reduceat(valores, inicios).tolist()
+            elif operacion == "promedio":
+                agregados[nombre] = np.round(np.add.reduceat(valores, inicios) / cantidades, 2).tolist()
+            else:
+                agregados[nombre] = np.round(np.add.reduceat(valores, inicios), 2).tolist()
+        resultado = []
+        for k, (cubeta, cantidad) in enumerate(zip(cubetas[inicios].tolist(), cantidades.tolist())):
+            cubo = {"inicio": desde_micros(cubeta * ancho - desplazamiento), "registros": cantidad}
+            for nombre, valores in agregados.items():
+                cubo[nombre] = valores[k]
+            resultado.append(cubo)
+        resultado.reverse()
+        return resultado
+
+
+class AlmacenHistorial:
+    """Series por ``vehiculo_id`` de un tipo de registro, solo de agregado.
+
+    ``version`` aumenta con cada escritura (sirve para invalidar cachés).
+    """
+
+    def __init__(self, esquema, registros=()):
+        self.esquema = esquema
+        self.version = 0
+        self._series = {}
+        self._total = 0
+        self._suscriptores = []
+        self.agregar_varios(registros)
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        for vehiculo_id, serie in self._series.items():
+            yield from reversed(serie.registros(0, len(serie), vehiculo_id))
+
+    def suscribir(self, funcion):
+        """Registra ``funcion(registro)``, llamada con cada registro agregado."""
+        self._suscriptores.append(funcion)
+
+    def _serie(self, vehiculo_id):
+        serie = self._series.get(vehiculo_id)
+        if serie is None:
+            serie = self._series[vehiculo_id] = Serie(self.esquema)
+        return serie
+
+    def agregar(self, registro):
+        self._serie(registro["vehiculo_id"]).agregar(a_micros(registro["fecha"]), registro)
+        self._total += 1
+        self.version += 1
+        for funcion in self._suscriptores:
+            funcion(registro)
+        return registro
+
+    def agregar_varios(self, registros):
+        """Carga masiva: agrupa por vehículo y ordena una vez por serie."""
+        por_vehiculo = {}
+        for registro in registros:
+            por_vehiculo.setdefault(registro["vehiculo_id"], []).append((a_micros(registro["fecha"]), registro))
+        for vehiculo_id, lote in por_vehiculo.items():
+            lote.sort(key=lambda x: x[0])
+            serie = self._serie(vehiculo_id)
+            if len(serie) and lote[0][0] < serie.fecha[len(serie) - 1]:
+                for fecha, registro in lote:
+                    serie.agregar(fecha, registro)
+            else:
+                serie.extender([f for f, _ in lote], [r for _, r in lote])
+            self._total += len(lote)
+            self.version += 1
+            for funcion in self._suscriptores:
+                for _, registro in lote:
+                    funcion(registro)
+
+    def cargar(self, registros):
+        """Reemplaza el contenido completo (p. ej. al hidratar desde la base)."""
+        self._series = {}
+        self._total = 0
+        self.version += 1
+        self.agregar_varios(registros)
+
+    def recorrer(self, vehiculo_id=None, desde=None, hasta=None, bloque=1000):
+        """Registros en bloques de hasta ``bloque``, serie por serie y más recientes primero.
+
+        Solo materializa un bloque a la vez, para exportar historiales
+        completos sin cargarlos en memoria.
+        """
+        ids = list(self._series) if vehiculo_id is None else [vehiculo_id]
+        desde = None if desde is None else a_micros(desde)
+        hasta = None if hasta is None else a_micros(hasta)
+        pendientes = []
+        for vid in ids:
+            serie = self._series.get(vid)
+            if serie is None:
+                continue
+            i, j = serie.rango(desde, hasta)
+            while j > i:
+                k = max(i, j - (bloque - len(pendientes)))
+                pendientes.extend(serie.registros(k, j, vid))
+                j = k
+                if len(pendientes) >= bloque:
+                    yield pendientes
+                    pendientes = []
+        if pendientes:
+            yield pendientes
+
+    def consultar(self, vehiculo_id, desde=None, hasta=None, periodo=None):
+        """Registros (o totales por ``periodo``) entre ``desde`` y ``hasta``, más recientes primero."""
+        serie = self._series.get(vehiculo_id)
+        if serie is None:
+            return []
+        i, j = serie.rango(
+            None if desde is None else a_micros(desde),
+            None if hasta is None else a_micros(hasta),
+        )
+        if periodo is not None:
+            return serie.agrupar(i, j, periodo)
+        return serie.registros(i, j, vehiculo_id)
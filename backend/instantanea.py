@@ -0,0 +1,194 @@
+"""Instantáneas binarias de la flota, alertas e historiales en formato columnar.
+
+Formato (little-endian)::
+
+    b"FLOTASNP" | u4 longitud de la cabecera | cabecera JSON | bloques alineados a 8 bytes
+
+La cabecera describe cada tabla (registros planos) y sus columnas:
+
+- numérica (``<i8``, ``<f8``, ``|b1``): ``filas`` valores contiguos;
+- ``categoria``: códigos ``<u4`` y la lista de valores distintos (cualquier
+  valor JSON) en la propia cabecera;
+- ``texto``: ``filas + 1`` desplazamientos ``<i8`` en caracteres y el texto
+  UTF-8 concatenado, que se decodifica de una sola vez al leer.
+
+Los almacenes necesitan cada registro como diccionario, así que el archivo
+se lee completo y se decodifica columna a columna: lo que se ahorra frente a
+generar los datos es el generador aleatorio y las reglas, no la memoria.
+Decodificar cuesta del orden de 1,3 s por cada 100k vehículos (con sus
+alertas e historiales), o sea que crece linealmente y no baja del segundo
+con flotas de un millón.
+"""
+import gc
+import json
+import os
+
+import numpy as np
+
+MAGICO = b"FLOTASNP"
+FORMATO = 1
+ALINEACION = 8
+
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
+
+
+def _llave(valor):
+    """Llave hashable de un valor categórico; los objetos JSON se comparan por contenido."""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, sort_keys=True, ensure_ascii=False)
+    return (type(valor), valor)
+
+
+def _clasificar(valores):
+    tipos = set(map(type, valores))
+    if tipos == {bool}:
+        return "|b1"
+    if tipos == {int}:
+        return "<i8"
+    if tipos <= {int, float}:
+        return "<f8"
+    if tipos == {str} and len(set(valores)) * 4 > len(valores):
+        return "texto"
+    return "categoria"
+
+
+def escribir(ruta, tablas, metadatos=None, reemplazar=True):
+    """Escribe ``{tabla: registros}`` en ``ruta`` de forma atómica, vía un archivo temporal.
+
+    Con ``reemplazar=False`` una instantánea ya existente se conserva (el
+    primer proceso en publicarla gana) y se devuelve ``False``.
+    """
+    cabecera = {"formato": FORMATO, "metadatos": metadatos or {}, "tablas": {}}
+    bloques = []
+    posicion = 0
+
+    def agregar(datos):
+        nonlocal posicion
+        inicio = posicion
+        bloques.append((inicio, datos))
+        posicion = _alinear(posicion + len(datos))
+        return inicio
+
+    for nombre, registros in tablas.items():
+        registros = list(registros)
+        campos = list(dict.fromkeys(campo for r in registros for campo in r))
+        columnas = {}
+        for campo in campos:
+            valores = [r.get(campo) for r in registros]
+            tipo = _clasificar(valores) if valores else "categoria"
+            if tipo == "texto":
+                longitudes = np.fromiter(map(len, valores), np.int64, len(valores))
+                desplazamientos = np.concatenate([[0], np.cumsum(longitudes)]).astype("<i8")
+                columnas[campo] = {
+                    "tipo": tipo,
+                    "desplazamientos": agregar(desplazamientos.tobytes()),
+                    "datos": agregar("".join(valores).encode()),
+                }
+                columnas[campo]["bytes"] = len(bloques[-1][1])
+            elif tipo == "categoria":
+                codigos, distintos, secuencia = {}, [], []
+                for valor in valores:
+                    llave = _llave(valor)
+                    codigo = codigos.get(llave)
+                    if codigo is None:
+                        codigo = codigos[llave] = len(distintos)
+                        distintos.append(valor)
+                    secuencia.append(codigo)
+                arreglo = np.array(secuencia, "<u4")
+                columnas[campo] = {"tipo": tipo, "valores": distintos, "codigos": agregar(arreglo.tobytes())}
+            else:
+                columnas[campo] = {"tipo": tipo, "datos": agregar(np.array(valores, tipo).tobytes())}
+        cabecera["tablas"][nombre] = {"filas": len(registros), "columnas": columnas}
+
+    crudo = json.dumps(cabecera, ensure_ascii=False, separators=(",", ":")).encode()
+    inicio_datos = _alinear(len(MAGICO) + 4 + len(crudo))
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(MAGICO)
+        archivo.write(len(crudo).to_bytes(4, "little"))
+        archivo.write(crudo)
+        for inicio, datos in bloques:
+            archivo.seek(inicio_datos + inicio)
+            archivo.write(datos)
+        archivo.truncate(inicio_datos + posicion)
+    if reemplazar:
+        os.replace(temporal, ruta)
+        return True
+    try:
+        os.link(temporal, ruta)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(temporal)
+
+
+class Instantanea:
+    """Lectura de una instantánea, cargada en memoria de una sola vez."""
+
+    def __init__(self, ruta):
+        with open(ruta, "rb") as archivo:
+            self._contenido = archivo.read()
+        if self._contenido[:len(MAGICO)] != MAGICO:
+            raise ValueError(f"{ruta} no es una instantánea de flota")
+        longitud = int.from_bytes(self._contenido[len(MAGICO):len(MAGICO) + 4], "little")
+        inicio = len(MAGICO) + 4
+        self.cabecera = json.loads(self._contenido[inicio:inicio + longitud])
+        if self.cabecera["formato"] != FORMATO:
+            raise ValueError(f"Formato de instantánea no soportado: {self.cabecera['formato']}")
+        self._inicio_datos = _alinear(inicio + longitud)
+
+    @property
+    def metadatos(self):
+        return self.cabecera["metadatos"]
+
+    def tablas(self):
+        return list(self.cabecera["tablas"])
+
+    def filas(self, tabla):
+        return self.cabecera["tablas"][tabla]["filas"]
+
+    def _arreglo(self, dtype, desplazamiento, cantidad):
+        return np.frombuffer(self._contenido, dtype, cantidad, self._inicio_datos + desplazamiento)
+
+    def columna(self, tabla, campo):
+        """Columna numérica o códigos de una categórica como arreglo NumPy sin copia."""
+        filas = self.filas(tabla)
+        columna = self.cabecera["tablas"][tabla]["columnas"][campo]
+        if columna["tipo"] == "categoria":
+            return self._arreglo("<u4", columna["codigos"], filas)
+        if columna["tipo"] == "texto":
+            raise TypeError(f"{campo} es una columna de texto")
+        return self._arreglo(columna["tipo"], columna["datos"], filas)
+
+    def valores(self, tabla, campo):
+        """Columna completa como lista de valores Python."""
+        filas = self.filas(tabla)
+        columna = self.cabecera["tablas"][tabla]["columnas"][campo]
+        if columna["tipo"] == "texto":
+            desplazamientos = self._arreglo("<i8", columna["desplazamientos"], filas + 1).tolist()
+            inicio = self._inicio_datos + columna["datos"]
+            texto = str(memoryview(self._contenido)[inicio:inicio + columna["bytes"]], "utf-8")
+            return [texto[a:b] for a, b in zip(desplazamientos, desplazamientos[1:])]
+        if columna["tipo"] == "categoria":
+            return list(map(columna["valores"].__getitem__, self.columna(tabla, campo).tolist()))
+        return self.columna(tabla, campo).tolist()
+
+    def registros(self, tabla):
+        """Registros de la tabla como diccionarios (campos ausentes quedan en ``None``)."""
+        campos = list(self.cabecera["tablas"][tabla]["columnas"])
+        # Millones de contenedores nuevos disparan el recolector una y otra vez sin liberar nada
+        activo = gc.isenabled()
+        gc.disable()
+        try:
+            columnas = [self.valores(tabla, campo) for campo in campos]
+            return [dict(zip(campos, fila)) for fila in zip(*columnas)]
+        finally:
+            if activo:
+                gc.enable()
+
+    def cerrar(self):
+        """Suelta el contenido leído; las columnas obtenidas con ``columna`` lo mantienen vivo."""
+        self._contenido = None
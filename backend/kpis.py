@@ -0,0 +1,115 @@
+"""Acumulador incremental de los KPIs del dashboard."""
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+
+
+def _clave_top(vehiculo):
+    # Orden ascendente = mayor kilometraje primero; placa e id desempatan
+    return (-vehiculo["kilometraje"], vehiculo["placa"], vehiculo["id"])
+
+
+def _es_critica_activa(alerta):
+    return alerta["severidad"] == "alta" and not alerta["atendida"]
+
+
+class AcumuladorKPI:
+    """Contadores y sumas de la flota actualizados en cada mutación.
+
+    Mantiene conteos por estado, sumas de kilometraje y consumo, las
+    alertas críticas activas y los ``k`` vehículos de mayor kilometraje,
+    de modo que ``resumen()`` cuesta O(k) sin importar el tamaño de la
+    flota. El top-k solo se recalcula desde la flota completa cuando uno
+    de sus vehículos baja por debajo del umbral y deja un hueco que no se
+    puede rellenar sin mirar el resto.
+    """
+
+    def __init__(self, flota, alertas, k=5):
+        self._flota = flota
+        self.k = k
+        self._estados = Counter()
+        self._total = 0
+        self._suma_km = 0
+        # Décimas de km/galón en enteros para que las sumas no acumulen error
+        self._suma_consumo_decimas = 0
+        self._criticas_activas = 0
+        self._top = []
+        self._top_valido = False
+        for vehiculo in flota:
+            self._sumar(vehiculo, 1)
+        for alerta in alertas:
+            self._criticas_activas += _es_critica_activa(alerta)
+
+    # ---------- Suscriptores ----------
+
+    def sincronizar_vehiculo(self, anterior, nuevo):
+        if anterior is not None:
+            self._sumar(anterior, -1)
+        if nuevo is not None:
+            self._sumar(nuevo, 1)
+        if self._top_valido:
+            self._actualizar_top(anterior, nuevo)
+
+    def sincronizar_alerta(self, anterior, nuevo):
+        if anterior is not None:
+            self._criticas_activas -= _es_critica_activa(anterior)
+        if nuevo is not None:
+            self._criticas_activas += _es_critica_activa(nuevo)
+
+    # ---------- Lectura ----------
+
+    def resumen(self):
+        """Valores agregados actuales; O(k)."""
+        return {
+            "total": self._total,
+            "por_estado": {e: n for e, n in self._estados.items() if n},
+            "suma_kilometraje": self._suma_km,
+            "suma_consumo": self._suma_consumo_decimas / 10,
+            "alertas_criticas": self._criticas_activas,
+            "mas_utilizados": self.mas_utilizados(),
+        }
+
+    def mas_utilizados(self):
+        if not self._top_valido:
+            self._top = heapq.nsmallest(self.k, map(_clave_top, self._flota))
+            self._top_valido = True
+        resultado = []
+        for _, _, vehiculo_id in self._top:
+            v = self._flota.obtener(vehiculo_id)
+            resultado.append({"placa": v["placa"], "kilometraje": v["kilometraje"], "tipo": v["tipo"]})
+        return resultado
+
+    def verificar(self, alertas):
+        """Compara contra un recálculo completo; devuelve las diferencias encontradas."""
+        esperado = AcumuladorKPI(self._flota, alertas, self.k).resumen()
+        actual = self.resumen()
+        return {
+            campo: {"incremental": actual[campo], "recalculado": valor}
+            for campo, valor in esperado.items()
+            if actual[campo] != valor
+        }
+
+    # ---------- Internos ----------
+
+    def _sumar(self, vehiculo, signo):
+        self._estados[vehiculo["estado"]] += signo
+        self._total += signo
+        self._suma_km += signo * vehiculo["kilometraje"]
+        self._suma_consumo_decimas += signo * round(vehiculo["consumo_promedio"] * 10)
+
+    def _actualizar_top(self, anterior, nuevo):
+        top = self._top
+        peor = top[-1] if len(top) >= self.k else None
+        if anterior is not None:
+            clave = _clave_top(anterior)
+            posicion = bisect_left(top, clave)
+            if posicion < len(top) and top[posicion] == clave:
+                del top[posicion]
+        if nuevo is not None:
+            clave = _clave_top(nuevo)
+            if peor is None or clave <= peor:
+                insort(top, clave)
+                del top[self.k:]
+        # Un hueco en el top solo se puede rellenar mirando la flota completa
+        if len(top) < min(self.k, self._total):
+            self._top_valido = False
@@ -0,0 +1,218 @@
+"""Métricas de peticiones y de los almacenes, expuestas en el formato de texto de Prometheus."""
+import logging
+import re
+import time
+from bisect import bisect_left
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+# Límites superiores (inclusivos) de las cubetas; la última es +Inf
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_TAMANIO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Etiqueta de las peticiones que no llegaron a ninguna ruta (404), para no crear
+# una serie por cada ruta inventada
+SIN_RUTA = "<sin_ruta>"
+# Tokens que pueden venir en la consulta (SSE) y no deben quedar en el log
+_TOKEN_CONSULTA = re.compile(r"(^|[?&])token=[^&#\s]*")
+
+logger = logging.getLogger(__name__)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + "}"
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if valor == float("inf"):
+            return "+Inf"
+        return repr(valor)
+    return str(int(valor))
+
+
+def ocultar_token(texto):
+    """Ruta o consulta con el valor de ``token=`` reemplazado por ``***``."""
+    return _TOKEN_CONSULTA.sub(r"\1token=***", texto)
+
+
+class FiltroToken(logging.Filter):
+    """Filtro para el log de accesos de uvicorn: oculta el token de sesión de las URL de SSE.
+
+    uvicorn pasa la ruta con su consulta como tercer argumento del registro.
+    """
+
+    def filter(self, registro):
+        argumentos = registro.args
+        if isinstance(argumentos, tuple) and len(argumentos) >= 3 and isinstance(argumentos[2], str):
+            registro.args = (*argumentos[:2], ocultar_token(argumentos[2]), *argumentos[3:])
+        return True
+
+
+class Histograma:
+    """Cubetas fijas con suma y cantidad; ``observar`` es una búsqueda binaria y tres sumas."""
+
+    __slots__ = ("limites", "cubetas", "suma", "cantidad")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)
+        self.suma = 0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        self.cubetas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+    def lineas(self, nombre, pares):
+        acumulado = 0
+        for limite, cantidad in zip(self.limites + (float("inf"),), self.cubetas):
+            acumulado += cantidad
+            yield f"{nombre}_bucket{_etiquetas(pares + (('le', _numero(float(limite))),))} {acumulado}"
+        yield f"{nombre}_sum{_etiquetas(pares)} {_numero(self.suma)}"
+        yield f"{nombre}_count{_etiquetas(pares)} {self.cantidad}"
+
+
+class _Ruta:
+    """Acumuladores de un par (método, plantilla de ruta)."""
+
+    __slots__ = ("latencia", "tamanio", "codigos")
+
+    def __init__(self):
+        self.latencia = Histograma(LIMITES_LATENCIA)
+        self.tamanio = Histograma(LIMITES_TAMANIO)
+        self.codigos = {}
+
+
+class Metricas:
+    """Registro de métricas del proceso.
+
+    Las de peticiones las alimenta ``MiddlewareMetricas``; las de los
+    almacenes se registran con ``medir`` como funciones que se evalúan
+    solo al exponer, así no cuestan nada en el camino de las peticiones.
+    """
+
+    def __init__(self, prefijo="flota"):
+        self.prefijo = prefijo
+        self.en_curso = 0
+        self.lentas = 0
+        self._rutas = {}
+        self._medidas = []
+
+    def observar(self, metodo, ruta, codigo, segundos, tamanio):
+        acumulador = self._rutas.get((metodo, ruta))
+        if acumulador is None:
+            acumulador = self._rutas[(metodo, ruta)] = _Ruta()
+        acumulador.latencia.observar(segundos)
+        acumulador.tamanio.observar(tamanio)
+        acumulador.codigos[codigo] = acumulador.codigos.get(codigo, 0) + 1
+
+    def medir(self, nombre, tipo, ayuda, funcion, etiquetas=()):
+        """Registra ``funcion()`` como ``gauge`` o ``counter``.
+
+        ``funcion`` devuelve un número o, si se dan ``etiquetas`` (sus
+        nombres), un diccionario ``valores -> número`` donde cada clave es
+        una tupla con un valor por etiqueta (o un valor suelto si hay una).
+        """
+        self._medidas.append((f"{self.prefijo}_{nombre}", tipo, ayuda, funcion, tuple(etiquetas)))
+
+    def exponer(self):
+        """Texto en el formato de exposición 0.0.4 de Prometheus."""
+        lineas = []
+        http = f"{self.prefijo}_http"
+        rutas = sorted(self._rutas.items())
+
+        lineas += [
+            f"# HELP {http}_peticiones_total Peticiones atendidas por método, ruta y código de estado.",
+            f"# TYPE {http}_peticiones_total counter",
+        ]
+        for (metodo, ruta), acumulador in rutas:
+            for codigo, cantidad in sorted(acumulador.codigos.items()):
+                pares = (("metodo", metodo), ("ruta", ruta), ("codigo", codigo))
+                lineas.append(f"{http}_peticiones_total{_etiquetas(pares)} {cantidad}")
+
+        for sufijo, atributo, ayuda in (
+            ("duracion_segundos", "latencia", "Latencia de las peticiones hasta el último byte de la respuesta."),
+            ("respuesta_bytes", "tamanio", "Tamaño del cuerpo de las respuestas tal como se envía (comprimido si aplica)."),
+        ):
+            lineas += [f"# HELP {http}_{sufijo} {ayuda}", f"# TYPE {http}_{sufijo} histogram"]
+            for (metodo, ruta), acumulador in rutas:
+                lineas.extend(getattr(acumulador, atributo).lineas(f"{http}_{sufijo}", (("metodo", metodo), ("ruta", ruta))))
+
+        lineas += [
+            f"# HELP {http}_peticiones_en_curso Peticiones en proceso (incluida esta).",
+            f"# TYPE {http}_peticiones_en_curso gauge",
+            f"{http}_peticiones_en_curso {self.en_curso}",
+            f"# HELP {http}_peticiones_lentas_total Peticiones que superaron el umbral del registro de lentas.",
+            f"# TYPE {http}_peticiones_lentas_total counter",
+            f"{http}_peticiones_lentas_total {self.lentas}",
+        ]
+
+        for nombre, tipo, ayuda, funcion, etiquetas in self._medidas:
+            try:
+                valor = funcion()
+            except Exception:
+                logger.exception("No se pudo calcular la métrica %s", nombre)
+                continue
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+            if not etiquetas:
+                lineas.append(f"{nombre} {_numero(valor)}")
+                continue
+            for clave, cantidad in sorted(valor.items(), key=lambda e: str(e[0])):
+                valores = clave if isinstance(clave, tuple) else (clave,)
+                lineas.append(f"{nombre}{_etiquetas(tuple(zip(etiquetas, valores)))} {_numero(cantidad)}")
+        return ("\n".join(lineas) + "\n").encode()
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mide cada petición HTTP y registra las lentas.
+
+    La ruta se etiqueta con su plantilla (``/api/vehiculos/{vehiculo_id}``),
+    que FastAPI deja en ``scope["route"]`` al enrutar; el tamaño es el de
+    los cuerpos que salen por ``send``. Las peticiones de al menos
+    ``lentas_ms`` milisegundos (0 lo desactiva) se anotan en el log.
+    """
+
+    def __init__(self, app, metricas, lentas_ms=0):
+        self.app = app
+        self.metricas = metricas
+        self.umbral = lentas_ms / 1000 if lentas_ms > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metricas = self.metricas
+        codigo = 500
+        tamanio = 0
+
+        async def enviar(mensaje):
+            nonlocal codigo, tamanio
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+            else:
+                tamanio += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        metricas.en_curso += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            segundos = time.perf_counter() - inicio
+            metricas.en_curso -= 1
+            ruta = getattr(scope.get("route"), "path", SIN_RUTA)
+            metricas.observar(scope["method"], ruta, codigo, segundos, tamanio)
+            if self.umbral is not None and segundos >= self.umbral:
+                metricas.lentas += 1
+                consulta = ocultar_token(scope.get("query_string", b"").decode("latin-1"))
+                logger.warning(
+                    "Petición lenta: %s %s%s -> %d en %.1f ms (%d bytes)",
+                    scope["method"], scope["path"], f"?{consulta}" if consulta else "",
+                    codigo, segundos * 1000, tamanio,
+                )
@@ -0,0 +1,184 @@
+"""Perfilado bajo demanda de peticiones con cProfile, guardado como archivos pstats."""
+import cProfile
+import hmac
+import logging
+import random
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+EXTENSION = ".pstats"
+CABECERA_CLAVE = b"x-admin-clave"
+CABECERA_PERFILAR = b"x-perfilar"
+CABECERA_PERFIL = b"x-perfil"
+_PATRON_NOMBRE = re.compile(r"^[\w.-]+\.pstats$")
+
+logger = logging.getLogger(__name__)
+
+
+class Perfilador:
+    """Decide qué peticiones perfilar y conserva las últimas ``maximo`` capturas en ``directorio``.
+
+    Se perfila una petición cuando trae ``X-Perfilar: 1`` junto con la
+    clave de administración en ``X-Admin-Clave``, o al azar con
+    probabilidad ``muestreo`` si su ruta empieza por alguno de los
+    prefijos de ``rutas`` (todas si no hay prefijos). Los archivos se
+    abren con ``pstats``, snakeviz o flameprof.
+    """
+
+    def __init__(self, directorio, maximo=50, clave=None, muestreo=0.0, rutas=()):
+        self.directorio = Path(directorio)
+        self.maximo = maximo
+        self.clave = clave.encode() if clave else None
+        self.muestreo = muestreo
+        self.rutas = tuple(rutas)
+        self.ocupado = False
+        self._recientes = {}
+
+    def autorizado(self, clave):
+        """``True`` si ``clave`` (bytes o texto) es la de administración configurada."""
+        if self.clave is None or not clave:
+            return False
+        if isinstance(clave, str):
+            clave = clave.encode()
+        return hmac.compare_digest(clave, self.clave)
+
+    def elegir(self, scope):
+        """Motivo para perfilar la petición (``"cabecera"``/``"muestreo"``), o ``None``."""
+        if self.ocupado:
+            return None
+        if self.clave is not None:
+            pedido = clave = None
+            for nombre, valor in scope["headers"]:
+                if nombre == CABECERA_PERFILAR:
+                    pedido = valor
+                elif nombre == CABECERA_CLAVE:
+                    clave = valor
+            if pedido in (b"1", b"true") and self.autorizado(clave):
+                return "cabecera"
+        if self.muestreo and random.random() < self.muestreo and scope["path"].startswith(self.rutas or ("",)):
+            return "muestreo"
+        return None
+
+    def guardar(self, perfil, scope, codigo, segundos, motivo):
+        """Escribe la captura, aplica la retención y devuelve el nombre del archivo."""
+        ahora = datetime.now(timezone.utc)
+        ruta = scope.get("route")
+        plantilla = getattr(ruta, "path", scope["path"])
+        nombre = "{}-{}-{}{}".format(
+            ahora.strftime("%Y%m%dT%H%M%S%f"),
+            scope["method"],
+            re.sub(r"[^\w]+", "_", plantilla).strip("_") or "raiz",
+            EXTENSION,
+        )
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        perfil.dump_stats(self.directorio / nombre)
+        self._recientes[nombre] = {
+            "metodo": scope["method"],
+            "ruta": plantilla,
+            "ruta_pedida": scope["path"],
+            "codigo": codigo,
+            "duracion_ms": round(segundos * 1000, 2),
+            "motivo": motivo,
+        }
+        self._retener()
+        return nombre
+
+    def _archivos(self):
+        if not self.directorio.is_dir():
+            return []
+        return sorted(self.directorio.glob(f"*{EXTENSION}"), key=lambda a: a.name, reverse=True)
+
+    def _retener(self):
+        for archivo in self._archivos()[self.maximo:]:
+            archivo.unlink(missing_ok=True)
+            self._recientes.pop(archivo.name, None)
+
+    def capturas(self):
+        """Capturas en disco, de la más reciente a la más antigua."""
+        resultado = []
+        for archivo in self._archivos():
+            estado = archivo.stat()
+            resultado.append({
+                "archivo": archivo.name,
+                "fecha": datetime.fromtimestamp(estado.st_mtime, timezone.utc).isoformat(),
+                "bytes": estado.st_size,
+                **self._recientes.get(archivo.name, {}),
+            })
+        return resultado
+
+    def archivo(self, nombre):
+        """Ruta de una captura existente, o ``None`` (también si el nombre no es válido)."""
+        if not _PATRON_NOMBRE.match(nombre):
+            return None
+        ruta = self.directorio / nombre
+        return ruta if ruta.is_file() else None
+
+
+class MiddlewarePerfilado:
+    """Middleware ASGI que perfila las peticiones elegidas por ``Perfilador.elegir``.
+
+    cProfile mide el hilo del bucle de eventos, así que mientras dura una
+    captura también se cuenta el trabajo de otras peticiones concurrentes;
+    por eso se perfila una sola a la vez. La respuesta perfilada lleva el
+    nombre de su captura en ``X-Perfil``. Las demás peticiones solo pagan
+    la revisión de sus cabeceras.
+    """
+
+    def __init__(self, app, perfilador):
+        self.app = app
+        self.perfilador = perfilador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        motivo = self.perfilador.elegir(scope)
+        if motivo is None:
+            await self.app(scope, receive, send)
+            return
+        perfilador = self.perfilador
+        perfil = cProfile.Profile()
+        codigo = 500
+        encabezado = None
+        guardado = None
+
+        def terminar():
+            nonlocal guardado
+            perfil.disable()
+            if guardado is None:
+                try:
+                    guardado = perfilador.guardar(perfil, scope, codigo, time.perf_counter() - inicio, motivo)
+                    logger.info("Perfil %s guardado (%s)", guardado, motivo)
+                except OSError:
+                    logger.exception("No se pudo guardar el perfil de %s", scope["path"])
+                    guardado = ""
+            return guardado
+
+        async def enviar(mensaje):
+            nonlocal codigo, encabezado
+            if mensaje["type"] == "http.response.start":
+                # Se retiene hasta el primer cuerpo: si es el único, la captura ya
+                # está completa y su nombre viaja en la cabecera
+                codigo = mensaje["status"]
+                encabezado = mensaje
+                return
+            if encabezado is not None:
+                inicio_respuesta, encabezado = encabezado, None
+                if not mensaje.get("more_body", False) and terminar():
+                    inicio_respuesta = {
+                        **inicio_respuesta,
+                        "headers": [*inicio_respuesta["headers"], (CABECERA_PERFIL, guardado.encode())],
+                    }
+                await send(inicio_respuesta)
+            await send(mensaje)
+
+        perfilador.ocupado = True
+        inicio = time.perf_counter()
+        perfil.enable()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfilador.ocupado = False
+            terminar()
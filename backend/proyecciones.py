@@ -0,0 +1,68 @@
+"""Proyección de campos (``campos=``) con planes precompilados por conjunto de campos."""
+from collections import OrderedDict
+
+
+class Proyeccion:
+    """Plan para un conjunto de campos: la lista de ``(campo, extractor)`` ya resuelta.
+
+    Al aplicarla solo se llaman los extractores de los campos pedidos, así
+    los demás nunca se construyen.
+    """
+
+    def __init__(self, campos, extractores):
+        self.campos = campos
+        self._pasos = [(campo, extractores[campo]) for campo in campos]
+
+    def __call__(self, *fuente):
+        return {campo: extraer(*fuente) for campo, extraer in self._pasos}
+
+    def incluye(self, *campos):
+        return any(campo in self.campos for campo in campos)
+
+    def recortar(self, registro, extras=()):
+        """Copia de un registro ya construido con solo los campos del plan (y ``extras`` si están)."""
+        recortado = {campo: registro[campo] for campo in self.campos}
+        for campo in extras:
+            if campo in registro:
+                recortado[campo] = registro[campo]
+        return recortado
+
+
+class Proyecciones:
+    """Planes de un tipo de recurso, uno por conjunto de campos pedido (LRU acotado).
+
+    ``extractores`` mapea cada campo disponible a la función que lo
+    construye; su orden es el de los campos en la respuesta. Los
+    ``obligatorios`` (el id) se incluyen siempre.
+    """
+
+    def __init__(self, extractores, obligatorios=("id",), max_planes=128):
+        self.extractores = extractores
+        self.obligatorios = obligatorios
+        self.max_planes = max_planes
+        self.completa = Proyeccion(tuple(extractores), extractores)
+        self._planes = OrderedDict()
+
+    def __len__(self):
+        return len(self._planes)
+
+    def plan(self, campos):
+        """Plan para ``campos`` (texto ``"a,b"`` o iterable); lanza ``ValueError`` si alguno no existe."""
+        if isinstance(campos, str):
+            campos = campos.split(",")
+        pedidos = {c.strip() for c in campos if c.strip()} | set(self.obligatorios)
+        desconocidos = sorted(pedidos - self.extractores.keys())
+        if desconocidos:
+            raise ValueError(
+                f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(self.extractores)}"
+            )
+        clave = frozenset(pedidos)
+        plan = self._planes.get(clave)
+        if plan is not None:
+            self._planes.move_to_end(clave)
+            return plan
+        plan = Proyeccion(tuple(c for c in self.extractores if c in clave), self.extractores)
+        self._planes[clave] = plan
+        if len(self._planes) > self.max_planes:
+            self._planes.popitem(last=False)
+        return plan
@@ -0,0 +1,236 @@
+"""Motor de reglas que deriva las alertas del estado de cada vehículo."""
+import asyncio
+import heapq
+import logging
+import time
+import uuid
+
+from historiales import a_micros, desde_micros
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_COMBUSTIBLE = 20
+UMBRAL_KILOMETRAJE = 140000
+
+
+class Regla:
+    """Condición sobre un vehículo que, mientras se cumple, mantiene una alerta abierta.
+
+    Una regla de estado define ``condicion(vehiculo)``; una de fecha
+    define ``plazo(vehiculo)`` (fecha ISO o ``None``) y se cumple desde
+    que ese plazo vence. ``campos`` son los campos del vehículo de los que
+    depende: solo se reevalúa cuando alguno cambia.
+    """
+
+    def __init__(self, clave, tipo, severidad, icono, campos, mensaje, condicion=None, plazo=None):
+        self.clave = clave
+        self.tipo = tipo
+        self.severidad = severidad
+        self.icono = icono
+        self.campos = campos
+        self.mensaje = mensaje
+        self.condicion = condicion
+        self.plazo = plazo
+
+
+REGLAS = [
+    Regla(
+        "combustible_bajo", "Combustible Bajo", "media", "fuel", ("nivel_combustible",),
+        lambda v: f"Nivel de combustible en {v['nivel_combustible']}%",
+        condicion=lambda v: v["nivel_combustible"] < UMBRAL_COMBUSTIBLE,
+    ),
+    Regla(
+        "mantenimiento_vencido", "Mantenimiento Vencido", "alta", "wrench", ("proximo_mantenimiento",),
+        lambda v: f"Mantenimiento programado para el {v['proximo_mantenimiento'][:10]} no realizado",
+        plazo=lambda v: v.get("proximo_mantenimiento"),
+    ),
+    Regla(
+        "seguro_vencido", "Documentación Vencida", "alta", "shield", ("seguro_vigente",),
+        lambda v: "Seguro del vehículo no vigente",
+        condicion=lambda v: not v["seguro_vigente"],
+    ),
+    Regla(
+        "matricula_vencida", "Documentación Vencida", "alta", "file", ("matricula_vigente",),
+        lambda v: "Matrícula del vehículo no vigente",
+        condicion=lambda v: not v["matricula_vigente"],
+    ),
+    Regla(
+        "kilometraje_alto", "Kilometraje Alto", "media", "gauge", ("kilometraje",),
+        lambda v: f"Kilometraje de {v['kilometraje']:,} km supera el umbral de revisión mayor",
+        condicion=lambda v: v["kilometraje"] > UMBRAL_KILOMETRAJE,
+    ),
+    Regla(
+        "falla_reportada", "Falla Reportada", "alta", "alert", ("estado",),
+        lambda v: "Vehículo reportado en estado crítico",
+        condicion=lambda v: v["estado"] == "Crítico",
+    ),
+]
+
+
+class MotorReglas:
+    """Evalúa las reglas solo para los vehículos que cambian y dispara las de fecha desde una cola.
+
+    Suscrito a ``AlmacenFlota``: cada mutación reevalúa únicamente las
+    reglas cuyos campos cambiaron. Los plazos futuros van a un montículo
+    ``(plazo, vehiculo_id, regla)``; ``revisar`` solo mira su cabeza, así
+    nunca se recorre la flota completa después de la carga inicial. Las
+    entradas obsoletas (plazo cambiado) se descartan al salir de la cola.
+
+    Cada par (vehículo, regla) tiene a lo sumo una alerta abierta; cuando
+    la condición deja de cumplirse la alerta se marca como atendida.
+    """
+
+    def __init__(self, flota, alertas, reglas=REGLAS, reloj=time.time, nuevo_id=None):
+        self._flota = flota
+        self._alertas = alertas
+        self._reglas = {regla.clave: regla for regla in reglas}
+        self._reloj = reloj
+        self._nuevo_id = nuevo_id or (lambda: str(uuid.uuid4()))
+        self._activas = {}
+        self._plazos = {}
+        self._cola = []
+        self.disparadas = 0
+
+    def __len__(self):
+        return len(self._activas)
+
+    def _ahora(self):
+        return int(self._reloj() * 1_000_000)
+
+    def evaluar_todos(self):
+        """Evaluación completa; solo al arrancar o tras hidratar desde la base."""
+        ahora = self._ahora()
+        for vehiculo in list(self._flota):
+            for regla in self._reglas.values():
+                self._evaluar(vehiculo, regla, ahora)
+
+    def _recuperar_activas(self):
+        self._activas = {
+            (a["vehiculo_id"], a["regla"]): a["id"]
+            for a in self._alertas
+            if not a["atendida"] and a.get("regla") in self._reglas and a.get("vehiculo_id")
+        }
+        self._plazos = {}
+        self._cola = []
+
+    def reconstruir(self):
+        """Recupera las alertas abiertas del almacén (p. ej. cargadas de la base) y reevalúa la flota."""
+        self._recuperar_activas()
+        self.evaluar_todos()
+
+    def restaurar(self):
+        """Como ``reconstruir``, para una flota y alertas que ya son consistentes entre sí.
+
+        No reevalúa las reglas de estado; solo vuelve a encolar los plazos
+        de las reglas de fecha sin alerta abierta. Los vencidos desde que se
+        guardaron los datos se disparan en el siguiente ``revisar``.
+        """
+        self._recuperar_activas()
+        for regla in self._reglas.values():
+            if regla.plazo is None:
+                continue
+            for vehiculo in self._flota:
+                llave = (vehiculo["id"], regla.clave)
+                plazo = regla.plazo(vehiculo)
+                if plazo is not None and llave not in self._activas:
+                    self._plazos[llave] = a_micros(plazo)
+        self._cola = [(p, v, r) for (v, r), p in self._plazos.items()]
+        heapq.heapify(self._cola)
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de ``AlmacenFlota``."""
+        if nuevo is None:
+            for clave in self._reglas:
+                self._plazos.pop((anterior["id"], clave), None)
+                self._resolver((anterior["id"], clave))
+            return
+        ahora = self._ahora()
+        for regla in self._reglas.values():
+            if anterior is None or any(anterior.get(c) != nuevo.get(c) for c in regla.campos):
+                self._evaluar(nuevo, regla, ahora)
+
+    def _evaluar(self, vehiculo, regla, ahora):
+        llave = (vehiculo["id"], regla.clave)
+        fecha = ahora
+        if regla.plazo is not None:
+            plazo = regla.plazo(vehiculo)
+            self._plazos.pop(llave, None)
+            if plazo is None:
+                activa = False
+            else:
+                fecha = a_micros(plazo)
+                activa = fecha <= ahora
+                if not activa:
+                    self._plazos[llave] = fecha
+                    heapq.heappush(self._cola, (fecha, vehiculo["id"], regla.clave))
+                    if len(self._cola) > 2 * len(self._plazos) + 1024:
+                        self._cola = [(p, v, r) for (v, r), p in self._plazos.items()]
+                        heapq.heapify(self._cola)
+        else:
+            activa = regla.condicion(vehiculo)
+        if activa:
+            self._disparar(vehiculo, regla, fecha)
+        else:
+            self._resolver(llave)
+
+    def _disparar(self, vehiculo, regla, fecha):
+        llave = (vehiculo["id"], regla.clave)
+        if llave in self._activas:
+            return
+        alerta = {
+            "id": self._nuevo_id(),
+            "tipo": regla.tipo,
+            "severidad": regla.severidad,
+            "icono": regla.icono,
+            "vehiculo_id": vehiculo["id"],
+            "vehiculo_placa": vehiculo["placa"],
+            "regla": regla.clave,
+            "mensaje": regla.mensaje(vehiculo),
+            "fecha": desde_micros(fecha),
+            "atendida": False,
+            "responsable": vehiculo["responsable"],
+        }
+        self._alertas.agregar(alerta)
+        self._activas[llave] = alerta["id"]
+        self.disparadas += 1
+
+    def _resolver(self, llave):
+        alerta_id = self._activas.pop(llave, None)
+        if alerta_id is None:
+            return
+        alerta = self._alertas.obtener(alerta_id)
+        if alerta is not None and not alerta["atendida"]:
+            self._alertas.actualizar(alerta_id, {"atendida": True})
+
+    # ---------- Plazos ----------
+
+    def revisar(self, ahora=None):
+        """Dispara las reglas de fecha vencidas; devuelve cuántas se procesaron."""
+        ahora = self._ahora() if ahora is None else ahora
+        procesadas = 0
+        while self._cola and self._cola[0][0] <= ahora:
+            plazo, vehiculo_id, clave = heapq.heappop(self._cola)
+            llave = (vehiculo_id, clave)
+            if self._plazos.get(llave) != plazo:
+                continue
+            del self._plazos[llave]
+            vehiculo = self._flota.obtener(vehiculo_id)
+            if vehiculo is not None:
+                self._disparar(vehiculo, self._reglas[clave], plazo)
+                procesadas += 1
+        return procesadas
+
+    def espera(self, maximo):
+        """Segundos hasta el próximo plazo, acotados a ``maximo``."""
+        if not self._cola:
+            return maximo
+        return min(maximo, max(0.0, (self._cola[0][0] - self._ahora()) / 1_000_000))
+
+    async def ejecutar(self, intervalo=60.0):
+        """Bucle de plazos; se lanza como tarea de fondo al iniciar la aplicación."""
+        while True:
+            await asyncio.sleep(self.espera(intervalo))
+            try:
+                self.revisar()
+            except Exception:
+                logger.exception("No se pudieron revisar los plazos de las reglas")
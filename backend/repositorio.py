@@ -0,0 +1,232 @@
+"""Persistencia en MongoDB de vehículos, alertas e historiales."""
+import inspect
+import re
+from itertools import islice
+
+from pymongo import ASCENDING, DESCENDING, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+
+from busqueda import CAMPOS_BUSQUEDA, LONGITUD_GRAMA, gramas, normalizar
+
+TAMANIO_LOTE = 1000
+
+
+async def _resolver(valor):
+    """Espera el resultado si la colección es asíncrona (Motor) y no si es síncrona (mongomock)."""
+    if inspect.isawaitable(valor):
+        return await valor
+    return valor
+
+
+async def _a_lista(cursor, limite=None):
+    if hasattr(cursor, "to_list"):
+        return await cursor.to_list(limite)
+    return list(cursor if limite is None else islice(cursor, limite))
+
+
+def _texto_busqueda(vehiculo):
+    # Un campo por línea para que una subcadena no cruce de un campo a otro
+    return "\n".join(normalizar(vehiculo[campo]) for campo in CAMPOS_BUSQUEDA)
+
+
+def _campos_busqueda(vehiculo):
+    """``texto_busqueda`` para verificar la subcadena y ``gramas_busqueda`` (índice multikey)."""
+    return {
+        "texto_busqueda": _texto_busqueda(vehiculo),
+        "gramas_busqueda": sorted(set().union(*(gramas(normalizar(vehiculo[c])) for c in CAMPOS_BUSQUEDA))),
+    }
+
+
+def _filtro_busqueda(texto):
+    """Como ``IndiceBusqueda``: hasta tres caracteres es un grama exacto; más largo, todos sus
+    trigramas (resueltos con el índice) y luego la subcadena sobre los candidatos."""
+    consulta = normalizar(texto.strip())
+    if len(consulta) <= LONGITUD_GRAMA:
+        return {"gramas_busqueda": consulta}
+    trigramas = sorted({consulta[i:i + LONGITUD_GRAMA] for i in range(len(consulta) - LONGITUD_GRAMA + 1)})
+    return {"gramas_busqueda": {"$all": trigramas}, "texto_busqueda": {"$regex": re.escape(consulta)}}
+
+
+class RepositorioMongo:
+    """Repositorio sobre una base Motor (o un sustituto síncrono como mongomock).
+
+    Los filtros de los listados se resuelven en la base con índices: el
+    estado, el tipo y la unidad se traducen primero a los valores exactos
+    almacenados (``distinct`` sobre el índice) y se consultan con ``$in``,
+    y la paginación usa la misma clave (placa, id) / (fecha, id) que el
+    almacén en memoria. Las proyecciones limitan los documentos a los
+    campos del modelo de respuesta.
+    """
+
+    def __init__(self, db, campos_vehiculo, campos_alerta):
+        self.vehiculos = db["vehiculos"]
+        self.alertas = db["alertas"]
+        self.mantenimientos = db["mantenimientos"]
+        self.combustibles = db["combustibles"]
+        self._proyeccion_vehiculo = {"_id": 0, **{campo: 1 for campo in campos_vehiculo}}
+        self._proyeccion_alerta = {"_id": 0, **{campo: 1 for campo in campos_alerta}}
+
+    async def asegurar_indices(self):
+        await _resolver(self.vehiculos.create_index("id", unique=True))
+        await _resolver(self.vehiculos.create_index("placa", unique=True))
+        for campo in ("estado", "tipo", "unidad_operativa"):
+            await _resolver(self.vehiculos.create_index(campo))
+        await _resolver(self.vehiculos.create_index("gramas_busqueda"))
+        await _resolver(self.alertas.create_index("id", unique=True))
+        await _resolver(self.alertas.create_index([("fecha", DESCENDING), ("id", DESCENDING)]))
+        await _resolver(self.alertas.create_index(
+            [("severidad", ASCENDING), ("atendida", ASCENDING), ("fecha", DESCENDING), ("id", DESCENDING)]
+        ))
+        for coleccion in (self.mantenimientos, self.combustibles):
+            await _resolver(coleccion.create_index([("vehiculo_id", ASCENDING), ("fecha", DESCENDING)]))
+
+    async def completar_busqueda(self):
+        """Agrega ``gramas_busqueda`` a los vehículos sembrados antes de que existiera."""
+        faltantes = self.vehiculos.find(
+            {"gramas_busqueda": {"$exists": False}}, {"_id": 0, "id": 1, **{c: 1 for c in CAMPOS_BUSQUEDA}}
+        )
+        operaciones = iter([
+            UpdateOne({"id": v["id"]}, {"$set": _campos_busqueda(v)}) for v in await _a_lista(faltantes)
+        ])
+        while True:
+            lote = list(islice(operaciones, TAMANIO_LOTE))
+            if not lote:
+                break
+            await _resolver(self.vehiculos.bulk_write(lote, ordered=False))
+
+    async def esta_vacio(self):
+        return await _resolver(self.vehiculos.estimated_document_count()) == 0
+
+    async def sembrar(self, vehiculos, alertas, mantenimientos=(), combustibles=()):
+        """Inserta los datos iniciales con ``bulk_write`` en lotes desordenados."""
+        documentos = (
+            (self.vehiculos, ({**v, **_campos_busqueda(v)} for v in vehiculos)),
+            (self.alertas, alertas),
+            (self.mantenimientos, mantenimientos),
+            (self.combustibles, combustibles),
+        )
+        for coleccion, registros in documentos:
+            # Copias: insert_one/bulk_write agregan `_id` al diccionario recibido
+            operaciones = (InsertOne(dict(r)) for r in registros)
+            while True:
+                lote = list(islice(operaciones, TAMANIO_LOTE))
+                if not lote:
+                    break
+                await _resolver(coleccion.bulk_write(lote, ordered=False))
+
+    # ---------- Vehículos ----------
+
+    async def _valores(self, campo, buscado, subcadena=False):
+        """Valores almacenados de ``campo`` que coinciden sin distinguir mayúsculas."""
+        buscado = buscado.lower()
+        return [
+            valor for valor in await _resolver(self.vehiculos.distinct(campo))
+            if (buscado in valor.lower() if subcadena else valor.lower() == buscado)
+        ]
+
+    async def listar_vehiculos(self, estado=None, tipo=None, unidad=None, busqueda=None, limite=50, despues=None):
+        """Página ``(vehiculos, clave_siguiente)`` ordenada por (placa, id)."""
+        filtro = {}
+        if estado:
+            filtro["estado"] = {"$in": await self._valores("estado", estado)}
+        if tipo:
+            filtro["tipo"] = {"$in": await self._valores("tipo", tipo)}
+        if unidad:
+            filtro["unidad_operativa"] = {"$in": await self._valores("unidad_operativa", unidad, subcadena=True)}
+        if busqueda and busqueda.strip():
+            filtro.update(_filtro_busqueda(busqueda))
+        if despues is not None:
+            placa, vehiculo_id = despues
+            filtro["$or"] = [{"placa": {"$gt": placa}}, {"placa": placa, "id": {"$gt": vehiculo_id}}]
+        cursor = self.vehiculos.find(filtro, self._proyeccion_vehiculo).sort(
+            [("placa", ASCENDING), ("id", ASCENDING)]
+        ).limit(limite + 1)
+        pagina = await _a_lista(cursor, limite + 1)
+        if len(pagina) <= limite:
+            return pagina, None
+        pagina.pop()
+        return pagina, (pagina[-1]["placa"], pagina[-1]["id"])
+
+    async def obtener_vehiculo(self, vehiculo_id):
+        return await _resolver(self.vehiculos.find_one(
+            {"$or": [{"id": vehiculo_id}, {"placa": vehiculo_id.upper()}]}, self._proyeccion_vehiculo
+        ))
+
+    async def obtener_vehiculos(self, ids):
+        """Vehículos cuyos id o placa están en ``ids``, en una sola consulta."""
+        return await _a_lista(self.vehiculos.find(
+            {"$or": [{"id": {"$in": ids}}, {"placa": {"$in": [i.upper() for i in ids]}}]},
+            self._proyeccion_vehiculo,
+        ))
+
+    async def cargar_vehiculos(self):
+        return await _a_lista(self.vehiculos.find({}, self._proyeccion_vehiculo))
+
+    # ---------- Alertas ----------
+
+    async def listar_alertas(self, severidad=None, atendida=None, limite=50, despues=None):
+        """Página ``(alertas, clave_siguiente)``, más recientes primero."""
+        filtro = {}
+        if severidad:
+            filtro["severidad"] = severidad
+        if atendida is not None:
+            filtro["atendida"] = atendida
+        if despues is not None:
+            fecha, alerta_id = despues
+            filtro["$or"] = [{"fecha": {"$lt": fecha}}, {"fecha": fecha, "id": {"$lt": alerta_id}}]
+        cursor = self.alertas.find(filtro, self._proyeccion_alerta).sort(
+            [("fecha", DESCENDING), ("id", DESCENDING)]
+        ).limit(limite + 1)
+        pagina = await _a_lista(cursor, limite + 1)
+        if len(pagina) <= limite:
+            return pagina, None
+        pagina.pop()
+        return pagina, (pagina[-1]["fecha"], pagina[-1]["id"])
+
+    async def guardar_alertas(self, cambios):
+        """Aplica ``{id: alerta}`` (``None`` elimina) con ``bulk_write`` en lotes desordenados."""
+        operaciones = iter([
+            ReplaceOne({"id": alerta_id}, dict(alerta), upsert=True) if alerta is not None
+            else DeleteOne({"id": alerta_id})
+            for alerta_id, alerta in cambios.items()
+        ])
+        while True:
+            lote = list(islice(operaciones, TAMANIO_LOTE))
+            if not lote:
+                break
+            await _resolver(self.alertas.bulk_write(lote, ordered=False))
+
+    async def cargar_alertas(self):
+        return await _a_lista(self.alertas.find({}, self._proyeccion_alerta))
+
+    # ---------- Historiales ----------
+
+    async def cargar_mantenimientos(self):
+        return await _a_lista(self.mantenimientos.find({}, {"_id": 0}))
+
+    async def cargar_combustibles(self):
+        return await _a_lista(self.combustibles.find({}, {"_id": 0}))
+
+
+class VersionesSesionMongo:
+    """Versiones de revocación de sesiones en la colección ``sesiones``, compartidas entre workers."""
+
+    compartidas = True
+
+    def __init__(self, db):
+        self.sesiones = db["sesiones"]
+
+    async def asegurar_indices(self):
+        await _resolver(self.sesiones.create_index("usuario", unique=True))
+
+    async def cargar(self):
+        return {d["usuario"]: d["version"] for d in await _a_lista(self.sesiones.find({}, {"_id": 0}))}
+
+    async def obtener(self, usuario):
+        documento = await _resolver(self.sesiones.find_one({"usuario": usuario}, {"_id": 0, "version": 1}))
+        return documento["version"] if documento else 0
+
+    async def incrementar(self, usuario):
+        documento = await _resolver(self.sesiones.find_one_and_update(
+            {"usuario": usuario}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+        ))
+        return documento["version"]
@@ -0,0 +1,64 @@
+"""Totales mensuales por unidad operativa y tipo de vehículo, mantenidos al agregar registros."""
+from datetime import datetime
+
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+
+class ResumenMensual:
+    """Cubetas ``(año, mes, unidad, tipo)`` con los totales de un historial.
+
+    Cada registro suma en cuatro cubetas: la de su unidad y tipo y las
+    marginales ``(unidad, *)``, ``(*, tipo)`` y ``(*, *)``. Una consulta
+    lee así 12 cubetas (por cada unidad que coincide con el filtro) sin
+    importar cuántos registros haya. La unidad y el tipo son los del
+    vehículo al momento de agregar el registro.
+    """
+
+    def __init__(self, flota, campos, medir):
+        self._flota = flota
+        self.campos = campos
+        self._medir = medir
+        self._cubetas = {}
+        self._unidades = set()
+
+    def __len__(self):
+        return len(self._cubetas)
+
+    def limpiar(self):
+        self._cubetas.clear()
+        self._unidades.clear()
+
+    def sincronizar(self, registro):
+        """Suscriptor de ``AlmacenHistorial``."""
+        fecha = registro["fecha"]
+        if isinstance(fecha, str):
+            fecha = datetime.fromisoformat(fecha)
+        vehiculo = self._flota.obtener(registro["vehiculo_id"])
+        unidad = vehiculo["unidad_operativa"].lower() if vehiculo else ""
+        tipo = vehiculo["tipo"].lower() if vehiculo else ""
+        self._unidades.add(unidad)
+        valores = self._medir(registro)
+        anio, mes = fecha.year, fecha.month
+        for clave in ((anio, mes, unidad, tipo), (anio, mes, unidad, None),
+                      (anio, mes, None, tipo), (anio, mes, None, None)):
+            cubeta = self._cubetas.get(clave)
+            if cubeta is None:
+                self._cubetas[clave] = dict(valores)
+            else:
+                for campo, valor in valores.items():
+                    cubeta[campo] += valor
+
+    def mensual(self, anio, unidad=None, tipo=None):
+        """Totales de cada mes de ``anio``; ``unidad`` es una subcadena y ``tipo`` exacto, sin mayúsculas."""
+        unidades = [None] if not unidad else [u for u in self._unidades if unidad.lower() in u]
+        tipo = tipo.lower() if tipo else None
+        resultado = []
+        for mes, nombre in enumerate(MESES, start=1):
+            totales = dict.fromkeys(self.campos, 0)
+            for u in unidades:
+                cubeta = self._cubetas.get((anio, mes, u, tipo))
+                if cubeta is not None:
+                    for campo in self.campos:
+                        totales[campo] += cubeta[campo]
+            resultado.append({"mes": nombre, **totales})
+        return resultado
@@ -1,15 +1,45 @@
-from fastapi import FastAPI, APIRouter, Query, HTTPException
+from fastapi import FastAPI, APIRouter, Query, HTTPException, Request, Response, Header, Depends
+from fastapi.responses import StreamingResponse, FileResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import fcntl
+import json
 import logging
+import operator
+import zlib
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import random
+import secrets
+import numpy as np
+
+from almacen import AlmacenFlota, AlmacenAlertas, codificar_cursor, decodificar_cursor
+from busqueda import IndiceBusqueda
+from kpis import AcumuladorKPI
+from columnar import FlotaColumnar, COLUMNAS_NUMERICAS
+from repositorio import RepositorioMongo, VersionesSesionMongo
+from telemetria import BufferTelemetria
+from espacial import IndiceEspacial, distancia_km
+from difusion import DifusorGPS
+from versiones import RegistroVersiones, version_inicial
+from cache import CacheRespuestas
+from fragmentos import CacheFragmentos, RespuestaJSON, volcar
+from proyecciones import Proyecciones
+from exportacion import TIPOS_MEDIO, MAX_FILAS_XLSX, codificar, transmitir
+from compresion import MiddlewareCompresion, elegir_codificacion, comprimir, cabeceras_codificadas, etiqueta_base
+from metricas import FiltroToken, Metricas, MiddlewareMetricas, TIPO_CONTENIDO as TIPO_METRICAS
+from perfilado import Perfilador, MiddlewarePerfilado
+from historiales import AlmacenHistorial, ESQUEMA_MANTENIMIENTO, ESQUEMA_COMBUSTIBLE
+from resumenes import ResumenMensual
+from reglas import MotorReglas
+from instantanea import Instantanea, escribir as escribir_instantanea
+from sesiones import Sesiones
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -19,8 +49,14 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# "memoria" (por defecto) o "mongo": con "mongo" los listados se consultan en la base
+PERSISTENCIA = os.environ.get('PERSISTENCIA', 'memoria')
+REPOSITORIO = None
+
 app = FastAPI(title="Sistema de Gestión Vehicular Naval - Base Naval Sur")
 api_router = APIRouter(prefix="/api")
+# Rutas que no exigen sesión (raíz y login); todas las de api_router la exigen
+publico_router = APIRouter(prefix="/api")
 
 # ==================== MOCK DATA ====================
 
@@ -95,53 +131,69 @@ NOMBRES = [
 ESTADOS = ["Operativo", "Mantenimiento", "Crítico", "Reserva"]
 ESTADOS_PESOS = [0.70, 0.15, 0.05, 0.10]
 
-def generar_placa_ecuador():
+# Los datos generados dependen solo de la semilla y del día: cada worker (y cada
+# reinicio del mismo día) produce exactamente la misma flota
+FECHA_BASE = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def nuevo_id(aleatorio):
+    """UUID4 tomado del generador sembrado en lugar de os.urandom"""
+    return str(uuid.UUID(int=aleatorio.getrandbits(128), version=4))
+
+def generar_placa_ecuador(aleatorio):
     letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
     provincias = ["G", "A", "P", "E", "O", "M", "R", "L", "S", "T"]
-    return f"{random.choice(provincias)}{random.choice(letras)}{random.choice(letras)}-{random.randint(1000, 9999)}"
+    return f"{aleatorio.choice(provincias)}{aleatorio.choice(letras)}{aleatorio.choice(letras)}-{aleatorio.randint(1000, 9999)}"
 
-def generar_vehiculos(cantidad=120):
+def generar_vehiculos(aleatorio, cantidad=120):
     vehiculos = []
+    placas = set()
     for i in range(cantidad):
-        tipo_info = random.choice(TIPOS_VEHICULO)
-        estado = random.choices(ESTADOS, weights=ESTADOS_PESOS)[0]
-        ubicacion = random.choice(UBICACIONES)
-        km_inicial = random.randint(5000, 150000)
+        tipo_info = aleatorio.choice(TIPOS_VEHICULO)
+        estado = aleatorio.choices(ESTADOS, weights=ESTADOS_PESOS)[0]
+        ubicacion = aleatorio.choice(UBICACIONES)
+        km_inicial = aleatorio.randint(5000, 150000)
         
         # Fechas realistas
-        fecha_adquisicion = datetime.now(timezone.utc) - timedelta(days=random.randint(180, 2500))
-        ultimo_mantenimiento = datetime.now(timezone.utc) - timedelta(days=random.randint(10, 120))
-        proximo_mantenimiento = ultimo_mantenimiento + timedelta(days=random.randint(30, 90))
+        fecha_adquisicion = FECHA_BASE - timedelta(days=aleatorio.randint(180, 2500))
+        ultimo_mantenimiento = FECHA_BASE - timedelta(days=aleatorio.randint(10, 120))
+        proximo_mantenimiento = ultimo_mantenimiento + timedelta(days=aleatorio.randint(30, 90))
+        
+        placa = generar_placa_ecuador(aleatorio)
+        while placa in placas:
+            placa = generar_placa_ecuador(aleatorio)
+        placas.add(placa)
         
         vehiculo = {
-            "id": str(uuid.uuid4()),
-            "placa": generar_placa_ecuador(),
+            "id": nuevo_id(aleatorio),
+            "placa": placa,
             "tipo": tipo_info["tipo"],
             "marca_modelo": tipo_info["marca"],
-            "anio": random.randint(2015, 2024),
+            "anio": aleatorio.randint(2015, 2024),
             "capacidad": tipo_info["capacidad"],
-            "color": random.choice(["Blanco", "Gris", "Negro", "Azul Naval", "Verde Olivo"]),
+            "color": aleatorio.choice(["Blanco", "Gris", "Negro", "Azul Naval", "Verde Olivo"]),
             "kilometraje": km_inicial,
             "estado": estado,
-            "disponibilidad": "Disponible" if estado == "Operativo" else ("En Servicio" if random.random() > 0.5 else "No Disponible"),
-            "unidad_operativa": random.choice(UNIDADES_OPERATIVAS),
-            "responsable": f"{random.choice(RANGOS)} {random.choice(NOMBRES)}",
+            "disponibilidad": "Disponible" if estado == "Operativo" else ("En Servicio" if aleatorio.random() > 0.5 else "No Disponible"),
+            "unidad_operativa": aleatorio.choice(UNIDADES_OPERATIVAS),
+            "responsable": f"{aleatorio.choice(RANGOS)} {aleatorio.choice(NOMBRES)}",
             "ubicacion": ubicacion,
-            "consumo_promedio": round(random.uniform(8.5, 18.5), 1),  # km/galón
-            "tanque_capacidad": random.choice([15, 20, 25, 30, 40, 60, 80]),
-            "nivel_combustible": random.randint(15, 100),
+            "consumo_promedio": round(aleatorio.uniform(8.5, 18.5), 1),  # km/galón
+            "tanque_capacidad": aleatorio.choice([15, 20, 25, 30, 40, 60, 80]),
+            "nivel_combustible": aleatorio.randint(15, 100),
             "fecha_adquisicion": fecha_adquisicion.isoformat(),
             "ultimo_mantenimiento": ultimo_mantenimiento.isoformat(),
             "proximo_mantenimiento": proximo_mantenimiento.isoformat(),
-            "numero_serie_motor": f"MTR{random.randint(100000, 999999)}",
-            "numero_chasis": f"CHS{random.randint(1000000, 9999999)}",
-            "seguro_vigente": random.random() > 0.1,
-            "matricula_vigente": random.random() > 0.05,
+            "numero_serie_motor": f"MTR{aleatorio.randint(100000, 999999)}",
+            "numero_chasis": f"CHS{aleatorio.randint(1000000, 9999999)}",
+            "seguro_vigente": aleatorio.random() > 0.1,
+            "matricula_vigente": aleatorio.random() > 0.05,
         }
         vehiculos.append(vehiculo)
     return vehiculos
 
-def generar_historial_mantenimiento(vehiculo_id, cantidad=5):
+MANTENIMIENTOS_CORRECTIVOS = {"Reparación de motor", "Cambio de batería", "Revisión eléctrica", "Servicio de transmisión"}
+
+def generar_historial_mantenimiento(aleatorio, vehiculo_id, cantidad=5):
     tipos_mantenimiento = [
         "Cambio de aceite y filtros",
         "Revisión de frenos",
@@ -156,16 +208,18 @@ def generar_historial_mantenimiento(vehiculo_id, cantidad=5):
     ]
     historial = []
     for i in range(cantidad):
-        fecha = datetime.now(timezone.utc) - timedelta(days=random.randint(30, 700))
+        fecha = FECHA_BASE - timedelta(days=aleatorio.randint(30, 700))
+        tipo = aleatorio.choice(tipos_mantenimiento)
         historial.append({
-            "id": str(uuid.uuid4()),
+            "id": nuevo_id(aleatorio),
             "vehiculo_id": vehiculo_id,
-            "tipo": random.choice(tipos_mantenimiento),
+            "tipo": tipo,
+            "categoria": "correctivo" if tipo in MANTENIMIENTOS_CORRECTIVOS else "preventivo",
             "fecha": fecha.isoformat(),
-            "kilometraje": random.randint(10000, 150000),
-            "costo": round(random.uniform(50, 2500), 2),
-            "proveedor": random.choice(["Taller Naval", "Servicio Autorizado", "Mavesa", "Toyocosta", "Taller Central"]),
-            "observaciones": random.choice([
+            "kilometraje": aleatorio.randint(10000, 150000),
+            "costo": round(aleatorio.uniform(50, 2500), 2),
+            "proveedor": aleatorio.choice(["Taller Naval", "Servicio Autorizado", "Mavesa", "Toyocosta", "Taller Central"]),
+            "observaciones": aleatorio.choice([
                 "Servicio preventivo completado sin novedades",
                 "Se detectó desgaste en componentes, se recomienda seguimiento",
                 "Reparación correctiva exitosa",
@@ -175,52 +229,196 @@ def generar_historial_mantenimiento(vehiculo_id, cantidad=5):
         })
     return sorted(historial, key=lambda x: x["fecha"], reverse=True)
 
-def generar_historial_combustible(vehiculo_id, cantidad=10):
+def generar_historial_combustible(aleatorio, vehiculo_id, cantidad=10):
     historial = []
     for i in range(cantidad):
-        fecha = datetime.now(timezone.utc) - timedelta(days=random.randint(1, 90))
+        fecha = FECHA_BASE - timedelta(days=aleatorio.randint(1, 90))
         historial.append({
-            "id": str(uuid.uuid4()),
+            "id": nuevo_id(aleatorio),
             "vehiculo_id": vehiculo_id,
             "fecha": fecha.isoformat(),
-            "galones": round(random.uniform(5, 30), 2),
-            "costo_galon": round(random.uniform(2.50, 3.20), 2),
-            "estacion": random.choice(["Petroecuador Base Naval", "EP Petroecuador Guayaquil", "Petroecuador Manta"]),
-            "kilometraje_actual": random.randint(50000, 150000),
-            "autorizado_por": f"{random.choice(RANGOS[:8])} {random.choice(NOMBRES)}",
+            "galones": round(aleatorio.uniform(5, 30), 2),
+            "costo_galon": round(aleatorio.uniform(2.50, 3.20), 2),
+            "estacion": aleatorio.choice(["Petroecuador Base Naval", "EP Petroecuador Guayaquil", "Petroecuador Manta"]),
+            "kilometraje_actual": aleatorio.randint(50000, 150000),
+            "autorizado_por": f"{aleatorio.choice(RANGOS[:8])} {aleatorio.choice(NOMBRES)}",
         })
     return sorted(historial, key=lambda x: x["fecha"], reverse=True)
 
-def generar_alertas():
-    tipos_alerta = [
-        {"tipo": "Mantenimiento Vencido", "severidad": "alta", "icono": "wrench"},
-        {"tipo": "Combustible Bajo", "severidad": "media", "icono": "fuel"},
-        {"tipo": "Documentación Vencida", "severidad": "alta", "icono": "file"},
-        {"tipo": "Kilometraje Alto", "severidad": "media", "icono": "gauge"},
-        {"tipo": "Seguro por Vencer", "severidad": "baja", "icono": "shield"},
-        {"tipo": "Falla Reportada", "severidad": "alta", "icono": "alert"},
-        {"tipo": "Revisión Técnica Pendiente", "severidad": "media", "icono": "clipboard"},
-    ]
-    alertas = []
-    for i in range(random.randint(15, 30)):
-        alerta_tipo = random.choice(tipos_alerta)
-        fecha = datetime.now(timezone.utc) - timedelta(hours=random.randint(1, 168))
-        alertas.append({
-            "id": str(uuid.uuid4()),
-            "tipo": alerta_tipo["tipo"],
-            "severidad": alerta_tipo["severidad"],
-            "icono": alerta_tipo["icono"],
-            "vehiculo_placa": generar_placa_ecuador(),
-            "mensaje": f"Alerta: {alerta_tipo['tipo']} requiere atención inmediata",
-            "fecha": fecha.isoformat(),
-            "atendida": random.random() > 0.6,
-            "responsable": f"{random.choice(RANGOS)} {random.choice(NOMBRES)}",
-        })
-    return sorted(alertas, key=lambda x: x["fecha"], reverse=True)
+def sembrar_telemetria(telemetria, vehiculos, aleatorio):
+    """Primera fijación de cada vehículo: su ubicación base con una pequeña dispersión"""
+    filas, lat, lng, velocidad, marca_tiempo = [], [], [], [], []
+    ahora = datetime.now(timezone.utc).timestamp()
+    for v in vehiculos:
+        filas.append(telemetria.registrar(v["id"]))
+        lat.append(v["ubicacion"]["lat"] + aleatorio.uniform(-0.01, 0.01))
+        lng.append(v["ubicacion"]["lng"] + aleatorio.uniform(-0.01, 0.01))
+        velocidad.append(aleatorio.randint(0, 80) if v["estado"] == "Operativo" else 0)
+        marca_tiempo.append(ahora - aleatorio.randint(1, 60) * 60)
+    telemetria.ingerir(filas, lat, lng, velocidad, marca_tiempo)
+
+# Tamaño de la flota simulada y semilla del generador
+FLOTA_TAMANIO = int(os.environ.get("FLOTA_TAMANIO", 120))
+SEMILLA = int(os.environ.get("SEMILLA", 2024))
+# Solo los primeros vehículos reciben historial simulado (20 registros cada uno)
+HISTORIAL_VEHICULOS = int(os.environ.get("HISTORIAL_VEHICULOS", 10000))
+# Directorio de instantáneas compartidas por los workers; vacío las desactiva
+INSTANTANEAS_DIR = os.environ.get("INSTANTANEAS_DIR", str(ROOT_DIR / "instantaneas"))
+
+def generar_datos():
+    """Flota, alertas derivadas e historiales simulados, deterministas para ``SEMILLA`` y el día."""
+    # Generador propio: el global queda igual tanto si se generan los datos como si se leen
+    aleatorio = random.Random(SEMILLA)
+    vehiculos = generar_vehiculos(aleatorio, FLOTA_TAMANIO)
+    alertas = AlmacenAlertas()
+    MotorReglas(AlmacenFlota(vehiculos), alertas, nuevo_id=lambda: nuevo_id(aleatorio)).evaluar_todos()
+    con_historial = vehiculos[:HISTORIAL_VEHICULOS]
+    return {
+        "vehiculos": vehiculos,
+        "alertas": list(alertas),
+        "mantenimientos": [r for v in con_historial for r in generar_historial_mantenimiento(aleatorio, v["id"], 8)],
+        "combustibles": [r for v in con_historial for r in generar_historial_combustible(aleatorio, v["id"], 12)],
+    }
+
+def cargar_datos():
+    """Datos de la instantánea del día; el primer worker que arranca la genera y publica.
+
+    Todos los workers leen el mismo archivo, así comparten datos idénticos
+    aunque arranquen a la vez. El nombre y los metadatos llevan todo lo que
+    cambia los datos generados; una instantánea que no coincide se regenera
+    y las de días o configuraciones anteriores se borran.
+
+    Sólo evita generar los datos: con 100k vehículos el arranque pasa de unos
+    22 s a unos 10 s, de los que ~1,3 s son la lectura de la instantánea y el
+    resto construir índices de búsqueda, resúmenes, historiales y telemetría.
+    """
+    if not INSTANTANEAS_DIR:
+        return generar_datos()
+    log = logging.getLogger(__name__)
+    directorio = Path(INSTANTANEAS_DIR)
+    metadatos = {
+        "cantidad": FLOTA_TAMANIO,
+        "semilla": SEMILLA,
+        "historial": HISTORIAL_VEHICULOS,
+        "fecha_base": FECHA_BASE.isoformat(),
+    }
+    ruta = directorio / f"flota-{FLOTA_TAMANIO}-{SEMILLA}-{HISTORIAL_VEHICULOS}-{FECHA_BASE:%Y%m%d}.snap"
+    if not ruta.exists():
+        directorio.mkdir(parents=True, exist_ok=True)
+        if escribir_instantanea(ruta, generar_datos(), metadatos, reemplazar=False):
+            log.info("Instantánea %s generada", ruta.name)
+    instantanea = Instantanea(ruta)
+    if instantanea.metadatos != metadatos:
+        log.warning("Instantánea %s no corresponde a la configuración actual; se regenera", ruta.name)
+        instantanea.cerrar()
+        escribir_instantanea(ruta, generar_datos(), metadatos)
+        instantanea = Instantanea(ruta)
+    try:
+        datos = {tabla: instantanea.registros(tabla) for tabla in instantanea.tablas()}
+    finally:
+        instantanea.cerrar()
+    for anterior in directorio.glob("flota-*.snap"):
+        if anterior != ruta:
+            anterior.unlink(missing_ok=True)
+            log.info("Instantánea %s descartada", anterior.name)
+    return datos
 
-# Generar datos mock
-VEHICULOS = generar_vehiculos(120)
-ALERTAS = generar_alertas()
+DATOS = cargar_datos()
+FLOTA = AlmacenFlota(DATOS.pop("vehiculos"))
+ALERTAS = AlmacenAlertas(DATOS.pop("alertas"))
+
+# Alertas derivadas del estado de cada vehículo; solo se reevalúan los que cambian
+MOTOR_REGLAS = MotorReglas(FLOTA, ALERTAS)
+MOTOR_REGLAS.restaurar()
+FLOTA.suscribir(MOTOR_REGLAS.sincronizar)
+
+# Cambios de alertas aún no escritos en MongoDB (id -> alerta, o None si se eliminó)
+ALERTAS_PENDIENTES = {}
+
+def anotar_alerta(anterior, nuevo):
+    if REPOSITORIO is not None:
+        ALERTAS_PENDIENTES[(nuevo or anterior)["id"]] = nuevo
+
+ALERTAS.suscribir(anotar_alerta)
+
+def medir_mantenimiento(registro):
+    correctivo = registro.get("categoria") == "correctivo"
+    return {"preventivo": int(not correctivo), "correctivo": int(correctivo), "costo": registro["costo"]}
+
+def medir_combustible(registro):
+    return {"consumo": registro["galones"], "costo": registro["galones"] * registro["costo_galon"]}
+
+# Historiales por vehículo en series temporales ordenadas por fecha, con sus totales
+# mensuales por unidad y tipo de vehículo actualizados en cada registro agregado
+HISTORIAL_MANTENIMIENTO = AlmacenHistorial(ESQUEMA_MANTENIMIENTO)
+RESUMEN_MANTENIMIENTO = ResumenMensual(FLOTA, ("preventivo", "correctivo", "costo"), medir_mantenimiento)
+HISTORIAL_MANTENIMIENTO.suscribir(RESUMEN_MANTENIMIENTO.sincronizar)
+HISTORIAL_MANTENIMIENTO.agregar_varios(DATOS.pop("mantenimientos"))
+HISTORIAL_COMBUSTIBLE = AlmacenHistorial(ESQUEMA_COMBUSTIBLE)
+RESUMEN_COMBUSTIBLE = ResumenMensual(FLOTA, ("consumo", "costo"), medir_combustible)
+HISTORIAL_COMBUSTIBLE.suscribir(RESUMEN_COMBUSTIBLE.sincronizar)
+HISTORIAL_COMBUSTIBLE.agregar_varios(DATOS.pop("combustibles"))
+
+# Índice de texto para `busqueda`, mantenido en cada mutación de la flota
+BUSQUEDA = IndiceBusqueda(FLOTA)
+FLOTA.suscribir(BUSQUEDA.sincronizar)
+
+# KPIs del dashboard mantenidos de forma incremental
+KPIS = AcumuladorKPI(FLOTA, ALERTAS)
+FLOTA.suscribir(KPIS.sincronizar_vehiculo)
+ALERTAS.suscribir(KPIS.sincronizar_alerta)
+# Últimas posiciones GPS por vehículo
+TELEMETRIA = BufferTelemetria()
+# Sembrada igual en todos los workers, hayan generado la instantánea o la hayan leído
+sembrar_telemetria(TELEMETRIA, FLOTA, random.Random(f"{SEMILLA}-telemetria"))
+FLOTA.suscribir(TELEMETRIA.sincronizar)
+
+# Rejilla espacial sobre la última posición, actualizada con cada lote de telemetría
+ESPACIAL = IndiceEspacial(TELEMETRIA)
+ESPACIAL.sincronizar(range(len(TELEMETRIA)))
+TELEMETRIA.suscribir(ESPACIAL.sincronizar)
+
+# Deltas de posición agrupados por tick para los clientes SSE del mapa
+DIFUSOR = DifusorGPS(TELEMETRIA)
+TELEMETRIA.suscribir(DIFUSOR.marcar)
+
+# Versiones de cambio para `desde=` y ETag; son por proceso, así que con varios workers
+# (PERSISTENCIA=mongo) cada uno numera en su propio tramo y una versión ajena nunca produce un
+# 304 ni un delta: el cliente recibe el listado completo. Conviene enrutar con sesiones pegajosas
+VERSION_INICIAL = version_inicial()
+VERSIONES_FLOTA = RegistroVersiones(VERSION_INICIAL)
+FLOTA.suscribir(VERSIONES_FLOTA.sincronizar)
+VERSIONES_ALERTAS = RegistroVersiones(VERSION_INICIAL)
+ALERTAS.suscribir(VERSIONES_ALERTAS.sincronizar)
+VERSIONES_GPS = RegistroVersiones(
+    VERSION_INICIAL, campos=("placa", "tipo", "estado", "ubicacion", "responsable")
+)
+FLOTA.suscribir(VERSIONES_GPS.sincronizar)
+
+def marcar_posiciones(filas):
+    VERSIONES_GPS.marcar([TELEMETRIA.vehiculo(f) for f in filas.tolist()])
+
+TELEMETRIA.suscribir(marcar_posiciones)
+
+# Respuestas JSON serializadas de KPIs, alertas y estadísticas, válidas mientras no cambien
+# las versiones de las colecciones de las que dependen
+CACHE = CacheRespuestas(
+    max_entradas=int(os.environ.get("CACHE_ENTRADAS", 512)),
+    max_bytes=int(os.environ.get("CACHE_MB", 32)) * 1024 * 1024,
+)
+
+# Réplica columnar para las estadísticas agregadas
+COLUMNAR = FlotaColumnar(FLOTA)
+FLOTA.suscribir(COLUMNAR.sincronizar)
+# Respuestas de al menos COMPRESION_MINIMA bytes se comprimen con gzip o brotli
+COMPRESION_MINIMA = int(os.environ.get("COMPRESION_MINIMA", 1024))
+# Peticiones de al menos LENTAS_MS milisegundos se anotan en el log (0 lo desactiva)
+LENTAS_MS = float(os.environ.get("LENTAS_MS", 1000))
+# Clave de administración (cabecera X-Admin-Clave); sin ella no hay perfilado por cabecera
+# ni endpoints de administración
+ADMIN_CLAVE = os.environ.get("ADMIN_CLAVE", "")
+# Con KPIS_VERIFICAR=1 cada /kpis se contrasta contra un recálculo completo
+VERIFICAR_KPIS = os.environ.get("KPIS_VERIFICAR") == "1"
 
 # ==================== MODELS ====================
 
@@ -276,12 +474,53 @@ class AlertaResponse(BaseModel):
     tipo: str
     severidad: str
     icono: str
+    vehiculo_id: Optional[str] = None
     vehiculo_placa: str
+    regla: Optional[str] = None
     mensaje: str
     fecha: str
     atendida: bool
     responsable: str
 
+ADAPTADOR_KPIS = TypeAdapter(KPIResponse)
+
+# JSON de cada vehículo y alerta serializado una sola vez; los listados concatenan
+# fragmentos y los modelos quedan para el esquema OpenAPI. Con VALIDAR_RESPUESTAS=1
+# cada fragmento pasa por su modelo Pydantic (depuración)
+VALIDAR_RESPUESTAS = os.environ.get("VALIDAR_RESPUESTAS") == "1"
+FRAGMENTOS_VEHICULOS = CacheFragmentos(VehiculoResponse, VALIDAR_RESPUESTAS)
+FLOTA.suscribir(FRAGMENTOS_VEHICULOS.sincronizar)
+FRAGMENTOS_ALERTAS = CacheFragmentos(AlertaResponse, VALIDAR_RESPUESTAS)
+ALERTAS.suscribir(FRAGMENTOS_ALERTAS.sincronizar)
+
+# Planes de `campos=` para vehículos y ubicaciones GPS; los campos de telemetría
+# reciben la última lectura (lat, lng, velocidad, marca de tiempo, hay dato)
+PROYECCIONES_VEHICULOS = Proyecciones({c: operator.itemgetter(c) for c in VehiculoResponse.model_fields})
+CAMPOS_TELEMETRIA = ("lat", "lng", "velocidad", "ultimo_reporte")
+PROYECCIONES_GPS = Proyecciones({
+    "id": lambda v, l: v["id"],
+    "placa": lambda v, l: v["placa"],
+    "tipo": lambda v, l: v["tipo"],
+    "estado": lambda v, l: v["estado"],
+    "lat": lambda v, l: l[0] if l[4] else v["ubicacion"]["lat"],
+    "lng": lambda v, l: l[1] if l[4] else v["ubicacion"]["lng"],
+    "ubicacion_nombre": lambda v, l: v["ubicacion"]["nombre"],
+    "responsable": lambda v, l: v["responsable"],
+    "velocidad": lambda v, l: round(l[2]) if l[4] else 0,
+    "ultimo_reporte": lambda v, l: datetime.fromtimestamp(l[3], timezone.utc).isoformat() if l[4] else None,
+})
+
+class AtenderAlertas(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=10000)
+
+class LoteVehiculos(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=1000)
+    mantenimiento: bool = False
+    combustible: bool = False
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    campos: Optional[str] = None
+
 class UsuarioLogin(BaseModel):
     usuario: str
     clave: str
@@ -294,13 +533,58 @@ class UsuarioResponse(BaseModel):
     unidad: str
     token: str
 
+# ==================== SESIONES ====================
+
+# Tokens JWT firmados con JWT_SECRETO; sin él se genera uno por proceso (las sesiones no
+# sobreviven a un reinicio ni se comparten entre workers). Las versiones de revocación se
+# guardan en la colección `sesiones` con PERSISTENCIA=mongo; en memoria solo se admite un
+# worker (se exige al iniciar con un bloqueo sobre BLOQUEO_WORKER) y los tokens no
+# sobreviven a un reinicio
+JWT_SECRETO = os.environ.get("JWT_SECRETO") or secrets.token_urlsafe(32)
+if not os.environ.get("JWT_SECRETO"):
+    logging.getLogger(__name__).warning("JWT_SECRETO no definido: se usa un secreto temporal")
+BLOQUEO_WORKER = os.environ.get("BLOQUEO_WORKER", str(ROOT_DIR / "worker.lock"))
+SESIONES = Sesiones(
+    JWT_SECRETO,
+    VersionesSesionMongo(db) if PERSISTENCIA == "mongo" else None,
+    duracion=int(float(os.environ.get("SESION_HORAS", 8)) * 3600),
+    max_cache=int(os.environ.get("SESIONES_CACHE", 10000)),
+)
+ROL_ADMINISTRADOR = "Administrador"
+
+async def sesion_actual(request: Request):
+    """Claims del token `Authorization: Bearer` (401 si falta o no vale); async para no pasar por el threadpool.
+
+    EventSource no puede enviar cabeceras, así que las peticiones SSE pueden
+    traer el token en `?token=`.
+    """
+    esquema, _, token = request.headers.get("authorization", "").partition(" ")
+    if esquema.lower() != "bearer":
+        token = None
+        if request.headers.get("accept") == "text/event-stream":
+            token = request.query_params.get("token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Se requiere autenticación", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return await SESIONES.verificar(token)
+    except ValueError as error:
+        raise HTTPException(status_code=401, detail=str(error), headers={"WWW-Authenticate": "Bearer"})
+
+def exigir_rol(*roles):
+    """Dependencia que además de la sesión exige uno de `roles`"""
+    async def verificar_rol(sesion: dict = Depends(sesion_actual)):
+        if sesion["rol"] not in roles:
+            raise HTTPException(status_code=403, detail="Rol no autorizado")
+        return sesion
+    return verificar_rol
+
 # ==================== ENDPOINTS ====================
 
-@api_router.get("/")
+@publico_router.get("/")
 async def root():
     return {"message": "Sistema de Gestión Vehicular Naval - Base Naval Sur - Armada del Ecuador"}
 
-@api_router.post("/auth/login", response_model=UsuarioResponse)
+@publico_router.post("/auth/login", response_model=UsuarioResponse)
 async def login(datos: UsuarioLogin):
     """Autenticación simulada"""
     usuarios_mock = {
@@ -317,71 +601,297 @@ async def login(datos: UsuarioLogin):
             "rango": usuario["rango"],
             "rol": usuario["rol"],
             "unidad": usuario["unidad"],
-            "token": f"token_{uuid.uuid4().hex[:16]}",
+            "token": await SESIONES.emitir(datos.usuario, usuario["rol"], usuario["unidad"]),
         }
     raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
+@api_router.post("/auth/logout", status_code=204)
+async def logout(sesion: dict = Depends(sesion_actual)):
+    """Cerrar sesión: revoca todos los tokens emitidos al usuario"""
+    await SESIONES.revocar(sesion["sub"])
+    return Response(status_code=204)
+
+@api_router.post("/auth/revocar/{usuario}", status_code=204, dependencies=[Depends(exigir_rol(ROL_ADMINISTRADOR))])
+async def revocar_sesiones(usuario: str):
+    """Revocar las sesiones abiertas de un usuario"""
+    await SESIONES.revocar(usuario)
+    return Response(status_code=204)
+
+CABECERA_CURSOR = "X-Cursor-Siguiente"
+
+def leer_cursor(cursor: Optional[str]):
+    """Decodifica el cursor recibido o responde 400 si no es válido"""
+    if not cursor:
+        return None
+    try:
+        return decodificar_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def escribir_cursor(response: Response, siguiente):
+    if siguiente is not None:
+        response.headers[CABECERA_CURSOR] = codificar_cursor(siguiente)
+
+CABECERA_VERSION = "X-Version"
+
+def consulta_normalizada(request: Request):
+    return "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+def cabeceras_version(request: Request, version: int):
+    """ETag fuerte (versión de los datos + parámetros de la consulta) y versión actual"""
+    consulta = consulta_normalizada(request)
+    return {"ETag": f'"{version:x}-{zlib.crc32(consulta.encode()):08x}"', CABECERA_VERSION: str(version)}
+
+def no_modificado(request: Request, cabeceras):
+    """Respuesta 304 si el If-None-Match del cliente coincide con el ETag vigente"""
+    recibidas = request.headers.get("if-none-match")
+    if not recibidas:
+        return None
+    for etiqueta in recibidas.split(","):
+        etiqueta = etiqueta.strip().removeprefix("W/")
+        if etiqueta == "*" or etiqueta_base(etiqueta) == cabeceras["ETag"]:
+            # El 304 lleva el ETag de la representación que tiene el cliente (`-gzip`/`-br` si la recibió comprimida)
+            if etiqueta not in ("*", cabeceras["ETag"]):
+                cabeceras = {**cabeceras, "ETag": etiqueta, "Vary": "Accept-Encoding"}
+            return Response(status_code=304, headers=cabeceras)
+    return None
+
+def leer_cambios(registro: RegistroVersiones, desde: int):
+    """Ids modificados y eliminados después de `desde`, o 410 si esa versión ya expiró"""
+    cambios = registro.cambios_desde(desde)
+    if cambios is None:
+        raise HTTPException(status_code=410, detail="Versión `desde` expirada; pida el listado completo")
+    return cambios
+
+def desde_cache(request: Request, registros, cabeceras=None):
+    """`(clave, versiones, respuesta)`; `respuesta` es la guardada si ninguna colección cambió"""
+    clave = f"{request.url.path}?{consulta_normalizada(request)}"
+    versiones = tuple(r.version for r in registros)
+    guardado = CACHE.obtener(clave, versiones)
+    if guardado is None:
+        return clave, versiones, None
+    contenido, guardadas = guardado
+    return clave, versiones, servir_cacheado(request, clave, contenido, {**guardadas, **(cabeceras or {})})
+
+def servir_cacheado(request: Request, clave, contenido, cabeceras=None):
+    """Bytes de la caché, comprimidos según Accept-Encoding y guardados junto a los originales"""
+    cabeceras = cabeceras or {}
+    codificacion = elegir_codificacion(request.headers.get("accept-encoding"))
+    if codificacion is None or len(contenido) < COMPRESION_MINIMA:
+        return RespuestaJSON(contenido, headers=cabeceras)
+    comprimido = CACHE.variante(clave, codificacion, lambda: comprimir(contenido, codificacion))
+    return RespuestaJSON(comprimido, headers=cabeceras_codificadas(cabeceras, codificacion, len(comprimido)))
+
+def a_cache(request: Request, clave, versiones, datos, adaptador: Optional[TypeAdapter] = None, cabeceras=None):
+    """Valida con `adaptador` (si lo hay) y serializa una sola vez; guarda los bytes y responde.
+
+    `datos` puede llegar ya serializado (bytes), p. ej. como lista de fragmentos.
+    """
+    if isinstance(datos, bytes):
+        contenido = datos
+    elif adaptador is not None:
+        contenido = adaptador.dump_json(adaptador.validate_python(datos))
+    else:
+        contenido = volcar(datos)
+    CACHE.guardar(clave, versiones, contenido, cabeceras)
+    return servir_cacheado(request, clave, contenido, cabeceras)
+
+def responder_cacheado(request: Request, registros, calcular, adaptador: Optional[TypeAdapter] = None, cabeceras=None):
+    """Respuesta desde la caché o, si expiró, `calcular()` serializado y guardado"""
+    clave, versiones, respuesta = desde_cache(request, registros, cabeceras)
+    if respuesta is not None:
+        return respuesta
+    return a_cache(request, clave, versiones, calcular(), adaptador, cabeceras)
+
+def leer_campos(proyecciones: Proyecciones, campos: Optional[str]):
+    """Plan de proyección para `campos=` (None si no se pidió) o 400 si hay campos desconocidos"""
+    if not campos:
+        return None
+    try:
+        return proyecciones.plan(campos)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def vehiculos_json(vehiculos, plan=None):
+    """Arreglo JSON de vehículos: fragmentos completos o solo los campos del plan"""
+    if plan is None:
+        return FRAGMENTOS_VEHICULOS.lista(vehiculos)
+    return volcar([plan(v) for v in vehiculos])
+
+DESCRIPCION_CAMPOS = "Campos a incluir separados por coma (el id siempre se incluye)"
+
+def respuesta_delta(cabeceras, cambios, eliminados):
+    """`{version, cambios, eliminados}`; `cambios` es una lista o un arreglo JSON ya serializado"""
+    if not isinstance(cambios, bytes):
+        cambios = volcar(cambios)
+    contenido = b'{"version":%d,"cambios":%b,"eliminados":%b}' % (
+        int(cabeceras[CABECERA_VERSION]), cambios, volcar(eliminados)
+    )
+    return RespuestaJSON(contenido, headers=cabeceras)
+
 @api_router.get("/vehiculos", response_model=List[VehiculoResponse])
 async def obtener_vehiculos(
+    request: Request,
+    response: Response,
     estado: Optional[str] = None,
     tipo: Optional[str] = None,
     unidad: Optional[str] = None,
     busqueda: Optional[str] = None,
-    limite: int = Query(default=50, le=200)
+    limite: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    desde: Optional[int] = None,
+    campos: Optional[str] = Query(default=None, description=DESCRIPCION_CAMPOS),
 ):
-    """Obtener lista de vehículos con filtros"""
-    resultado = VEHICULOS.copy()
+    """Obtener lista de vehículos con filtros, ordenada por placa.
     
-    if estado:
-        resultado = [v for v in resultado if v["estado"].lower() == estado.lower()]
-    if tipo:
-        resultado = [v for v in resultado if v["tipo"].lower() == tipo.lower()]
-    if unidad:
-        resultado = [v for v in resultado if unidad.lower() in v["unidad_operativa"].lower()]
-    if busqueda:
-        busqueda = busqueda.lower()
-        resultado = [v for v in resultado if 
-                    busqueda in v["placa"].lower() or 
-                    busqueda in v["marca_modelo"].lower() or
-                    busqueda in v["responsable"].lower()]
-    
-    return resultado[:limite]
+    La siguiente página se pide con el cursor devuelto en la cabecera X-Cursor-Siguiente.
+    Con `desde=<X-Version>` devuelve solo los vehículos que cambiaron después de esa
+    versión (`cambios`) y los que se eliminaron o dejaron de cumplir los filtros (`eliminados`).
+    `campos=placa,estado` limita los campos de cada vehículo.
+    """
+    plan = leer_campos(PROYECCIONES_VEHICULOS, campos)
+    cabeceras = cabeceras_version(request, VERSIONES_FLOTA.version)
+    respuesta = no_modificado(request, cabeceras)
+    if respuesta is not None:
+        return respuesta
+    if desde is not None:
+        modificados, eliminados = leer_cambios(VERSIONES_FLOTA, desde)
+        ids = set(modificados)
+        encontrados = BUSQUEDA.buscar(busqueda) if busqueda else None
+        if encontrados is not None:
+            ids &= encontrados
+        visibles = FLOTA.candidatos(estado=estado, tipo=tipo, unidad=unidad, ids=ids)
+        cambios = sorted((FLOTA.obtener(i) for i in visibles), key=FLOTA.clave_orden)
+        eliminados += [i for i in modificados if i not in visibles]
+        return respuesta_delta(cabeceras, vehiculos_json(cambios, plan), eliminados)
+    despues = leer_cursor(cursor)
+    clave, versiones, respuesta = desde_cache(request, (VERSIONES_FLOTA,), cabeceras)
+    if respuesta is not None:
+        return respuesta
+    if REPOSITORIO is not None:
+        resultado, siguiente = await REPOSITORIO.listar_vehiculos(
+            estado=estado, tipo=tipo, unidad=unidad, busqueda=busqueda, limite=limite, despues=despues
+        )
+    else:
+        ids = BUSQUEDA.buscar(busqueda) if busqueda else None
+        resultado, siguiente = FLOTA.buscar(
+            estado=estado, tipo=tipo, unidad=unidad, ids=ids, limite=limite, despues=despues
+        )
+    escribir_cursor(response, siguiente)
+    return a_cache(request, clave, versiones, vehiculos_json(resultado, plan), cabeceras={**response.headers, **cabeceras})
+
+@api_router.get("/vehiculos/autocompletar")
+async def autocompletar_placas(
+    prefijo: str = Query(min_length=1),
+    limite: int = Query(default=10, ge=1, le=50),
+):
+    """Sugerencias de placas: exactas, por prefijo y luego por coincidencia interna"""
+    sugerencias = []
+    for vehiculo_id in BUSQUEDA.autocompletar_placa(prefijo, limite):
+        v = FLOTA.obtener(vehiculo_id)
+        sugerencias.append({"id": v["id"], "placa": v["placa"], "tipo": v["tipo"], "estado": v["estado"]})
+    return sugerencias
 
 @api_router.get("/vehiculos/{vehiculo_id}", response_model=VehiculoResponse)
-async def obtener_vehiculo(vehiculo_id: str):
+async def obtener_vehiculo(
+    vehiculo_id: str,
+    campos: Optional[str] = Query(default=None, description=DESCRIPCION_CAMPOS),
+):
     """Obtener detalle de un vehículo"""
-    vehiculo = next((v for v in VEHICULOS if v["id"] == vehiculo_id), None)
+    plan = leer_campos(PROYECCIONES_VEHICULOS, campos)
+    if REPOSITORIO is not None:
+        vehiculo = await REPOSITORIO.obtener_vehiculo(vehiculo_id)
+    else:
+        vehiculo = FLOTA.obtener(vehiculo_id) or FLOTA.obtener_por_placa(vehiculo_id)
     if not vehiculo:
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
-    return vehiculo
+    if plan is not None:
+        return RespuestaJSON(plan(vehiculo))
+    return RespuestaJSON(FRAGMENTOS_VEHICULOS.fragmento(vehiculo))
+
+@api_router.post("/vehiculos/lote")
+async def obtener_vehiculos_lote(datos: LoteVehiculos):
+    """Detalle de muchos vehículos (por id o placa) y, si se piden, sus historiales, en una sola respuesta.
+
+    Devuelve `{vehiculos: [{vehiculo, historial_mantenimiento?, historial_combustible?}], no_encontrados}`
+    en el orden de `ids`; `desde`/`hasta` acotan los historiales como en sus endpoints.
+    """
+    plan = leer_campos(PROYECCIONES_VEHICULOS, datos.campos)
+    ids = list(dict.fromkeys(datos.ids))
+    if REPOSITORIO is not None:
+        por_clave = {}
+        for v in await REPOSITORIO.obtener_vehiculos(ids):
+            por_clave[v["id"]] = por_clave[v["placa"]] = v
+        vehiculos = [por_clave.get(i) or por_clave.get(i.upper()) for i in ids]
+    else:
+        vehiculos = [FLOTA.obtener(i) or FLOTA.obtener_por_placa(i) for i in ids]
+    partes, no_encontrados = [], []
+    for vehiculo_id, vehiculo in zip(ids, vehiculos):
+        if vehiculo is None:
+            no_encontrados.append(vehiculo_id)
+            continue
+        parte = b'{"vehiculo":' + (
+            FRAGMENTOS_VEHICULOS.fragmento(vehiculo) if plan is None else volcar(plan(vehiculo))
+        )
+        if datos.mantenimiento:
+            historial = HISTORIAL_MANTENIMIENTO.consultar(vehiculo["id"], datos.desde, datos.hasta)
+            parte += b',"historial_mantenimiento":' + volcar(historial)
+        if datos.combustible:
+            historial = HISTORIAL_COMBUSTIBLE.consultar(vehiculo["id"], datos.desde, datos.hasta)
+            parte += b',"historial_combustible":' + volcar(historial)
+        partes.append(parte + b"}")
+    return RespuestaJSON(
+        b'{"vehiculos":[' + b",".join(partes) + b'],"no_encontrados":' + volcar(no_encontrados) + b"}"
+    )
 
 @api_router.get("/vehiculos/{vehiculo_id}/historial-mantenimiento")
-async def obtener_historial_mantenimiento(vehiculo_id: str):
-    """Obtener historial de mantenimiento de un vehículo"""
-    return generar_historial_mantenimiento(vehiculo_id, 8)
+async def obtener_historial_mantenimiento(
+    vehiculo_id: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    agrupar: Optional[str] = Query(default=None, pattern="^(dia|semana)$"),
+):
+    """Obtener historial de mantenimiento de un vehículo, más reciente primero.
+    
+    `desde`/`hasta` acotan el rango de fechas; `agrupar=dia|semana` devuelve totales por periodo.
+    """
+    return HISTORIAL_MANTENIMIENTO.consultar(vehiculo_id, desde, hasta, agrupar)
 
 @api_router.get("/vehiculos/{vehiculo_id}/historial-combustible")
-async def obtener_historial_combustible(vehiculo_id: str):
-    """Obtener historial de combustible de un vehículo"""
-    return generar_historial_combustible(vehiculo_id, 12)
+async def obtener_historial_combustible(
+    vehiculo_id: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    agrupar: Optional[str] = Query(default=None, pattern="^(dia|semana)$"),
+):
+    """Obtener historial de combustible de un vehículo (mismos filtros que el de mantenimiento)"""
+    return HISTORIAL_COMBUSTIBLE.consultar(vehiculo_id, desde, hasta, agrupar)
 
 @api_router.get("/kpis", response_model=KPIResponse)
-async def obtener_kpis():
+async def obtener_kpis(request: Request):
     """Obtener KPIs estratégicos del dashboard"""
-    operativos = len([v for v in VEHICULOS if v["estado"] == "Operativo"])
-    mantenimiento = len([v for v in VEHICULOS if v["estado"] == "Mantenimiento"])
-    criticos = len([v for v in VEHICULOS if v["estado"] == "Crítico"])
-    reserva = len([v for v in VEHICULOS if v["estado"] == "Reserva"])
-    total = len(VEHICULOS)
+    if VERIFICAR_KPIS:
+        diferencias = KPIS.verificar(ALERTAS)
+        if diferencias:
+            logger.error("KPIs incrementales inconsistentes: %s", diferencias)
+    return responder_cacheado(request, (VERSIONES_FLOTA, VERSIONES_ALERTAS), calcular_kpis, ADAPTADOR_KPIS)
+
+def calcular_kpis():
+    resumen = KPIS.resumen()
+    por_estado = resumen["por_estado"]
+    operativos = por_estado.get("Operativo", 0)
+    mantenimiento = por_estado.get("Mantenimiento", 0)
+    criticos = por_estado.get("Crítico", 0)
+    reserva = por_estado.get("Reserva", 0)
+    total = resumen["total"]
     
-    alertas_activas = len([a for a in ALERTAS if not a["atendida"] and a["severidad"] == "alta"])
+    alertas_activas = resumen["alertas_criticas"]
     
-    # Calcular vehículos más utilizados (por kilometraje)
-    vehiculos_ordenados = sorted(VEHICULOS, key=lambda x: x["kilometraje"], reverse=True)[:5]
-    mas_utilizados = [{"placa": v["placa"], "kilometraje": v["kilometraje"], "tipo": v["tipo"]} for v in vehiculos_ordenados]
+    # Vehículos más utilizados (por kilometraje)
+    mas_utilizados = resumen["mas_utilizados"]
     
-    km_promedio = sum(v["kilometraje"] for v in VEHICULOS) // total
-    consumo_mensual = sum(v["consumo_promedio"] * 120 for v in VEHICULOS)  # Estimado mensual
+    km_promedio = resumen["suma_kilometraje"] // total
+    consumo_mensual = resumen["suma_consumo"] * 120  # Estimado mensual
     
     return {
         "porcentaje_flota_operativa": round((operativos / total) * 100, 1),
@@ -406,89 +916,320 @@ async def obtener_kpis():
 
 @api_router.get("/alertas", response_model=List[AlertaResponse])
 async def obtener_alertas(
+    request: Request,
+    response: Response,
     severidad: Optional[str] = None,
     atendida: Optional[bool] = None,
-    limite: int = Query(default=50, le=100)
+    limite: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    desde: Optional[int] = None,
 ):
-    """Obtener alertas del sistema"""
-    resultado = ALERTAS.copy()
-    
-    if severidad:
-        resultado = [a for a in resultado if a["severidad"] == severidad]
-    if atendida is not None:
-        resultado = [a for a in resultado if a["atendida"] == atendida]
-    
-    return resultado[:limite]
+    """Obtener alertas del sistema, más recientes primero (admite `desde=` como /vehiculos)"""
+    cabeceras = cabeceras_version(request, VERSIONES_ALERTAS.version)
+    respuesta = no_modificado(request, cabeceras)
+    if respuesta is not None:
+        return respuesta
+    if desde is not None:
+        modificados, eliminados = leer_cambios(VERSIONES_ALERTAS, desde)
+        cambios = [
+            a for a in map(ALERTAS.obtener, modificados)
+            if (not severidad or a["severidad"] == severidad) and (atendida is None or a["atendida"] == atendida)
+        ]
+        cambios.sort(key=ALERTAS.clave_orden, reverse=True)
+        visibles = {a["id"] for a in cambios}
+        eliminados += [i for i in modificados if i not in visibles]
+        return respuesta_delta(cabeceras, FRAGMENTOS_ALERTAS.lista(cambios), eliminados)
+    clave, versiones, respuesta = desde_cache(request, (VERSIONES_ALERTAS,), cabeceras)
+    if respuesta is not None:
+        return respuesta
+    despues = leer_cursor(cursor)
+    if REPOSITORIO is not None:
+        # La versión ya cuenta las alertas aún no escritas: se vuelcan antes de leer la base,
+        # si no la página quedaría en caché sin ellas bajo la versión nueva
+        await guardar_alertas_pendientes()
+        resultado, siguiente = await REPOSITORIO.listar_alertas(
+            severidad=severidad, atendida=atendida, limite=limite, despues=despues
+        )
+    else:
+        resultado, siguiente = ALERTAS.buscar(
+            severidad=severidad or None, atendida=atendida, limite=limite, despues=despues
+        )
+    escribir_cursor(response, siguiente)
+    return a_cache(
+        request, clave, versiones, FRAGMENTOS_ALERTAS.lista(resultado), cabeceras={**response.headers, **cabeceras}
+    )
+
+@api_router.patch("/alertas/atender")
+async def atender_alertas(datos: AtenderAlertas):
+    """Marcar muchas alertas como atendidas en una sola operación (un solo cambio de versión)"""
+    atendidas, no_encontradas = 0, []
+    with VERSIONES_ALERTAS.lote():
+        for alerta_id in dict.fromkeys(datos.ids):
+            alerta = ALERTAS.obtener(alerta_id)
+            if alerta is None:
+                no_encontradas.append(alerta_id)
+            elif not alerta["atendida"]:
+                ALERTAS.actualizar(alerta_id, {"atendida": True})
+                atendidas += 1
+    await guardar_alertas_pendientes()
+    return {"atendidas": atendidas, "no_encontradas": no_encontradas}
 
 @api_router.patch("/alertas/{alerta_id}/atender")
 async def atender_alerta(alerta_id: str):
     """Marcar alerta como atendida"""
-    for alerta in ALERTAS:
-        if alerta["id"] == alerta_id:
-            alerta["atendida"] = True
-            return {"mensaje": "Alerta marcada como atendida", "id": alerta_id}
-    raise HTTPException(status_code=404, detail="Alerta no encontrada")
+    if ALERTAS.obtener(alerta_id) is None:
+        raise HTTPException(status_code=404, detail="Alerta no encontrada")
+    ALERTAS.actualizar(alerta_id, {"atendida": True})
+    await guardar_alertas_pendientes()
+    return {"mensaje": "Alerta marcada como atendida", "id": alerta_id}
 
 @api_router.get("/estadisticas/consumo-mensual")
-async def obtener_consumo_mensual():
-    """Estadísticas de consumo de combustible por mes"""
-    meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-    return [
-        {"mes": mes, "consumo": round(random.uniform(3500, 5500), 0), "costo": round(random.uniform(9000, 14000), 2)}
-        for mes in meses
-    ]
+async def obtener_consumo_mensual(
+    request: Request,
+    anio: Optional[int] = None,
+    unidad: Optional[str] = None,
+    tipo: Optional[str] = None,
+):
+    """Galones y costo de combustible por mes del año (por defecto el actual), por unidad y tipo de vehículo"""
+    anio = anio or datetime.now(timezone.utc).year
+    return responder_cacheado(request, (HISTORIAL_COMBUSTIBLE,), lambda: [
+        {"mes": m["mes"], "consumo": round(m["consumo"], 0), "costo": round(m["costo"], 2)}
+        for m in RESUMEN_COMBUSTIBLE.mensual(anio, unidad, tipo)
+    ])
 
 @api_router.get("/estadisticas/mantenimiento-mensual")
-async def obtener_mantenimiento_mensual():
-    """Estadísticas de mantenimiento por mes"""
-    meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
-    return [
-        {"mes": mes, "preventivo": random.randint(15, 35), "correctivo": random.randint(5, 15), "costo": round(random.uniform(8000, 25000), 2)}
-        for mes in meses
-    ]
+async def obtener_mantenimiento_mensual(
+    request: Request,
+    anio: Optional[int] = None,
+    unidad: Optional[str] = None,
+    tipo: Optional[str] = None,
+):
+    """Mantenimientos preventivos, correctivos y su costo por mes (mismos filtros que consumo-mensual)"""
+    anio = anio or datetime.now(timezone.utc).year
+    return responder_cacheado(request, (HISTORIAL_MANTENIMIENTO,), lambda: [
+        {**m, "costo": round(m["costo"], 2)} for m in RESUMEN_MANTENIMIENTO.mensual(anio, unidad, tipo)
+    ])
 
 @api_router.get("/estadisticas/por-estado")
-async def obtener_estadisticas_estado():
+async def obtener_estadisticas_estado(request: Request):
     """Estadísticas de vehículos por estado"""
-    estados_count = {}
-    for v in VEHICULOS:
-        estados_count[v["estado"]] = estados_count.get(v["estado"], 0) + 1
-    return [{"estado": k, "cantidad": v} for k, v in estados_count.items()]
+    return responder_cacheado(request, (VERSIONES_FLOTA,), lambda: [
+        {"estado": k, "cantidad": v} for k, v in COLUMNAR.contar_por("estado")
+    ])
 
 @api_router.get("/estadisticas/por-tipo")
-async def obtener_estadisticas_tipo():
+async def obtener_estadisticas_tipo(request: Request):
     """Estadísticas de vehículos por tipo"""
-    tipos_count = {}
-    for v in VEHICULOS:
-        tipos_count[v["tipo"]] = tipos_count.get(v["tipo"], 0) + 1
-    return [{"tipo": k, "cantidad": v} for k, v in tipos_count.items()]
+    return responder_cacheado(request, (VERSIONES_FLOTA,), lambda: [
+        {"tipo": k, "cantidad": v} for k, v in COLUMNAR.contar_por("tipo")
+    ])
 
 @api_router.get("/estadisticas/por-unidad")
-async def obtener_estadisticas_unidad():
+async def obtener_estadisticas_unidad(request: Request):
     """Estadísticas de vehículos por unidad operativa"""
-    unidades_count = {}
-    for v in VEHICULOS:
-        unidades_count[v["unidad_operativa"]] = unidades_count.get(v["unidad_operativa"], 0) + 1
-    return [{"unidad": k, "cantidad": v} for k, v in unidades_count.items()]
+    return responder_cacheado(request, (VERSIONES_FLOTA,), lambda: [
+        {"unidad": k, "cantidad": v} for k, v in COLUMNAR.contar_por("unidad_operativa")
+    ])
+
+@api_router.get("/estadisticas/distribucion")
+async def obtener_distribucion(request: Request, campo: str = "kilometraje"):
+    """Mínimo, máximo, promedio y percentiles de un campo numérico de la flota"""
+    if campo not in COLUMNAS_NUMERICAS:
+        raise HTTPException(status_code=400, detail=f"Campo no soportado. Opciones: {', '.join(COLUMNAS_NUMERICAS)}")
+    return responder_cacheado(request, (VERSIONES_FLOTA,), lambda: {
+        "campo": campo, "total_vehiculos": len(COLUMNAR), "distribucion": COLUMNAR.distribucion(campo)
+    })
+
+@api_router.get("/cache/estadisticas")
+async def obtener_estadisticas_cache():
+    """Aciertos, fallos, desalojos y tamaño de la caché de respuestas"""
+    return CACHE.estadisticas()
+
+def leer_coordenadas(texto: str, cantidad: int, parametro: str):
+    """Convierte "a,b,..." en floats o responde 400"""
+    try:
+        valores = [float(x) for x in texto.split(",")]
+    except ValueError:
+        valores = []
+    if len(valores) != cantidad:
+        raise HTTPException(status_code=400, detail=f"`{parametro}` debe tener {cantidad} números separados por comas")
+    return valores
+
+def vehiculos_de_filas(filas):
+    """Vehículos vigentes correspondientes a filas de telemetría"""
+    vehiculos = (FLOTA.obtener(TELEMETRIA.vehiculo(f)) for f in filas)
+    return [v for v in vehiculos if v is not None]
+
+def ubicaciones_gps(vehiculos, plan=None):
+    """Última ubicación reportada de cada vehículo, con los campos del plan (todos por defecto)"""
+    plan = plan or PROYECCIONES_GPS.completa
+    if not plan.incluye(*CAMPOS_TELEMETRIA):
+        return [plan(v, None) for v in vehiculos]
+    lat, lng, velocidad, marca_tiempo, hay_dato = TELEMETRIA.ultimas(
+        [TELEMETRIA.registrar(v["id"]) for v in vehiculos]
+    )
+    lecturas = zip(lat.tolist(), lng.tolist(), velocidad.tolist(), marca_tiempo.tolist(), hay_dato.tolist())
+    return [plan(v, lectura) for v, lectura in zip(vehiculos, lecturas)]
 
 @api_router.get("/ubicaciones-gps")
-async def obtener_ubicaciones_gps():
-    """Obtener ubicaciones GPS de todos los vehículos"""
-    return [
-        {
-            "id": v["id"],
-            "placa": v["placa"],
-            "tipo": v["tipo"],
-            "estado": v["estado"],
-            "lat": v["ubicacion"]["lat"] + random.uniform(-0.01, 0.01),
-            "lng": v["ubicacion"]["lng"] + random.uniform(-0.01, 0.01),
-            "ubicacion_nombre": v["ubicacion"]["nombre"],
-            "responsable": v["responsable"],
-            "velocidad": random.randint(0, 80) if v["estado"] == "Operativo" else 0,
-            "ultimo_reporte": (datetime.now(timezone.utc) - timedelta(minutes=random.randint(1, 60))).isoformat(),
-        }
-        for v in VEHICULOS
-    ]
+async def obtener_ubicaciones_gps(
+    request: Request,
+    bbox: Optional[str] = Query(default=None, description="oeste,sur,este,norte (lng_min,lat_min,lng_max,lat_max)"),
+    cerca_de: Optional[str] = Query(default=None, description="lat,lng"),
+    radio_km: float = Query(default=5, gt=0, le=1000),
+    desde: Optional[int] = None,
+    campos: Optional[str] = Query(default=None, description=DESCRIPCION_CAMPOS),
+):
+    """Obtener la última ubicación GPS reportada, opcionalmente dentro de una caja o un radio.
+    
+    Con `desde=<X-Version>` devuelve solo los vehículos que se movieron o cambiaron después de esa versión.
+    `campos=placa,estado,lat,lng` limita los campos de cada ubicación.
+    """
+    plan = leer_campos(PROYECCIONES_GPS, campos)
+    cabeceras = cabeceras_version(request, VERSIONES_GPS.version)
+    respuesta = no_modificado(request, cabeceras)
+    if respuesta is not None:
+        return respuesta
+    if desde is not None:
+        modificados, eliminados = leer_cambios(VERSIONES_GPS, desde)
+        # El filtro geográfico necesita lat/lng aunque no se hayan pedido
+        filtro = plan
+        if plan is not None and (bbox or cerca_de):
+            filtro = PROYECCIONES_GPS.plan(plan.campos + ("lat", "lng"))
+        cambios = ubicaciones_gps([v for v in map(FLOTA.obtener, modificados) if v is not None], filtro)
+        if bbox:
+            oeste, sur, este, norte = leer_coordenadas(bbox, 4, "bbox")
+            cambios = [u for u in cambios if oeste <= u["lng"] <= este and sur <= u["lat"] <= norte]
+        elif cerca_de and cambios:
+            lat, lng = leer_coordenadas(cerca_de, 2, "cerca_de")
+            distancias = distancia_km(
+                lat, lng, np.array([u["lat"] for u in cambios]), np.array([u["lng"] for u in cambios])
+            ).tolist()
+            for ubicacion, distancia in zip(cambios, distancias):
+                ubicacion["distancia_km"] = round(distancia, 3)
+            cambios = [u for u, d in zip(cambios, distancias) if d <= radio_km]
+        if filtro is not plan:
+            cambios = [plan.recortar(u, ("distancia_km",)) for u in cambios]
+        visibles = {u["id"] for u in cambios}
+        eliminados += [i for i in modificados if i not in visibles]
+        return respuesta_delta(cabeceras, cambios, eliminados)
+    if bbox:
+        caja = leer_coordenadas(bbox, 4, "bbox")
+        calcular = lambda: ubicaciones_gps(vehiculos_de_filas(ESPACIAL.en_caja(*caja).tolist()), plan)
+    elif cerca_de:
+        lat, lng = leer_coordenadas(cerca_de, 2, "cerca_de")
+
+        def calcular():
+            filas, distancias = ESPACIAL.en_radio(lat, lng, radio_km)
+            distancia_por_id = {TELEMETRIA.vehiculo(f): d for f, d in zip(filas.tolist(), distancias.tolist())}
+            resultado = ubicaciones_gps(vehiculos_de_filas(filas.tolist()), plan)
+            for ubicacion in resultado:
+                ubicacion["distancia_km"] = round(distancia_por_id[ubicacion["id"]], 3)
+            return resultado
+    else:
+        calcular = lambda: ubicaciones_gps(list(FLOTA), plan)
+    return responder_cacheado(request, (VERSIONES_GPS,), calcular, cabeceras=cabeceras)
+
+@api_router.get("/ubicaciones-gps/stream")
+async def transmitir_ubicaciones_gps(
+    request: Request,
+    bbox: Optional[str] = Query(default=None, description="oeste,sur,este,norte (lng_min,lat_min,lng_max,lat_max)"),
+):
+    """Server-Sent Events: un evento `inicial` con las posiciones y luego solo los cambios.
+
+    `delta` trae las nuevas posiciones de vehículos ya enviados. Con `bbox`, `entrada` trae
+    completos los vehículos que entran en la caja y `salida` los ids de los que la dejan.
+    """
+    caja = leer_coordenadas(bbox, 4, "bbox") if bbox else None
+    suscripcion = DIFUSOR.suscribir(caja)
+    
+    def serializar(datos):
+        return json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+    
+    async def eventos():
+        try:
+            if caja:
+                filas = ESPACIAL.en_caja(*caja).tolist()
+                suscripcion.dentro.update(filas)
+                vehiculos = vehiculos_de_filas(filas)
+            else:
+                vehiculos = list(FLOTA)
+            yield f"retry: 5000\nevent: inicial\nid: {DIFUSOR.secuencia}\ndata: {serializar(ubicaciones_gps(vehiculos))}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(suscripcion.evento.wait(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                cambios, entradas, salidas = suscripcion.tomar()
+                if entradas:
+                    entrantes = serializar(ubicaciones_gps(vehiculos_de_filas(entradas)))
+                    yield f"event: entrada\nid: {DIFUSOR.secuencia}\ndata: {entrantes}\n\n"
+                if cambios:
+                    yield f"event: delta\nid: {DIFUSOR.secuencia}\ndata: [{','.join(cambios)}]\n\n"
+                if salidas:
+                    yield f"event: salida\nid: {DIFUSOR.secuencia}\ndata: {serializar(salidas)}\n\n"
+        finally:
+            DIFUSOR.cancelar(suscripcion)
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@api_router.get("/despacho/cercanos")
+async def obtener_disponibles_cercanos(
+    lugar: Optional[str] = Query(default=None, description="Nombre de una de las ubicaciones conocidas"),
+    cerca_de: Optional[str] = Query(default=None, description="lat,lng"),
+    cantidad: int = Query(default=5, ge=1, le=50),
+    radio_km: Optional[float] = Query(default=None, gt=0),
+):
+    """Vehículos disponibles más cercanos a una ubicación conocida o a un punto, para despacho"""
+    if lugar:
+        origen = next((u for u in UBICACIONES if u["nombre"].lower() == lugar.lower()), None)
+        if origen is None:
+            raise HTTPException(status_code=404, detail="Ubicación no encontrada")
+    elif cerca_de:
+        lat, lng = leer_coordenadas(cerca_de, 2, "cerca_de")
+        origen = {"nombre": None, "lat": lat, "lng": lng}
+    else:
+        raise HTTPException(status_code=400, detail="Indique `lugar` o `cerca_de`")
+    
+    def disponible(fila):
+        v = FLOTA.obtener(TELEMETRIA.vehiculo(fila))
+        return v is not None and v["disponibilidad"] == "Disponible"
+    
+    filas, distancias = ESPACIAL.cercanos(origen["lat"], origen["lng"], cantidad, disponible, radio_km)
+    resultado = ubicaciones_gps(vehiculos_de_filas(filas.tolist()))
+    for ubicacion, distancia in zip(resultado, distancias.tolist()):
+        ubicacion["distancia_km"] = round(distancia, 3)
+    return {"origen": origen, "vehiculos": resultado}
+
+@api_router.post("/telemetria/lote")
+async def ingerir_telemetria(request: Request):
+    """Ingesta masiva de posiciones GPS.
+    
+    Acepta NDJSON (una fijación por línea con `id` o `indice`, `lat`, `lng`, `velocidad`
+    y `marca_tiempo` en segundos epoch) o, con Content-Type application/octet-stream,
+    registros binarios contiguos de 32 bytes: u4 indice, f8 lat, f8 lng, f4 velocidad,
+    f8 marca_tiempo (little-endian). Las fijaciones de vehículos desconocidos, con valores
+    no finitos o con coordenadas fuera de rango se cuentan en `rechazados`.
+    """
+    datos = await request.body()
+    if request.headers.get("content-type", "").startswith("application/octet-stream"):
+        try:
+            aceptados, rechazados = TELEMETRIA.ingerir_binario(datos)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    else:
+        aceptados, rechazados = TELEMETRIA.ingerir_ndjson(datos)
+    return {"aceptados": aceptados, "rechazados": rechazados}
+
+@api_router.get("/telemetria/indices")
+async def obtener_indices_telemetria():
+    """Índice de fila de cada vehículo para armar lotes binarios"""
+    return TELEMETRIA.indices()
 
 @api_router.get("/usuarios")
 async def obtener_usuarios():
@@ -502,30 +1243,222 @@ async def obtener_usuarios():
     ]
 
 @api_router.get("/reportes/resumen")
-async def generar_reporte_resumen():
+async def generar_reporte_resumen(request: Request):
     """Generar datos para reporte de resumen"""
-    operativos = len([v for v in VEHICULOS if v["estado"] == "Operativo"])
-    mantenimiento = len([v for v in VEHICULOS if v["estado"] == "Mantenimiento"])
-    criticos = len([v for v in VEHICULOS if v["estado"] == "Crítico"])
+    # Solo los datos quedan en caché; `fecha_generacion` es la de cada petición
+    clave = f"{request.url.path}?{consulta_normalizada(request)}"
+    versiones = (VERSIONES_FLOTA.version, VERSIONES_ALERTAS.version)
+    guardado = CACHE.obtener(clave, versiones)
+    if guardado is not None:
+        contenido = guardado[0]
+    else:
+        contenido = volcar(calcular_reporte_resumen())
+        CACHE.guardar(clave, versiones, contenido)
+    fecha = volcar(datetime.now(timezone.utc).isoformat())
+    return RespuestaJSON(b'{"fecha_generacion":%b,%b' % (fecha, contenido[1:]))
+
+def calcular_reporte_resumen():
+    operativos = COLUMNAR.contar("estado", "Operativo")
+    mantenimiento = COLUMNAR.contar("estado", "Mantenimiento")
+    criticos = COLUMNAR.contar("estado", "Crítico")
+    consumo_total = COLUMNAR.suma("consumo_promedio") * 120
     
     return {
-        "fecha_generacion": datetime.now(timezone.utc).isoformat(),
         "periodo": "Enero 2026",
-        "total_vehiculos": len(VEHICULOS),
+        "total_vehiculos": len(COLUMNAR),
         "operativos": operativos,
         "mantenimiento": mantenimiento,
         "criticos": criticos,
-        "consumo_total_galones": round(sum(v["consumo_promedio"] * 120 for v in VEHICULOS), 0),
-        "costo_total_combustible": round(sum(v["consumo_promedio"] * 120 * 2.85 for v in VEHICULOS), 2),
+        "consumo_total_galones": round(consumo_total, 0),
+        "costo_total_combustible": round(consumo_total * 2.85, 2),
         "costo_total_mantenimiento": round(random.uniform(45000, 75000), 2),
-        "kilometraje_total_recorrido": sum(v["kilometraje"] for v in VEHICULOS),
+        "kilometraje_total_recorrido": COLUMNAR.suma("kilometraje"),
         "alertas_generadas": len(ALERTAS),
-        "alertas_atendidas": len([a for a in ALERTAS if a["atendida"]]),
+        "alertas_atendidas": sum(n for (_, atendida), n in ALERTAS.conteos().items() if atendida),
         "indice_eficiencia": round(random.uniform(82, 94), 1),
     }
 
-# Include the router
-app.include_router(api_router)
+# ==================== EXPORTACIÓN ====================
+
+BLOQUE_EXPORTACION = 1000
+PATRON_FORMATO = "^(csv|ndjson|xlsx)$"
+
+def respuesta_exportacion(nombre, bloques, columnas, formato, maximo):
+    """Descarga en streaming; `maximo` es una cota de filas para rechazar XLSX que no caben en una hoja"""
+    if formato == "xlsx" and maximo > MAX_FILAS_XLSX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"XLSX admite hasta {MAX_FILAS_XLSX} filas; use csv o ndjson, o acote los filtros",
+        )
+    archivo = f"{nombre}-{datetime.now(timezone.utc):%Y%m%d}.{formato}"
+    return StreamingResponse(
+        transmitir(codificar(bloques, columnas, formato)),
+        media_type=TIPOS_MEDIO[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
+
+def paginas(buscar, **filtros):
+    """Recorre un listado paginado por cursor, un bloque a la vez"""
+    despues = None
+    while True:
+        pagina, despues = buscar(limite=BLOQUE_EXPORTACION, despues=despues, **filtros)
+        yield pagina
+        if despues is None:
+            return
+
+@api_router.get("/exportar/vehiculos")
+async def exportar_vehiculos(
+    formato: str = Query(default="csv", pattern=PATRON_FORMATO),
+    estado: Optional[str] = None,
+    tipo: Optional[str] = None,
+    unidad: Optional[str] = None,
+    campos: Optional[str] = Query(default=None, description=DESCRIPCION_CAMPOS),
+):
+    """Exportar la flota (filtrada) ordenada por placa en CSV, NDJSON o XLSX"""
+    plan = leer_campos(PROYECCIONES_VEHICULOS, campos) or PROYECCIONES_VEHICULOS.completa
+    ids = FLOTA.candidatos(estado=estado, tipo=tipo, unidad=unidad)
+    predicado = None if ids is None else (lambda v: v["id"] in ids)
+    bloques = ([plan(v) for v in pagina] for pagina in paginas(FLOTA.buscar, predicado=predicado))
+    return respuesta_exportacion(
+        "vehiculos", bloques, plan.campos, formato, len(FLOTA) if ids is None else len(ids)
+    )
+
+@api_router.get("/exportar/alertas")
+async def exportar_alertas(
+    formato: str = Query(default="csv", pattern=PATRON_FORMATO),
+    severidad: Optional[str] = None,
+    atendida: Optional[bool] = None,
+):
+    """Exportar las alertas, más recientes primero"""
+    bloques = paginas(ALERTAS.buscar, severidad=severidad or None, atendida=atendida)
+    return respuesta_exportacion("alertas", bloques, tuple(AlertaResponse.model_fields), formato, len(ALERTAS))
+
+def columnas_historial(historial: AlmacenHistorial):
+    return ("vehiculo_id", "fecha", *historial.esquema.textos, *historial.esquema.numericas)
+
+@api_router.get("/exportar/historial-mantenimiento")
+async def exportar_historial_mantenimiento(
+    formato: str = Query(default="csv", pattern=PATRON_FORMATO),
+    vehiculo_id: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    """Exportar el historial de mantenimiento de toda la flota (o de un vehículo)"""
+    bloques = HISTORIAL_MANTENIMIENTO.recorrer(vehiculo_id, desde, hasta, BLOQUE_EXPORTACION)
+    return respuesta_exportacion(
+        "mantenimientos", bloques, columnas_historial(HISTORIAL_MANTENIMIENTO), formato, len(HISTORIAL_MANTENIMIENTO)
+    )
+
+@api_router.get("/exportar/historial-combustible")
+async def exportar_historial_combustible(
+    formato: str = Query(default="csv", pattern=PATRON_FORMATO),
+    vehiculo_id: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    """Exportar el historial de combustible de toda la flota (o de un vehículo)"""
+    bloques = HISTORIAL_COMBUSTIBLE.recorrer(vehiculo_id, desde, hasta, BLOQUE_EXPORTACION)
+    return respuesta_exportacion(
+        "combustibles", bloques, columnas_historial(HISTORIAL_COMBUSTIBLE), formato, len(HISTORIAL_COMBUSTIBLE)
+    )
+
+# ==================== MÉTRICAS ====================
+
+# Contadores e histogramas por ruta (MiddlewareMetricas) y estado de los almacenes,
+# calculado solo cuando se consulta /metrics
+METRICAS = Metricas()
+METRICAS.medir("vehiculos", "gauge", "Vehículos en la flota por estado.", lambda: FLOTA.conteos("estado"), ["estado"])
+METRICAS.medir(
+    "alertas", "gauge", "Alertas por severidad y si están atendidas.",
+    lambda: {(s, str(a).lower()): n for (s, a), n in ALERTAS.conteos().items()}, ["severidad", "atendida"],
+)
+METRICAS.medir(
+    "historial_registros", "gauge", "Registros de los historiales de mantenimiento y combustible.",
+    lambda: {"mantenimiento": len(HISTORIAL_MANTENIMIENTO), "combustible": len(HISTORIAL_COMBUSTIBLE)},
+    ["historial"],
+)
+METRICAS.medir(
+    "telemetria_reportes_total", "counter",
+    "Fijaciones GPS ingeridas (su rate() es el ritmo de ingesta).", lambda: TELEMETRIA.reportes_ingeridos,
+)
+METRICAS.medir(
+    "gps_suscriptores", "gauge", "Suscripciones abiertas al stream de posiciones.", lambda: len(DIFUSOR),
+)
+METRICAS.medir(
+    "gps_difusiones_total", "counter", "Ticks del stream de posiciones que enviaron cambios.",
+    lambda: DIFUSOR.secuencia,
+)
+METRICAS.medir(
+    "cache_consultas_total", "counter", "Consultas a la caché de respuestas por resultado.",
+    lambda: {"acierto": CACHE.aciertos, "fallo": CACHE.fallos}, ["resultado"],
+)
+METRICAS.medir("cache_desalojos_total", "counter", "Entradas desalojadas de la caché de respuestas.", lambda: CACHE.desalojos)
+METRICAS.medir("cache_entradas", "gauge", "Entradas en la caché de respuestas.", lambda: len(CACHE))
+METRICAS.medir("cache_bytes", "gauge", "Bytes en la caché de respuestas (variantes comprimidas incluidas).", lambda: CACHE.bytes)
+METRICAS.medir(
+    "sesiones_cache_consultas_total", "counter", "Verificaciones de token por resultado en la caché de sesiones.",
+    lambda: {"acierto": SESIONES.aciertos, "fallo": SESIONES.fallos}, ["resultado"],
+)
+METRICAS.medir("sesiones_cache_entradas", "gauge", "Tokens verificados en la caché de sesiones.", lambda: len(SESIONES))
+METRICAS.medir(
+    "indice_entradas", "gauge", "Entradas de los índices y cachés derivados de los almacenes.",
+    lambda: {
+        "busqueda": len(BUSQUEDA),
+        "espacial_celdas": len(ESPACIAL),
+        "telemetria": len(TELEMETRIA),
+        "versiones_flota": len(VERSIONES_FLOTA),
+        "versiones_alertas": len(VERSIONES_ALERTAS),
+        "versiones_gps": len(VERSIONES_GPS),
+        "fragmentos_vehiculos": len(FRAGMENTOS_VEHICULOS),
+        "fragmentos_alertas": len(FRAGMENTOS_ALERTAS),
+    },
+    ["indice"],
+)
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """Métricas en el formato de texto de Prometheus"""
+    return Response(content=METRICAS.exponer(), media_type=TIPO_METRICAS)
+
+# ==================== PERFILADO ====================
+
+# Perfiles cProfile de peticiones con X-Perfilar: 1 (y la clave de administración) o
+# elegidas al azar con probabilidad PERFILADO_MUESTREO entre las rutas de PERFILADO_RUTAS;
+# se conservan los últimos PERFILES_MAX en PERFILES_DIR
+PERFILADOR = Perfilador(
+    os.environ.get("PERFILES_DIR", str(ROOT_DIR / "perfiles")),
+    maximo=int(os.environ.get("PERFILES_MAX", 50)),
+    clave=ADMIN_CLAVE,
+    muestreo=float(os.environ.get("PERFILADO_MUESTREO", 0)),
+    rutas=[r for r in os.environ.get("PERFILADO_RUTAS", "").split(",") if r],
+)
+
+async def exigir_admin(sesion: dict = Depends(sesion_actual), x_admin_clave: Optional[str] = Header(default=None)):
+    """Dependencia de los endpoints de administración: rol Administrador o la clave de administración"""
+    if sesion["rol"] != ROL_ADMINISTRADOR and not PERFILADOR.autorizado(x_admin_clave):
+        raise HTTPException(status_code=403, detail="Se requiere el rol Administrador o la clave de administración")
+
+@api_router.get("/admin/perfiles", dependencies=[Depends(exigir_admin)])
+async def listar_perfiles():
+    """Capturas de perfilado guardadas, de la más reciente a la más antigua"""
+    return {
+        "capturas": PERFILADOR.capturas(),
+        "maximo": PERFILADOR.maximo,
+        "muestreo": PERFILADOR.muestreo,
+        "rutas": list(PERFILADOR.rutas),
+    }
+
+@api_router.get("/admin/perfiles/{archivo}", dependencies=[Depends(exigir_admin)])
+async def descargar_perfil(archivo: str):
+    """Descargar una captura (.pstats: pstats, snakeviz, flameprof)"""
+    ruta = PERFILADOR.archivo(archivo)
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(ruta, media_type="application/octet-stream", filename=archivo)
+
+# Include the routers
+app.include_router(publico_router)
+app.include_router(api_router, dependencies=[Depends(sesion_actual)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -533,13 +1466,115 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECERA_CURSOR, CABECERA_VERSION, "ETag", "X-Perfil"],
 )
+app.add_middleware(MiddlewareCompresion, minimo=COMPRESION_MINIMA)
+app.add_middleware(MiddlewarePerfilado, perfilador=PERFILADOR)
+# El último en añadirse envuelve a los demás: mide también la compresión y el tamaño enviado
+app.add_middleware(MiddlewareMetricas, metricas=METRICAS, lentas_ms=LENTAS_MS)
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# EventSource envía el token de sesión en `?token=`: que no quede en el log de accesos
+logging.getLogger("uvicorn.access").addFilter(FiltroToken())
+
+@app.on_event("startup")
+async def iniciar_persistencia():
+    """Con PERSISTENCIA=mongo crea los índices y siembra la base, o hidrata la memoria desde ella"""
+    global REPOSITORIO
+    if PERSISTENCIA != "mongo":
+        return
+    repositorio = RepositorioMongo(db, list(VehiculoResponse.model_fields), list(AlertaResponse.model_fields))
+    await repositorio.asegurar_indices()
+    if await repositorio.esta_vacio():
+        await repositorio.sembrar(FLOTA, ALERTAS, HISTORIAL_MANTENIMIENTO, HISTORIAL_COMBUSTIBLE)
+        logger.info("Base sembrada con %d vehículos y %d alertas", len(FLOTA), len(ALERTAS))
+    else:
+        await repositorio.completar_busqueda()
+        FLOTA.cargar(await repositorio.cargar_vehiculos())
+        ALERTAS.cargar(await repositorio.cargar_alertas())
+        RESUMEN_MANTENIMIENTO.limpiar()
+        HISTORIAL_MANTENIMIENTO.cargar(await repositorio.cargar_mantenimientos())
+        RESUMEN_COMBUSTIBLE.limpiar()
+        HISTORIAL_COMBUSTIBLE.cargar(await repositorio.cargar_combustibles())
+    REPOSITORIO = repositorio
+    # Retoma las alertas abiertas de la base y abre (y guarda) las que falten para el estado actual
+    MOTOR_REGLAS.reconstruir()
+
+# Serializa las escrituras: quien lee la base espera a que termine la que esté en curso
+BLOQUEO_ALERTAS = asyncio.Lock()
+
+async def guardar_alertas_pendientes():
+    """Escribe en MongoDB los cambios de alertas acumulados"""
+    if REPOSITORIO is None:
+        return
+    async with BLOQUEO_ALERTAS:
+        if not ALERTAS_PENDIENTES:
+            return
+        cambios = dict(ALERTAS_PENDIENTES)
+        ALERTAS_PENDIENTES.clear()
+        await REPOSITORIO.guardar_alertas(cambios)
+
+async def persistir_alertas(intervalo=2.0):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await guardar_alertas_pendientes()
+        except Exception:
+            logger.exception("No se pudieron guardar las alertas pendientes")
+
+@app.on_event("startup")
+async def iniciar_sesiones():
+    """Réplica de las versiones de sesión compartidas, o un único worker si están en memoria"""
+    if SESIONES.almacen.compartidas:
+        await SESIONES.almacen.asegurar_indices()
+        await SESIONES.sincronizar()
+        app.state.tarea_sesiones = asyncio.create_task(SESIONES.ejecutar())
+        return
+    bloqueo = open(BLOQUEO_WORKER, "w")
+    try:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        bloqueo.close()
+        raise RuntimeError(
+            "Con PERSISTENCIA=memoria las sesiones solo admiten un worker; "
+            f"otro proceso ya tiene {BLOQUEO_WORKER} (use PERSISTENCIA=mongo para varios)"
+        )
+    # Se mantiene abierto (y bloqueado) mientras viva el proceso
+    app.state.bloqueo_worker = bloqueo
+
+@app.on_event("startup")
+async def iniciar_difusion():
+    app.state.tarea_difusion = asyncio.create_task(DIFUSOR.ejecutar())
+
+@app.on_event("startup")
+async def iniciar_reglas():
+    app.state.tareas_alertas = [
+        asyncio.create_task(MOTOR_REGLAS.ejecutar()),
+        asyncio.create_task(persistir_alertas()),
+    ]
+
+@app.on_event("shutdown")
+async def detener_sesiones():
+    tarea = getattr(app.state, "tarea_sesiones", None)
+    if tarea is not None:
+        tarea.cancel()
+    bloqueo = getattr(app.state, "bloqueo_worker", None)
+    if bloqueo is not None:
+        bloqueo.close()
+        app.state.bloqueo_worker = None
+
+@app.on_event("shutdown")
+async def detener_difusion():
+    app.state.tarea_difusion.cancel()
+
+@app.on_event("shutdown")
+async def detener_reglas():
+    for tarea in app.state.tareas_alertas:
+        tarea.cancel()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -0,0 +1,142 @@
+"""Tokens de sesión firmados (JWT) y caché acotada de los ya verificados."""
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+class VersionesMemoria:
+    """Versiones de revocación guardadas en el propio proceso.
+
+    No se comparten ni sobreviven a un reinicio: solo sirven con un único
+    worker (``Sesiones`` además invalida los tokens de arranques anteriores).
+    """
+
+    compartidas = False
+
+    def __init__(self):
+        self._versiones = {}
+
+    async def cargar(self):
+        return dict(self._versiones)
+
+    async def obtener(self, usuario):
+        return self._versiones.get(usuario, 0)
+
+    async def incrementar(self, usuario):
+        self._versiones[usuario] = self._versiones.get(usuario, 0) + 1
+        return self._versiones[usuario]
+
+
+class Sesiones:
+    """Emite y verifica tokens HS256 con los claims ``sub``, ``rol``, ``unidad`` y ``ver``.
+
+    La revocación es por versión: ``revocar(usuario)`` incrementa la del
+    usuario en ``versiones`` (``VersionesMemoria`` o la colección de
+    MongoDB, compartida entre workers) y todo token emitido con una versión
+    anterior deja de valer. El proceso lleva una réplica local de las
+    versiones, que nunca retrocede: se actualiza al revocar, al verificar
+    un token nuevo (que consulta el almacén) y cada ``refresco`` segundos
+    con ``ejecutar``; un token con una versión mayor que la réplica indica
+    que la réplica está atrasada, no que el token sea inválido.
+
+    Un token verificado queda en una LRU de ``max_cache`` entradas durante
+    ``ttl_cache`` segundos (o hasta su ``exp``, si es antes): las peticiones
+    siguientes con el mismo token no vuelven a comprobar la firma ni a
+    consultar el almacén, solo comparan su versión con la réplica.
+    """
+
+    ALGORITMO = "HS256"
+
+    def __init__(self, secreto, versiones=None, duracion=8 * 3600, max_cache=10000, ttl_cache=300, refresco=5.0):
+        self.almacen = versiones if versiones is not None else VersionesMemoria()
+        if not self.almacen.compartidas:
+            # Las revocaciones en memoria se pierden al reiniciar: los tokens de un
+            # arranque anterior tampoco valen, para que un token revocado no reviva
+            secreto = f"{secreto}/{secrets.token_hex(16)}"
+        self._secreto = secreto
+        self.duracion = duracion
+        self.max_cache = max_cache
+        self.ttl_cache = ttl_cache
+        self.refresco = refresco
+        self._versiones = {}
+        self._cache = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _anotar(self, usuario, version):
+        if version > self._versiones.get(usuario, 0):
+            self._versiones[usuario] = version
+
+    async def sincronizar(self):
+        """Trae las versiones del almacén a la réplica local."""
+        for usuario, version in (await self.almacen.cargar()).items():
+            self._anotar(usuario, version)
+
+    async def ejecutar(self):
+        """Refresco periódico de la réplica; se lanza como tarea de fondo con un almacén compartido."""
+        while True:
+            await asyncio.sleep(self.refresco)
+            try:
+                await self.sincronizar()
+            except Exception:
+                logger.exception("No se pudieron leer las versiones de sesión")
+
+    async def emitir(self, usuario, rol, unidad):
+        version = await self.almacen.obtener(usuario)
+        self._anotar(usuario, version)
+        ahora = int(time.time())
+        return jwt.encode(
+            {
+                "sub": usuario,
+                "rol": rol,
+                "unidad": unidad,
+                "ver": version,
+                "iat": ahora,
+                "exp": ahora + self.duracion,
+                "jti": secrets.token_hex(8),
+            },
+            self._secreto,
+            algorithm=self.ALGORITMO,
+        )
+
+    async def verificar(self, token):
+        """Claims del token (no modificarlos: se comparten entre peticiones); ``ValueError`` si no vale."""
+        ahora = time.time()
+        entrada = self._cache.get(token)
+        if entrada is not None:
+            sesion, vence = entrada
+            if ahora < vence and sesion["ver"] >= self._versiones.get(sesion["sub"], 0):
+                self._cache.move_to_end(token)
+                self.aciertos += 1
+                return sesion
+            del self._cache[token]
+        self.fallos += 1
+        try:
+            sesion = jwt.decode(
+                token, self._secreto, algorithms=[self.ALGORITMO],
+                options={"require": ["sub", "rol", "unidad", "ver", "exp"]},
+            )
+        except jwt.ExpiredSignatureError:
+            raise ValueError("Sesión expirada") from None
+        except jwt.PyJWTError:
+            raise ValueError("Token inválido") from None
+        self._anotar(sesion["sub"], await self.almacen.obtener(sesion["sub"]))
+        if sesion["ver"] < self._versiones.get(sesion["sub"], 0):
+            raise ValueError("Sesión revocada")
+        self._cache[token] = (sesion, min(sesion["exp"], ahora + self.ttl_cache))
+        if len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        return sesion
+
+    async def revocar(self, usuario):
+        """Invalida todos los tokens emitidos hasta ahora para ``usuario``."""
+        self._anotar(usuario, await self.almacen.incrementar(usuario))
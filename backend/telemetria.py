@@ -0,0 +1,192 @@
+"""Ingesta de telemetría GPS en búferes circulares preasignados por vehículo."""
+import json
+
+import numpy as np
+
+# Registro binario compacto: índice de vehículo (ver /telemetria/indices) + fijación
+DTYPE_REPORTE = np.dtype([
+    ("indice", "<u4"),
+    ("lat", "<f8"),
+    ("lng", "<f8"),
+    ("velocidad", "<f4"),
+    ("marca_tiempo", "<f8"),
+])
+# Marcas de tiempo aceptadas, en segundos epoch: de 1970 a fines del año 9999
+# (el máximo que `datetime.fromtimestamp` puede representar)
+MARCA_TIEMPO_MAXIMA = 253402300799.0
+
+
+class BufferTelemetria:
+    """Últimas ``fijaciones`` posiciones de cada vehículo en arreglos 2-D.
+
+    Cada vehículo ocupa una fila fija (nunca se reutiliza) y sus
+    posiciones un anillo de longitud ``fijaciones``. La ingesta de un lote
+    se hace con operaciones vectorizadas: no se crea ningún objeto por
+    punto, solo se escribe en los arreglos ya reservados.
+    """
+
+    def __init__(self, fijaciones=32, capacidad=1024):
+        self.fijaciones = fijaciones
+        self._lat = np.zeros((capacidad, fijaciones), np.float64)
+        self._lng = np.zeros((capacidad, fijaciones), np.float64)
+        self._velocidad = np.zeros((capacidad, fijaciones), np.float32)
+        self._marca_tiempo = np.zeros((capacidad, fijaciones), np.float64)
+        self._cabeza = np.zeros(capacidad, np.int64)
+        self._cantidad = np.zeros(capacidad, np.int64)
+        self._fila_por_id = {}
+        self._id_por_fila = []
+        self._suscriptores = []
+        self.reportes_ingeridos = 0
+
+    def __len__(self):
+        return len(self._id_por_fila)
+
+    def fila(self, vehiculo_id):
+        return self._fila_por_id.get(vehiculo_id)
+
+    def vehiculo(self, fila):
+        return self._id_por_fila[fila]
+
+    def indices(self):
+        """Mapa id -> índice de fila, para clientes que envían registros binarios."""
+        return dict(self._fila_por_id)
+
+    def registrar(self, vehiculo_id):
+        """Reserva la fila del vehículo (idempotente) y devuelve su índice."""
+        fila = self._fila_por_id.get(vehiculo_id)
+        if fila is not None:
+            return fila
+        fila = len(self._id_por_fila)
+        if fila == len(self._cabeza):
+            self._crecer()
+        self._fila_por_id[vehiculo_id] = fila
+        self._id_por_fila.append(vehiculo_id)
+        return fila
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de ``AlmacenFlota``: reserva filas para los vehículos nuevos."""
+        if anterior is None and nuevo is not None:
+            self.registrar(nuevo["id"])
+
+    def suscribir(self, funcion):
+        """Registra ``funcion(filas)``, llamada con las filas distintas de cada lote ingerido."""
+        self._suscriptores.append(funcion)
+
+    def _crecer(self):
+        for nombre in ("_lat", "_lng", "_velocidad", "_marca_tiempo", "_cabeza", "_cantidad"):
+            arreglo = getattr(self, nombre)
+            setattr(self, nombre, np.concatenate([arreglo, np.zeros_like(arreglo)]))
+
+    # ---------- Ingesta ----------
+
+    def ingerir(self, filas, lat, lng, velocidad, marca_tiempo):
+        """Escribe un lote de fijaciones; devuelve cuántas se aceptaron.
+
+        Se descartan las de vehículos desconocidos y las que no tienen
+        valores finitos, latitud en [-90, 90], longitud en [-180, 180],
+        velocidad no negativa y marca de tiempo en [0, ``MARCA_TIEMPO_MAXIMA``]. Dentro del lote los reportes se ordenan por (fila, marca de tiempo)
+        y a cada uno se le asigna su rango dentro de su vehículo, así
+        varios reportes del mismo vehículo ocupan posiciones consecutivas
+        del anillo. Si un vehículo trae más reportes que el tamaño del
+        anillo solo se conservan los más recientes.
+        """
+        filas = np.asarray(filas, np.int64)
+        lat = np.asarray(lat, np.float64)
+        lng = np.asarray(lng, np.float64)
+        velocidad = np.asarray(velocidad, np.float32)
+        marca_tiempo = np.asarray(marca_tiempo, np.float64)
+        # Las comparaciones con NaN son falsas: también descartan los valores no numéricos
+        with np.errstate(invalid="ignore"):
+            validos = (
+                (filas >= 0) & (filas < len(self._id_por_fila))
+                & (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+                & (velocidad >= 0) & np.isfinite(velocidad)
+                & (marca_tiempo >= 0) & (marca_tiempo <= MARCA_TIEMPO_MAXIMA)
+            )
+        if not validos.all():
+            filas, lat, lng, velocidad, marca_tiempo = (
+                a[validos] for a in (filas, lat, lng, velocidad, marca_tiempo)
+            )
+        if not len(filas):
+            return 0
+        aceptados = len(filas)
+        orden = np.lexsort((marca_tiempo, filas))
+        filas = filas[orden]
+        inicios = np.flatnonzero(np.r_[True, filas[1:] != filas[:-1]])
+        cantidades = np.diff(np.r_[inicios, len(filas)])
+        rango = np.arange(len(filas)) - np.repeat(inicios, cantidades)
+        conservar = rango >= np.repeat(cantidades, cantidades) - self.fijaciones
+        unicas = filas[inicios]
+        posiciones = (self._cabeza[filas] + rango) % self.fijaciones
+        filas, posiciones, orden = filas[conservar], posiciones[conservar], orden[conservar]
+        self._lat[filas, posiciones] = lat[orden]
+        self._lng[filas, posiciones] = lng[orden]
+        self._velocidad[filas, posiciones] = velocidad[orden]
+        self._marca_tiempo[filas, posiciones] = marca_tiempo[orden]
+        self._cabeza[unicas] = (self._cabeza[unicas] + cantidades) % self.fijaciones
+        self._cantidad[unicas] = np.minimum(self._cantidad[unicas] + cantidades, self.fijaciones)
+        self.reportes_ingeridos += aceptados
+        for funcion in self._suscriptores:
+            funcion(unicas)
+        return aceptados
+
+    def ingerir_binario(self, datos):
+        """Lote de registros ``DTYPE_REPORTE`` contiguos (little-endian)."""
+        if len(datos) % DTYPE_REPORTE.itemsize:
+            raise ValueError(f"El lote binario debe ser múltiplo de {DTYPE_REPORTE.itemsize} bytes")
+        registros = np.frombuffer(datos, DTYPE_REPORTE)
+        aceptados = self.ingerir(
+            registros["indice"], registros["lat"], registros["lng"],
+            registros["velocidad"], registros["marca_tiempo"],
+        )
+        return aceptados, len(registros) - aceptados
+
+    def ingerir_ndjson(self, datos):
+        """Una fijación JSON por línea: ``id`` o ``indice``, ``lat``, ``lng``, ``velocidad``, ``marca_tiempo``."""
+        filas, lat, lng, velocidad, marca_tiempo = [], [], [], [], []
+        rechazados = 0
+        for linea in datos.splitlines():
+            if not linea.strip():
+                continue
+            try:
+                reporte = json.loads(linea)
+                fila = int(reporte["indice"]) if "indice" in reporte else self._fila_por_id[reporte["id"]]
+                if not 0 <= fila < len(self._id_por_fila):
+                    raise KeyError(fila)
+                valores = (float(reporte["lat"]), float(reporte["lng"]),
+                           float(reporte.get("velocidad", 0)), float(reporte["marca_tiempo"]))
+            except (ValueError, KeyError, TypeError, OverflowError):
+                rechazados += 1
+                continue
+            filas.append(fila)
+            lat.append(valores[0])
+            lng.append(valores[1])
+            velocidad.append(valores[2])
+            marca_tiempo.append(valores[3])
+        aceptados = self.ingerir(filas, lat, lng, velocidad, marca_tiempo)
+        return aceptados, rechazados + len(filas) - aceptados
+
+    # ---------- Lectura ----------
+
+    def ultimas(self, filas):
+        """Última fijación de cada fila como arreglos ``(lat, lng, velocidad, marca_tiempo, hay_dato)``."""
+        filas = np.asarray(filas, np.int64)
+        posiciones = (self._cabeza[filas] - 1) % self.fijaciones
+        return (
+            self._lat[filas, posiciones],
+            self._lng[filas, posiciones],
+            self._velocidad[filas, posiciones],
+            self._marca_tiempo[filas, posiciones],
+            self._cantidad[filas] > 0,
+        )
+
+    def recorrido(self, fila):
+        """Fijaciones guardadas de un vehículo, de la más antigua a la más reciente."""
+        cantidad = int(self._cantidad[fila])
+        posiciones = (self._cabeza[fila] - cantidad + np.arange(cantidad)) % self.fijaciones
+        return {
+            "lat": self._lat[fila, posiciones].tolist(),
+            "lng": self._lng[fila, posiciones].tolist(),
+            "velocidad": self._velocidad[fila, posiciones].tolist(),
+            "marca_tiempo": self._marca_tiempo[fila, posiciones].tolist(),
+        }
@@ -0,0 +1,125 @@
+"""Versionado monótono de colecciones para consultas incrementales (`desde=`)."""
+import secrets
+from bisect import bisect_right
+from contextlib import contextmanager
+
+# Cada proceso numera sus versiones dentro de un tramo propio de 2**32; hay 2**20 tramos, así
+# que la versión más alta posible (2**52) sigue siendo un entero exacto en JSON/JavaScript
+TRAMO_VERSIONES = 2 ** 32
+TRAMOS_VERSIONES = 2 ** 20
+
+
+def version_inicial():
+    """Base de numeración para un proceso: el inicio de un tramo elegido al azar.
+
+    Las versiones viven en la memoria de cada worker y no se comparten. Con
+    tramos disjuntos, una versión (``desde=``, ``ETag``) emitida por otro
+    worker o por un proceso anterior queda fuera de ``[horizonte, version]``
+    y se responde con el listado completo o un 410, nunca con un 304 o un
+    delta equivocados. Los deltas y 304 sólo ahorran tráfico si el balanceador
+    enruta cada cliente siempre al mismo worker (sesiones pegajosas).
+    """
+    return (1 + secrets.randbelow(TRAMOS_VERSIONES - 1)) * TRAMO_VERSIONES
+
+
+
+class RegistroVersiones:
+    """Versión global de una colección y versión de última modificación por registro.
+
+    Cada cambio agrega ``(version, id)`` a un log ordenado por versión, así
+    que los cambios posteriores a ``desde`` se encuentran con una búsqueda
+    binaria y cuestan O(log n + cambios). Las entradas viejas de un
+    registro que volvió a cambiar se saltan al leer y se descartan al
+    compactar el log. Las eliminaciones quedan como lápidas; al compactar
+    se olvidan las anteriores a ``horizonte`` y un cliente con una versión
+    más vieja debe volver a pedir el listado completo.
+
+    ``inicial`` permite arrancar la numeración en un valor que no se repita
+    entre procesos (ver ``version_inicial``), así una versión emitida por
+    otro worker o por un proceso anterior cae fuera del rango válido. Con
+    ``campos``, ``sincronizar`` ignora las actualizaciones que no tocan
+    ninguno de ellos.
+    """
+
+    def __init__(self, inicial=0, max_lapidas=10000, campos=None):
+        self.version = inicial
+        self.horizonte = inicial
+        self.max_lapidas = max_lapidas
+        self.campos = campos
+        self._en_lote = False
+        self._version_por_id = {}
+        self._lapidas = {}
+        self._log_versiones = []
+        self._log_ids = []
+
+    def __len__(self):
+        return len(self._version_por_id)
+
+    @contextmanager
+    def lote(self):
+        """Agrupa todos los cambios hechos dentro del bloque bajo un único incremento de versión."""
+        if self._en_lote:
+            yield
+            return
+        self.version += 1
+        self._en_lote = True
+        try:
+            yield
+        finally:
+            self._en_lote = False
+
+    def marcar(self, ids, eliminados=()):
+        """Registra un cambio (un solo incremento de versión para todo el lote)."""
+        if not self._en_lote:
+            self.version += 1
+        version = self.version
+        for registro_id in ids:
+            self._lapidas.pop(registro_id, None)
+            self._version_por_id[registro_id] = version
+            self._log_versiones.append(version)
+            self._log_ids.append(registro_id)
+        for registro_id in eliminados:
+            self._version_por_id.pop(registro_id, None)
+            self._lapidas[registro_id] = version
+            self._log_versiones.append(version)
+            self._log_ids.append(registro_id)
+        if (
+            len(self._log_ids) > 2 * (len(self._version_por_id) + len(self._lapidas)) + 1024
+            or len(self._lapidas) > 2 * self.max_lapidas
+        ):
+            self._compactar()
+        return version
+
+    def sincronizar(self, anterior, nuevo):
+        """Suscriptor de los almacenes: ``marcar`` con el id afectado."""
+        if nuevo is None:
+            self.marcar((), (anterior["id"],))
+        elif anterior is None or self.campos is None or any(anterior.get(c) != nuevo.get(c) for c in self.campos):
+            self.marcar((nuevo["id"],))
+
+    def cambios_desde(self, desde):
+        """``(modificados, eliminados)`` después de ``desde``, o ``None`` si hay que resincronizar."""
+        if desde < self.horizonte or desde > self.version:
+            return None
+        modificados, eliminados = [], []
+        inicio = bisect_right(self._log_versiones, desde)
+        for posicion in range(inicio, len(self._log_ids)):
+            registro_id = self._log_ids[posicion]
+            version = self._log_versiones[posicion]
+            if self._version_por_id.get(registro_id) == version:
+                modificados.append(registro_id)
+            elif self._lapidas.get(registro_id) == version:
+                eliminados.append(registro_id)
+        # Un id puede repetirse dentro de un mismo lote; conservar la primera aparición
+        return list(dict.fromkeys(modificados)), list(dict.fromkeys(eliminados))
+
+    def _compactar(self):
+        if len(self._lapidas) > self.max_lapidas:
+            conservadas = sorted(self._lapidas.items(), key=lambda x: x[1])[-self.max_lapidas:]
+            self.horizonte = conservadas[0][1] - 1
+            self._lapidas = dict(conservadas)
+        vigentes = sorted(
+            [(v, i) for i, v in self._version_por_id.items()] + [(v, i) for i, v in self._lapidas.items()]
+        )
+        self._log_versiones = [v for v, _ in vigentes]
+        self._log_ids = [i for _, i in vigentes]
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la API del Sistema de Gestión Vehicular Naval
+Levanta la app por cada tamaño de flota (en proceso o con uvicorn), recorre todas las
+rutas de /api con peticiones concurrentes y reporta rendimiento y latencias p50/p95/p99.
+Con una línea base guardada falla si alguna ruta empeora más que la tolerancia.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+RAIZ = Path(__file__).parent
+BACKEND = RAIZ / "backend"
+LINEA_BASE = RAIZ / "test_reports" / "benchmark_baseline.json"
+TAMANIOS = "120,10000,100000,1000000"
+
+# Rutas que no se pueden medir como petición/respuesta
+OMITIDAS = {
+    "GET /api/ubicaciones-gps/stream": "SSE sin fin",
+    "POST /api/auth/logout": "revoca el token del benchmark",
+    "POST /api/auth/revocar/{usuario}": "revoca el token del benchmark",
+}
+# Rutas cuyo costo crece con toda la flota: se miden con menos peticiones
+PESADAS = {
+    "GET /api/exportar/vehiculos",
+    "GET /api/exportar/alertas",
+    "GET /api/exportar/historial-mantenimiento",
+    "GET /api/exportar/historial-combustible",
+}
+
+
+def escenarios(muestra):
+    """Petición de ejemplo para las rutas con parámetros obligatorios, cuerpo o ruta variable"""
+    vehiculo, alerta = muestra["vehiculo"], muestra["alerta"]
+    fijaciones = "".join(
+        json.dumps({"id": vehiculo["id"], "lat": -2.2 + i / 1000, "lng": -79.9, "velocidad": 40,
+                    "marca_tiempo": int(time.time())}) + "\n"
+        for i in range(50)
+    )
+    return {
+        "POST /api/auth/login": {"json": {"usuario": "admin", "clave": "naval2024"}},
+        "GET /api/vehiculos/autocompletar": {"params": {"prefijo": vehiculo["placa"][:2]}},
+        "GET /api/vehiculos/{vehiculo_id}": {"ruta": {"vehiculo_id": vehiculo["id"]}},
+        "POST /api/vehiculos/lote": {
+            "json": {"ids": muestra["vehiculos"], "mantenimiento": True, "combustible": True}
+        },
+        "GET /api/vehiculos/{vehiculo_id}/historial-mantenimiento": {"ruta": {"vehiculo_id": vehiculo["id"]}},
+        "GET /api/vehiculos/{vehiculo_id}/historial-combustible": {"ruta": {"vehiculo_id": vehiculo["id"]}},
+        "PATCH /api/alertas/atender": {"json": {"ids": muestra["alertas"]}},
+        "PATCH /api/alertas/{alerta_id}/atender": {"ruta": {"alerta_id": alerta["id"]}},
+        "GET /api/despacho/cercanos": {"params": {"lugar": "Base Naval Sur - Guayaquil"}},
+        "POST /api/telemetria/lote": {"content": fijaciones, "headers": {"Content-Type": "application/x-ndjson"}},
+        "GET /api/ubicaciones-gps": {"params": {"campos": "placa,estado,lat,lng"}},
+        "GET /api/exportar/historial-combustible": {"params": {"vehiculo_id": vehiculo["id"]}},
+    }
+
+
+def percentil(ordenadas, p):
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not ordenadas:
+        return None
+    indice = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+class BenchmarkAPI:
+    def __init__(self, cliente, peticiones=200, pesadas=10, concurrencia=16, calentamiento=2):
+        self.cliente = cliente
+        self.peticiones = peticiones
+        self.pesadas = pesadas
+        self.concurrencia = concurrencia
+        self.calentamiento = calentamiento
+
+    async def rutas(self):
+        """(método, ruta, parámetros obligatorios) de cada operación de /api según el OpenAPI"""
+        esquema = (await self.cliente.get("/openapi.json")).json()
+        for ruta, operaciones in esquema["paths"].items():
+            if not ruta.startswith("/api"):
+                continue
+            for metodo, operacion in operaciones.items():
+                obligatorios = [
+                    p["name"] for p in operacion.get("parameters", []) if p.get("required")
+                ]
+                yield metodo.upper(), ruta, obligatorios, "requestBody" in operacion
+
+    async def muestra(self):
+        vehiculos = (await self.cliente.get("/api/vehiculos", params={"limite": 100})).json()
+        alertas = (await self.cliente.get("/api/alertas", params={"limite": 100})).json()
+        return {
+            "vehiculo": vehiculos[0],
+            "vehiculos": [v["id"] for v in vehiculos],
+            "alerta": alertas[0],
+            "alertas": [a["id"] for a in alertas],
+        }
+
+    async def medir(self, metodo, ruta, escenario, peticiones):
+        url = ruta.format(**escenario.get("ruta", {}))
+        opciones = {k: v for k, v in escenario.items() if k != "ruta"}
+        latencias, errores = [], 0
+
+        async def pedir():
+            inicio = time.perf_counter()
+            respuesta = await self.cliente.request(metodo, url, **opciones)
+            return time.perf_counter() - inicio, respuesta.status_code
+
+        for _ in range(self.calentamiento):
+            await pedir()
+        pendientes = iter(range(peticiones))
+
+        async def trabajador():
+            nonlocal errores
+            for _ in pendientes:
+                duracion, estado = await pedir()
+                latencias.append(duracion)
+                errores += estado >= 400
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(self.concurrencia)))
+        total = time.perf_counter() - inicio
+        latencias.sort()
+        return {
+            "rps": round(len(latencias) / total, 1),
+            "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+            "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+            "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+            "errores": errores,
+        }
+
+    async def autenticar(self):
+        respuesta = await self.cliente.post("/api/auth/login", json={"usuario": "admin", "clave": "naval2024"})
+        respuesta.raise_for_status()
+        self.cliente.headers["Authorization"] = f"Bearer {respuesta.json()['token']}"
+
+    async def ejecutar(self):
+        await self.autenticar()
+        ejemplos = escenarios(await self.muestra())
+        resultados = {}
+        async for metodo, ruta, obligatorios, cuerpo in self.rutas():
+            nombre = f"{metodo} {ruta}"
+            if nombre in OMITIDAS:
+                print(f"⏭️  {nombre} - omitida: {OMITIDAS[nombre]}", file=sys.stderr)
+                continue
+            escenario = ejemplos.get(nombre)
+            if escenario is None and (obligatorios or cuerpo):
+                print(f"⏭️  {nombre} - omitida: sin escenario", file=sys.stderr)
+                continue
+            peticiones = self.pesadas if nombre in PESADAS else self.peticiones
+            resultados[nombre] = await self.medir(metodo, ruta, escenario or {}, peticiones)
+            r = resultados[nombre]
+            print(
+                f"  {nombre:<60} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  "
+                f"p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  errores {r['errores']}",
+                file=sys.stderr,
+            )
+        return resultados
+
+
+def medidor(cliente, argumentos):
+    return BenchmarkAPI(cliente, argumentos.peticiones, argumentos.pesadas, argumentos.concurrencia)
+
+
+def entorno(tamanio):
+    variables = dict(os.environ, FLOTA_TAMANIO=str(tamanio))
+    variables.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    variables.setdefault("DB_NAME", "benchmark")
+    return variables
+
+
+async def medir_en_proceso(argumentos):
+    """Se ejecuta en un proceso hijo por tamaño: importa la app y la mide sin red"""
+    sys.path.insert(0, str(BACKEND))
+    os.chdir(BACKEND)
+    import server
+
+    transporte = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=None) as cliente:
+        resultados = await medidor(cliente, argumentos).ejecutar()
+    print(json.dumps(resultados))
+
+
+async def medir_con_uvicorn(tamanio, argumentos):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        puerto = s.getsockname()[1]
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(puerto), "--log-level", "warning"],
+        cwd=BACKEND, env=entorno(tamanio),
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=None) as cliente:
+            while True:
+                if proceso.poll() is not None:
+                    raise RuntimeError(f"uvicorn terminó con código {proceso.returncode}")
+                try:
+                    if (await cliente.get("/api/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.5)
+            return await medidor(cliente, argumentos).ejecutar()
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def medir_tamanio(tamanio, argumentos):
+    print(f"\n🚢 Flota de {tamanio} vehículos ({argumentos.modo})", file=sys.stderr)
+    if argumentos.modo == "uvicorn":
+        return asyncio.run(medir_con_uvicorn(tamanio, argumentos))
+    salida = subprocess.run(
+        [sys.executable, __file__, "--hijo", "--peticiones", str(argumentos.peticiones),
+         "--pesadas", str(argumentos.pesadas), "--concurrencia", str(argumentos.concurrencia)],
+        env=entorno(tamanio), stdout=subprocess.PIPE, check=True,
+    )
+    return json.loads(salida.stdout.decode().strip().splitlines()[-1])
+
+
+def comparar(resultados, linea_base, tolerancia):
+    """Regresiones: rendimiento menor o p95 mayor que la línea base más la tolerancia"""
+    regresiones = []
+    for tamanio, rutas in resultados.items():
+        for nombre, actual in rutas.items():
+            base = linea_base.get(tamanio, {}).get(nombre)
+            if base is None:
+                continue
+            if actual["rps"] * (1 + tolerancia) < base["rps"]:
+                regresiones.append(f"{tamanio} {nombre}: {actual['rps']} req/s (base {base['rps']})")
+            if actual["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+                regresiones.append(f"{tamanio} {nombre}: p95 {actual['p95_ms']} ms (base {base['p95_ms']})")
+            if actual["errores"] > base["errores"]:
+                regresiones.append(f"{tamanio} {nombre}: {actual['errores']} errores (base {base['errores']})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanios", default=TAMANIOS, help="Tamaños de flota separados por coma")
+    parser.add_argument("--modo", choices=("proceso", "uvicorn"), default="proceso")
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones medidas por ruta")
+    parser.add_argument("--pesadas", type=int, default=10, help="Peticiones medidas por exportación")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--linea-base", type=Path, default=LINEA_BASE)
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento admitido (0.25 = 25%%)")
+    parser.add_argument("--guardar", action="store_true", help="Guardar los resultados como línea base")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    argumentos = parser.parse_args()
+
+    if argumentos.hijo:
+        asyncio.run(medir_en_proceso(argumentos))
+        return 0
+
+    resultados = {}
+    for tamanio in (int(t) for t in argumentos.tamanios.split(",")):
+        resultados[str(tamanio)] = medir_tamanio(tamanio, argumentos)
+
+    # La línea base se separa por modo: en proceso no hay red ni servidor HTTP
+    guardada = json.loads(argumentos.linea_base.read_text()) if argumentos.linea_base.exists() else {}
+    linea_base = guardada.get(argumentos.modo, {})
+    if argumentos.guardar:
+        guardada[argumentos.modo] = {**linea_base, **resultados}
+        argumentos.linea_base.write_text(json.dumps(guardada, indent=2, ensure_ascii=False) + "\n")
+        print(f"\n💾 Línea base guardada en {argumentos.linea_base}")
+        return 0
+    regresiones = comparar(resultados, linea_base, argumentos.tolerancia)
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones frente a la línea base:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        return 1
+    print("\n✅ Sin regresiones frente a la línea base" if linea_base else "\n⚠️  Sin línea base para comparar")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,7 @@ class NavalFleetAPITester:
     def __init__(self, base_url="https://control-flota-armada.preview.emergentagent.com/api"):
         self.base_url = base_url
         self.token = None
+        self.sesion = requests.Session()
         self.tests_run = 0
         self.tests_passed = 0
         self.failed_tests = []
@@ -43,6 +44,7 @@ class NavalFleetAPITester:
                 
                 if all(field in data for field in required_fields):
                     self.token = data["token"]
+                    self.sesion.headers["Authorization"] = f"Bearer {self.token}"
                     self.log_test(f"Login {usuario}", True)
                     print(f"   Usuario: {data['nombre']}")
                     print(f"   Rango: {data['rango']}")
@@ -63,7 +65,7 @@ class NavalFleetAPITester:
         """Test KPIs endpoint"""
         print(f"\n📊 Testing KPIs endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/kpis", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/kpis", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -95,7 +97,7 @@ class NavalFleetAPITester:
         """Test vehicles endpoint"""
         print(f"\n🚛 Testing vehicles endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/vehiculos?limite=120", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/vehiculos?limite=120", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -134,7 +136,7 @@ class NavalFleetAPITester:
         """Test individual vehicle detail"""
         print(f"\n🔍 Testing vehicle detail for {vehiculo_id}...")
         try:
-            response = requests.get(f"{self.base_url}/vehiculos/{vehiculo_id}", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/vehiculos/{vehiculo_id}", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -157,7 +159,7 @@ class NavalFleetAPITester:
     def test_historial_mantenimiento(self, vehiculo_id):
         """Test maintenance history"""
         try:
-            response = requests.get(f"{self.base_url}/vehiculos/{vehiculo_id}/historial-mantenimiento", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/vehiculos/{vehiculo_id}/historial-mantenimiento", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -175,7 +177,7 @@ class NavalFleetAPITester:
     def test_historial_combustible(self, vehiculo_id):
         """Test fuel history"""
         try:
-            response = requests.get(f"{self.base_url}/vehiculos/{vehiculo_id}/historial-combustible", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/vehiculos/{vehiculo_id}/historial-combustible", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -190,11 +192,67 @@ class NavalFleetAPITester:
         except Exception as e:
             self.log_test("Fuel history", False, f"Exception: {str(e)}")
 
+    def test_autocompletar(self):
+        """Test plate autocomplete and accent-insensitive search"""
+        print(f"\n🔎 Testing plate autocomplete...")
+        try:
+            response = self.sesion.get(f"{self.base_url}/vehiculos?limite=1", timeout=10)
+            placa = response.json()[0]["placa"]
+            response = self.sesion.get(f"{self.base_url}/vehiculos/autocompletar?prefijo={placa[:2]}", timeout=10)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data and all(s["placa"].startswith(placa[:2]) for s in data):
+                    self.log_test("Plate autocomplete", True)
+                    print(f"   Sugerencias para {placa[:2]}: {len(data)}")
+                else:
+                    self.log_test("Plate autocomplete", False, f"Unexpected suggestions: {data}")
+            else:
+                self.log_test("Plate autocomplete", False, f"Status {response.status_code}")
+            
+            con_tilde = self.sesion.get(f"{self.base_url}/vehiculos?busqueda=Núñez&limite=200", timeout=10).json()
+            sin_tilde = self.sesion.get(f"{self.base_url}/vehiculos?busqueda=nunez&limite=200", timeout=10).json()
+            if [v["id"] for v in con_tilde] == [v["id"] for v in sin_tilde]:
+                self.log_test("Accent-insensitive search", True)
+            else:
+                self.log_test("Accent-insensitive search", False, "Results differ with and without accents")
+                
+        except Exception as e:
+            self.log_test("Plate autocomplete", False, f"Exception: {str(e)}")
+
+    def test_version_y_etag(self):
+        """Test ETag/304 and `desde=` delta queries"""
+        print(f"\n🏷️  Testing ETag and delta queries...")
+        try:
+            response = self.sesion.get(f"{self.base_url}/vehiculos?limite=5", timeout=10)
+            etag = response.headers.get("ETag")
+            version = response.headers.get("X-Version")
+            if not etag or not version:
+                self.log_test("ETag headers", False, "Missing ETag or X-Version")
+                return
+            
+            response = self.sesion.get(f"{self.base_url}/vehiculos?limite=5", headers={"If-None-Match": etag}, timeout=10)
+            if response.status_code == 304:
+                self.log_test("Conditional GET (304)", True)
+            else:
+                self.log_test("Conditional GET (304)", False, f"Status {response.status_code}")
+            
+            response = self.sesion.get(f"{self.base_url}/vehiculos?desde={version}", timeout=10)
+            data = response.json()
+            if response.status_code == 200 and {"version", "cambios", "eliminados"} <= set(data):
+                self.log_test("Delta query", True)
+                print(f"   Cambios desde {version}: {len(data['cambios'])}")
+            else:
+                self.log_test("Delta query", False, f"Status {response.status_code}")
+                
+        except Exception as e:
+            self.log_test("ETag and delta queries", False, f"Exception: {str(e)}")
+
     def test_alertas(self):
         """Test alerts endpoint"""
         print(f"\n🚨 Testing alerts endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/alertas?limite=50", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/alertas?limite=50", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -218,11 +276,39 @@ class NavalFleetAPITester:
             self.log_test("Alerts endpoint", False, f"Exception: {str(e)}")
             return False
 
+    def test_paginacion_vehiculos(self):
+        """Test keyset pagination over the whole fleet"""
+        print(f"\n📄 Testing vehicle pagination...")
+        try:
+            vistos = []
+            cursor = None
+            while True:
+                url = f"{self.base_url}/vehiculos?limite=25" + (f"&cursor={cursor}" if cursor else "")
+                response = self.sesion.get(url, timeout=10)
+                if response.status_code != 200:
+                    self.log_test("Vehicle pagination", False, f"Status {response.status_code}")
+                    return False
+                vistos.extend(v["placa"] for v in response.json())
+                cursor = response.headers.get("X-Cursor-Siguiente")
+                if not cursor:
+                    break
+            
+            if vistos == sorted(vistos) and len(vistos) == len(set(vistos)):
+                self.log_test("Vehicle pagination", True)
+                print(f"   Vehículos recorridos: {len(vistos)}")
+                return True
+            self.log_test("Vehicle pagination", False, "Pages overlap or are out of order")
+            return False
+                
+        except Exception as e:
+            self.log_test("Vehicle pagination", False, f"Exception: {str(e)}")
+            return False
+
     def test_ubicaciones_gps(self):
         """Test GPS locations endpoint"""
         print(f"\n📍 Testing GPS locations endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/ubicaciones-gps", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/ubicaciones-gps", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -264,7 +350,7 @@ class NavalFleetAPITester:
         
         for endpoint in endpoints:
             try:
-                response = requests.get(f"{self.base_url}/{endpoint}", timeout=10)
+                response = self.sesion.get(f"{self.base_url}/{endpoint}", timeout=10)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -283,7 +369,7 @@ class NavalFleetAPITester:
         """Test users endpoint"""
         print(f"\n👥 Testing users endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/usuarios", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/usuarios", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -302,7 +388,7 @@ class NavalFleetAPITester:
         """Test reports endpoint"""
         print(f"\n📋 Testing reports endpoint...")
         try:
-            response = requests.get(f"{self.base_url}/reportes/resumen", timeout=10)
+            response = self.sesion.get(f"{self.base_url}/reportes/resumen", timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -340,6 +426,9 @@ class NavalFleetAPITester:
         # Test all endpoints
         self.test_kpis()
         self.test_vehiculos()
+        self.test_paginacion_vehiculos()
+        self.test_autocompletar()
+        self.test_version_y_etag()
         self.test_alertas()
         self.test_ubicaciones_gps()
         self.test_estadisticas()
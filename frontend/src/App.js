@@ -16,6 +16,7 @@ import ConfiguracionPage from "@/pages/ConfiguracionPage";
 // Components
 import Sidebar from "@/components/Sidebar";
 import { Toaster } from "@/components/ui/sonner";
+import { iniciarSesion, cerrarSesion } from "@/lib/sesion";
 
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -24,18 +25,22 @@ function App() {
   useEffect(() => {
     const savedUser = localStorage.getItem("sgvn_usuario");
     if (savedUser) {
-      setUsuario(JSON.parse(savedUser));
+      const userData = JSON.parse(savedUser);
+      iniciarSesion(userData.token, handleLogout);
+      setUsuario(userData);
       setIsAuthenticated(true);
     }
   }, []);
 
   const handleLogin = (userData) => {
+    iniciarSesion(userData.token, handleLogout);
     setUsuario(userData);
     setIsAuthenticated(true);
     localStorage.setItem("sgvn_usuario", JSON.stringify(userData));
   };
 
   const handleLogout = () => {
+    cerrarSesion();
     setUsuario(null);
     setIsAuthenticated(false);
     localStorage.removeItem("sgvn_usuario");
@@ -0,0 +1,40 @@
+import axios from "axios";
+
+const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+
+let token = null;
+let interceptor = null;
+
+// Token de la sesión en curso para todas las peticiones de axios; al recibir un 401
+// (token vencido o revocado) se llama a `alExpirar`
+export function iniciarSesion(nuevoToken, alExpirar) {
+  token = nuevoToken;
+  axios.defaults.headers.common.Authorization = `Bearer ${token}`;
+  if (interceptor !== null) axios.interceptors.response.eject(interceptor);
+  interceptor = axios.interceptors.response.use(
+    (respuesta) => respuesta,
+    (error) => {
+      if (error.response?.status === 401 && token !== null) alExpirar();
+      return Promise.reject(error);
+    }
+  );
+}
+
+export async function cerrarSesion() {
+  const anterior = token;
+  token = null;
+  delete axios.defaults.headers.common.Authorization;
+  if (interceptor !== null) axios.interceptors.response.eject(interceptor);
+  interceptor = null;
+  if (anterior !== null) {
+    await axios
+      .post(`${API}/auth/logout`, null, { headers: { Authorization: `Bearer ${anterior}` } })
+      .catch(() => {});
+  }
+}
+
+// EventSource no admite cabeceras: el token viaja en la consulta
+export function conToken(url) {
+  if (token === null) return url;
+  return `${url}${url.includes("?") ? "&" : "?"}token=${encodeURIComponent(token)}`;
+}
@@ -19,6 +19,7 @@ import { Input } from "@/components/ui/input";
 import { Button } from "@/components/ui/button";
 import { Badge } from "@/components/ui/badge";
 import { ScrollArea } from "@/components/ui/scroll-area";
+import { conToken } from "@/lib/sesion";
 import {
   Select,
   SelectContent,
@@ -56,9 +57,37 @@ export default function MapaGPSPage() {
   const mapRef = useRef(null);
 
   useEffect(() => {
-    cargarUbicaciones();
-    const interval = setInterval(cargarUbicaciones, 30000); // Refresh every 30s
-    return () => clearInterval(interval);
+    // Server-Sent Events: snapshot inicial y luego solo los cambios (entradas, posiciones y salidas de la caja)
+    const bbox = [MAP_BOUNDS.minLng, MAP_BOUNDS.minLat, MAP_BOUNDS.maxLng, MAP_BOUNDS.maxLat].join(",");
+    const fuente = new EventSource(conToken(`${API}/ubicaciones-gps/stream?bbox=${bbox}`));
+    fuente.addEventListener("inicial", (evento) => {
+      setUbicaciones(JSON.parse(evento.data));
+      setUltimaActualizacion(new Date());
+      setCargando(false);
+    });
+    // Vehículos que entran en la caja: llegan completos y reemplazan (o se agregan a) los actuales
+    fuente.addEventListener("entrada", (evento) => {
+      const entrantes = new Map(JSON.parse(evento.data).map((u) => [u.id, u]));
+      setUbicaciones((actuales) => [
+        ...actuales.filter((u) => !entrantes.has(u.id)),
+        ...entrantes.values(),
+      ]);
+      setUltimaActualizacion(new Date());
+    });
+    fuente.addEventListener("delta", (evento) => {
+      const cambios = new Map(JSON.parse(evento.data).map((c) => [c.id, c]));
+      setUbicaciones((actuales) =>
+        actuales.map((u) => (cambios.has(u.id) ? { ...u, ...cambios.get(u.id) } : u))
+      );
+      setUltimaActualizacion(new Date());
+    });
+    fuente.addEventListener("salida", (evento) => {
+      const salientes = new Set(JSON.parse(evento.data));
+      setUbicaciones((actuales) => actuales.filter((u) => !salientes.has(u.id)));
+      setUltimaActualizacion(new Date());
+    });
+    fuente.onerror = () => setCargando(false);
+    return () => fuente.close();
   }, []);
 
   const cargarUbicaciones = async () => {
@@ -108,7 +137,7 @@ export default function MapaGPSPage() {
               Mapa GPS - Monitoreo en Tiempo Real
             </h1>
             <p className="text-gray-500 text-sm mt-1">
-              Visualización de ubicación de flota • Actualización automática cada 30 segundos
+              Visualización de ubicación de flota • Actualización en tiempo real
             </p>
           </div>
           <div className="flex items-center gap-3">
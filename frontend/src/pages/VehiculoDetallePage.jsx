@@ -69,14 +69,16 @@ export default function VehiculoDetallePage() {
   const cargarDatos = async () => {
     setCargando(true);
     try {
-      const [vehiculoRes, mantenimientoRes, combustibleRes] = await Promise.all([
-        axios.get(`${API}/vehiculos/${id}`),
-        axios.get(`${API}/vehiculos/${id}/historial-mantenimiento`),
-        axios.get(`${API}/vehiculos/${id}/historial-combustible`),
-      ]);
-      setVehiculo(vehiculoRes.data);
-      setHistorialMantenimiento(mantenimientoRes.data);
-      setHistorialCombustible(combustibleRes.data);
+      const { data } = await axios.post(`${API}/vehiculos/lote`, {
+        ids: [id],
+        mantenimiento: true,
+        combustible: true,
+      });
+      const [detalle] = data.vehiculos;
+      if (!detalle) throw new Error("Vehículo no encontrado");
+      setVehiculo(detalle.vehiculo);
+      setHistorialMantenimiento(detalle.historial_mantenimiento);
+      setHistorialCombustible(detalle.historial_combustible);
     } catch (error) {
       console.error("Error cargando datos:", error);
       navigate("/vehiculos");
@@ -0,0 +1,57 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Los módulos del backend se importan por nombre, como en server.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture(scope="session")
+def servidor():
+    """Módulo ``server`` con la flota simulada por defecto, sin Mongo ni instantáneas."""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:1")
+    os.environ.setdefault("DB_NAME", "pruebas")
+    os.environ["INSTANTANEAS_DIR"] = ""
+    os.environ.setdefault("JWT_SECRETO", "secreto-de-pruebas-con-al-menos-32-bytes")
+    import server
+
+    return server
+
+
+@pytest.fixture(scope="session")
+def cliente(servidor):
+    """Cliente autenticado; no dispara los eventos de arranque (tareas de fondo ni bloqueo de worker)."""
+    from fastapi.testclient import TestClient
+
+    cliente = TestClient(servidor.app)
+    token = cliente.post("/api/auth/login", json={"usuario": "admin", "clave": "naval2024"}).json()["token"]
+    cliente.headers["Authorization"] = f"Bearer {token}"
+    return cliente
+
+
+def _vehiculo(numero, **cambios):
+    return {
+        "id": f"v{numero}",
+        "placa": f"GSA-{1000 + numero}",
+        "marca_modelo": "Toyota Hilux",
+        "responsable": "TNNV Ana Núñez",
+        "tipo": "Camioneta",
+        "estado": "Operativo",
+        "unidad_operativa": "Base Naval Sur",
+        "kilometraje": 10000 * numero,
+        "consumo_promedio": 12.5,
+        "nivel_combustible": 80,
+        "tanque_capacidad": 60,
+        "seguro_vigente": True,
+        "matricula_vigente": True,
+        "proximo_mantenimiento": None,
+        **cambios,
+    }
+
+
+@pytest.fixture
+def vehiculo():
+    """Fábrica ``vehiculo(numero, **cambios)`` de vehículos mínimos para los almacenes."""
+    return _vehiculo
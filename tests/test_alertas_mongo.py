@@ -0,0 +1,32 @@
+import mongomock
+import pytest
+
+from repositorio import RepositorioMongo
+
+
+@pytest.fixture
+def con_mongo(servidor):
+    repositorio = RepositorioMongo(
+        mongomock.MongoClient().db,
+        list(servidor.VehiculoResponse.model_fields),
+        list(servidor.AlertaResponse.model_fields),
+    )
+    servidor.ALERTAS_PENDIENTES.clear()
+    servidor.asyncio.run(repositorio.sembrar(servidor.FLOTA, servidor.ALERTAS))
+    servidor.REPOSITORIO = repositorio
+    yield repositorio
+    servidor.REPOSITORIO = None
+    servidor.ALERTAS_PENDIENTES.clear()
+
+
+def test_alerta_nueva_visible_antes_del_volcado_periodico(servidor, cliente, con_mongo):
+    antes = cliente.get("/api/alertas", params={"limite": 5}).json()
+    nueva = {**next(iter(servidor.ALERTAS)), "id": "alerta-de-prueba", "fecha": "2999-01-01T00:00:00+00:00"}
+    servidor.ALERTAS.agregar(nueva)
+    try:
+        despues = cliente.get("/api/alertas", params={"limite": 5}).json()
+        assert despues[0]["id"] == "alerta-de-prueba"
+        assert despues[1:] == antes[:4]
+        assert not servidor.ALERTAS_PENDIENTES
+    finally:
+        servidor.ALERTAS.eliminar("alerta-de-prueba")
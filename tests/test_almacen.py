@@ -0,0 +1,63 @@
+import pytest
+
+from almacen import AlmacenAlertas, AlmacenFlota
+
+
+def test_actualizar_reemplaza_el_registro_y_sus_indices(vehiculo):
+    flota = AlmacenFlota([vehiculo(1), vehiculo(2)])
+    anterior = flota.obtener("v1")
+    nuevo = flota.actualizar("v1", {"estado": "Mantenimiento", "placa": "PBA-0001"})
+
+    assert anterior["estado"] == "Operativo" and anterior["placa"] == "GSA-1001"
+    assert nuevo is not anterior and flota.obtener("v1") is nuevo
+    assert flota.candidatos(estado="operativo") == {"v2"}
+    assert flota.candidatos(estado="MANTENIMIENTO") == {"v1"}
+    assert flota.obtener_por_placa("gsa-1001") is None
+    assert flota.obtener_por_placa("pba-0001") is nuevo
+    assert flota.conteos("estado") == {"operativo": 1, "mantenimiento": 1}
+    # El orden por placa sigue al cambio de placa
+    assert [v["id"] for v in flota.buscar()[0]] == ["v2", "v1"]
+
+
+def test_suscriptores_reciben_anterior_y_nuevo(vehiculo):
+    flota = AlmacenFlota([vehiculo(1)])
+    eventos = []
+    flota.suscribir(lambda anterior, nuevo: eventos.append((anterior, nuevo)))
+    anterior = flota.obtener("v1")
+    nuevo = flota.actualizar("v1", {"nivel_combustible": 5})
+    flota.eliminar("v1")
+    assert eventos == [(anterior, nuevo), (nuevo, None)]
+    assert flota.conteos("estado") == {}
+
+
+def test_rechaza_placa_duplicada_sin_tocar_los_indices(vehiculo):
+    flota = AlmacenFlota([vehiculo(1), vehiculo(2)])
+    with pytest.raises(ValueError):
+        flota.actualizar("v2", {"placa": "gsa-1001"})
+    with pytest.raises(ValueError):
+        flota.agregar(vehiculo(3, placa="GSA-1002"))
+    assert flota.obtener_por_placa("GSA-1002")["id"] == "v2"
+    assert len(flota) == 2
+
+
+def test_paginacion_por_cursor_recorre_todo_en_orden(vehiculo):
+    flota = AlmacenFlota(vehiculo(n, estado="Operativo" if n % 3 else "Crítico") for n in range(1, 26))
+    vistos, despues = [], None
+    while True:
+        pagina, despues = flota.buscar(estado="operativo", limite=4, despues=despues)
+        vistos += [v["placa"] for v in pagina]
+        if despues is None:
+            break
+    assert vistos == sorted(v["placa"] for v in flota if v["estado"] == "Operativo")
+
+
+def test_alertas_agrupadas_por_severidad_y_atencion():
+    alertas = AlmacenAlertas([
+        {"id": f"a{n}", "fecha": f"2026-01-{n:02d}T00:00:00+00:00", "severidad": "alta" if n % 2 else "media",
+         "atendida": False}
+        for n in range(1, 7)
+    ])
+    alertas.actualizar("a1", {"atendida": True})
+    assert alertas.conteos() == {("alta", False): 2, ("alta", True): 1, ("media", False): 3}
+    pagina, _ = alertas.buscar(severidad="alta", atendida=False)
+    assert [a["id"] for a in pagina] == ["a5", "a3"]
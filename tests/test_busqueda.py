@@ -0,0 +1,43 @@
+import pytest
+
+from almacen import AlmacenFlota
+from busqueda import CAMPOS_BUSQUEDA, IndiceBusqueda, normalizar
+
+
+@pytest.fixture
+def flota(vehiculo):
+    flota = AlmacenFlota([
+        vehiculo(1),
+        vehiculo(2, marca_modelo="Chevrolet D-Max", responsable="CPNV Luis Pérez"),
+        vehiculo(3, placa="PBA-0999", marca_modelo="Toyota Fortuner"),
+    ])
+    return flota
+
+
+def _esperados(flota, texto):
+    consulta = normalizar(texto.strip())
+    return {v["id"] for v in flota if any(consulta in normalizar(v[c]) for c in CAMPOS_BUSQUEDA)}
+
+
+@pytest.mark.parametrize("texto", ["a", "gs", "hilux", "NÚÑEZ", "perez", "-10", "d-max", "toyota fortuner", "xyz"])
+def test_buscar_equivale_a_subcadena(flota, texto):
+    indice = IndiceBusqueda(flota)
+    assert (indice.buscar(texto) or set()) == _esperados(flota, texto)
+
+
+def test_sincronizar_sigue_las_actualizaciones(flota):
+    indice = IndiceBusqueda(flota)
+    flota.suscribir(indice.sincronizar)
+    flota.actualizar("v2", {"responsable": "TNNV Carla Ruiz"})
+    flota.eliminar("v3")
+    assert indice.buscar("perez") == set()
+    assert indice.buscar("ruiz") == {"v2"}
+    assert indice.buscar("fortuner") == set()
+    assert indice.buscar("toyota") == {"v1"}
+
+
+def test_autocompletar_ignora_guiones_y_prioriza_prefijos(flota):
+    indice = IndiceBusqueda(flota)
+    assert indice.autocompletar_placa("gsa1") == ["v1", "v2"]
+    assert indice.autocompletar_placa("09") == ["v3"]
+    assert indice.autocompletar_placa("gsa", limite=1) == ["v1"]
@@ -0,0 +1,59 @@
+import asyncio
+
+import mongomock
+import pytest
+
+from busqueda import CAMPOS_BUSQUEDA, normalizar
+from repositorio import RepositorioMongo
+
+VEHICULOS = [
+    {"id": "v1", "placa": "GSA-1234", "marca_modelo": "Toyota Hilux", "responsable": "Ana Núñez"},
+    {"id": "v2", "placa": "GSB-2234", "marca_modelo": "Chevrolet D-Max", "responsable": "Luis Pérez"},
+    {"id": "v3", "placa": "PBA-0999", "marca_modelo": "Toyota Fortuner", "responsable": "María Núñez"},
+]
+
+
+def _repositorio(db):
+    return RepositorioMongo(db, ["id", *CAMPOS_BUSQUEDA], ["id"])
+
+
+def _ids(repositorio, texto):
+    pagina, _ = asyncio.run(repositorio.listar_vehiculos(busqueda=texto))
+    return {v["id"] for v in pagina}
+
+
+def _esperados(texto):
+    consulta = normalizar(texto.strip())
+    return {v["id"] for v in VEHICULOS if any(consulta in normalizar(v[c]) for c in CAMPOS_BUSQUEDA)}
+
+
+@pytest.fixture
+def repositorio():
+    repositorio = _repositorio(mongomock.MongoClient().db)
+    asyncio.run(repositorio.asegurar_indices())
+    asyncio.run(repositorio.sembrar(VEHICULOS, []))
+    return repositorio
+
+
+@pytest.mark.parametrize("texto", ["a", "NU", "gsa", "toyota", "nunez", "Núñez", "-12", "hilux fort", "zzzz"])
+def test_busqueda_por_gramas_equivale_a_subcadena(repositorio, texto):
+    assert _ids(repositorio, texto) == _esperados(texto)
+
+
+def test_busqueda_no_cruza_campos(repositorio):
+    # "1234" + "toy" solo aparece si se concatenan placa y marca
+    assert _ids(repositorio, "1234toy") == set()
+
+
+def test_indice_multikey_de_gramas(repositorio):
+    indices = repositorio.vehiculos.index_information()
+    assert any(dict(i["key"]) == {"gramas_busqueda": 1} for i in indices.values())
+
+
+def test_completar_busqueda_en_documentos_antiguos():
+    db = mongomock.MongoClient().db
+    db.vehiculos.insert_many([dict(v) for v in VEHICULOS])
+    repositorio = _repositorio(db)
+    asyncio.run(repositorio.completar_busqueda())
+    assert db.vehiculos.count_documents({"gramas_busqueda": {"$exists": False}}) == 0
+    assert _ids(repositorio, "toyota") == {"v1", "v3"}
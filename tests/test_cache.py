@@ -0,0 +1,41 @@
+from cache import CacheRespuestas
+
+
+def test_version_distinta_invalida_la_entrada():
+    cache = CacheRespuestas()
+    cache.guardar("k", (1,), b"abc", {"X": "1"})
+    assert cache.obtener("k", (1,)) == (b"abc", {"X": "1"})
+    assert cache.obtener("k", (2,)) is None
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_desaloja_las_menos_usadas_por_bytes():
+    cache = CacheRespuestas(max_entradas=10, max_bytes=100)
+    for clave in "abc":
+        cache.guardar(clave, (1,), b"x" * 40)
+    # "a" salió al pasar de 100 bytes; usar "b" deja a "c" como la menos reciente
+    assert cache.obtener("a", (1,)) is None
+    assert cache.obtener("b", (1,)) is not None
+    cache.guardar("d", (1,), b"x" * 40)
+    assert cache.obtener("c", (1,)) is None
+    assert cache.obtener("b", (1,)) is not None
+    assert cache.bytes == 80 and cache.desalojos == 2
+
+
+def test_variantes_cuentan_en_los_bytes_y_se_calculan_una_vez():
+    cache = CacheRespuestas(max_entradas=10, max_bytes=100)
+    cache.guardar("a", (1,), b"x" * 40)
+    llamadas = []
+    calcular = lambda: llamadas.append(1) or b"z" * 30
+    assert cache.variante("a", "gzip", calcular) == b"z" * 30
+    assert cache.variante("a", "gzip", calcular) == b"z" * 30
+    assert len(llamadas) == 1 and cache.bytes == 70
+    cache.guardar("b", (1,), b"x" * 40)
+    assert cache.obtener("a", (1,)) is None
+    assert cache.bytes == 40
+
+
+def test_no_guarda_lo_que_no_cabe():
+    cache = CacheRespuestas(max_bytes=10)
+    cache.guardar("a", (1,), b"x" * 11)
+    assert len(cache) == 0
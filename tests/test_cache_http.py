@@ -0,0 +1,40 @@
+import pytest
+
+RUTAS = [
+    "/api/vehiculos?limite=100",
+    "/api/ubicaciones-gps",
+    "/api/ubicaciones-gps?bbox=-82,-5,-75,2",
+    "/api/ubicaciones-gps?cerca_de=-2.19,-79.88&radio_km=50",
+]
+
+
+@pytest.mark.parametrize("ruta", RUTAS)
+def test_respuesta_comprimida_se_sirve_desde_la_cache(servidor, cliente, ruta):
+    cabeceras = {"Accept-Encoding": "gzip"}
+    primera = cliente.get(ruta, headers=cabeceras)
+    aciertos = servidor.CACHE.aciertos
+    segunda = cliente.get(ruta, headers=cabeceras)
+    assert servidor.CACHE.aciertos == aciertos + 1
+    assert segunda.content == primera.content
+    assert segunda.headers["content-encoding"] == "gzip"
+    assert segunda.headers["etag"].endswith('-gzip"')
+
+
+@pytest.mark.parametrize("ruta", RUTAS[:2])
+def test_304_conserva_el_etag_de_la_variante(cliente, ruta):
+    etag = cliente.get(ruta, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    respuesta = cliente.get(ruta, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert respuesta.status_code == 304
+    assert respuesta.headers["etag"] == etag
+
+    base = cliente.get(ruta, headers={"Accept-Encoding": "identity"}).headers["etag"]
+    assert base == etag.replace('-gzip"', '"')
+    respuesta = cliente.get(ruta, headers={"Accept-Encoding": "identity", "If-None-Match": base})
+    assert respuesta.status_code == 304
+    assert respuesta.headers["etag"] == base
+
+
+def test_cursor_de_vehiculos_viaja_con_la_pagina_cacheada(cliente):
+    primera = cliente.get("/api/vehiculos", params={"limite": 10})
+    segunda = cliente.get("/api/vehiculos", params={"limite": 10})
+    assert segunda.headers["x-cursor-siguiente"] == primera.headers["x-cursor-siguiente"]
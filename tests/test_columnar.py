@@ -0,0 +1,27 @@
+from almacen import AlmacenFlota
+from columnar import FlotaColumnar
+
+
+def test_replica_sigue_altas_cambios_y_bajas(vehiculo):
+    flota = AlmacenFlota(vehiculo(n) for n in range(1, 5))
+    columnar = FlotaColumnar(flota, capacidad=4)
+    flota.suscribir(columnar.sincronizar)
+    flota.eliminar("v1")  # la última fila ocupa su lugar
+    flota.actualizar("v4", {"estado": "Crítico", "kilometraje": 1})
+    for n in range(5, 9):  # supera la capacidad inicial
+        flota.agregar(vehiculo(n, estado="Mantenimiento"))
+
+    assert len(columnar) == len(flota) == 7
+    assert columnar.suma("kilometraje") == sum(v["kilometraje"] for v in flota)
+    assert columnar.contar("estado", "Crítico") == 1
+    assert columnar.contar("estado", "Inexistente") == 0
+    assert dict(columnar.contar_por("estado")) == {"Operativo": 2, "Crítico": 1, "Mantenimiento": 4}
+
+
+def test_distribucion(vehiculo):
+    columnar = FlotaColumnar([vehiculo(n) for n in range(1, 11)])
+    distribucion = columnar.distribucion("kilometraje", percentiles=(50,))
+    assert distribucion["minimo"] == 10000
+    assert distribucion["maximo"] == 100000
+    assert distribucion["percentiles"] == {"p50": 55000.0}
+    assert FlotaColumnar().distribucion("kilometraje") is None
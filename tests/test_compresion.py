@@ -0,0 +1,49 @@
+import gzip
+
+import pytest
+
+import compresion
+from compresion import comprimir, elegir_codificacion, etiqueta_base, etiqueta_codificada
+
+
+@pytest.mark.parametrize("aceptadas, esperada", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("*", compresion.CODIFICACIONES[0]),
+    ("*;q=0, gzip", "gzip"),
+    ("gzip;q=abc", None),
+])
+def test_elegir_codificacion(aceptadas, esperada):
+    assert elegir_codificacion(aceptadas) == esperada
+
+
+@pytest.mark.skipif(compresion.brotli is None, reason="brotli no instalado")
+def test_prefiere_brotli_con_igual_peso_y_respeta_pesos():
+    assert elegir_codificacion("gzip, br") == "br"
+    assert elegir_codificacion("gzip, br;q=0.5") == "gzip"
+
+
+def test_etiquetas_codificadas_ida_y_vuelta():
+    etag = '"1f-00ab"'
+    for codificacion in ("gzip", "br"):
+        assert etiqueta_codificada(etag, codificacion) == f'"1f-00ab-{codificacion}"'
+        assert etiqueta_base(etiqueta_codificada(etag, codificacion)) == etag
+    assert etiqueta_base(etag) == etag
+
+
+def test_gzip_determinista():
+    datos = b'{"a":1}' * 100
+    assert comprimir(datos, "gzip") == comprimir(datos, "gzip")
+    assert gzip.decompress(comprimir(datos, "gzip", nivel=1)) == datos
+
+
+def test_middleware_respeta_el_minimo(cliente):
+    pequena = cliente.get("/api/vehiculos", params={"limite": 1, "campos": "placa"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in pequena.headers
+    grande = cliente.get("/api/vehiculos", params={"limite": 100}, headers={"Accept-Encoding": "gzip"})
+    assert grande.headers["content-encoding"] == "gzip"
+    assert grande.headers["vary"] == "Accept-Encoding"
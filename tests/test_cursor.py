@@ -0,0 +1,34 @@
+import base64
+import json
+
+import pytest
+
+from almacen import codificar_cursor, decodificar_cursor
+
+
+def _token(valor):
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).rstrip(b"=").decode()
+
+
+def test_ida_y_vuelta():
+    clave = ("GSA-1234", "e922e3f6-ñ")
+    assert decodificar_cursor(codificar_cursor(clave)) == clave
+
+
+@pytest.mark.parametrize("token", [
+    "no es base64!",
+    _token({"placa": "x"}),
+    _token(["solo-uno"]),
+    _token(["a", "b", "c"]),
+    _token(["a", 1]),
+])
+def test_tokens_invalidos(token):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        decodificar_cursor(token)
+
+
+def test_cursor_de_un_elemento_responde_400(servidor, cliente):
+    for ruta in ("/api/vehiculos", "/api/alertas"):
+        respuesta = cliente.get(ruta, params={"cursor": _token(["solo-uno"])})
+        assert respuesta.status_code == 400
+        assert respuesta.json()["detail"] == "Cursor inválido"
@@ -0,0 +1,86 @@
+import asyncio
+import contextlib
+import json
+
+from difusion import DifusorGPS
+from telemetria import BufferTelemetria
+
+CAJA = (-80.0, -3.0, -79.0, -2.0)
+
+
+def _mover(telemetria, difusor, posiciones, instante):
+    filas = list(posiciones)
+    lat = [posiciones[f][0] for f in filas]
+    lng = [posiciones[f][1] for f in filas]
+    telemetria.ingerir(filas, lat, lng, [0] * len(filas), [instante] * len(filas))
+    difusor.tick()
+
+
+def _preparar():
+    telemetria = BufferTelemetria(fijaciones=4, capacidad=4)
+    for vehiculo_id in ("a", "b", "c"):
+        telemetria.registrar(vehiculo_id)
+    difusor = DifusorGPS(telemetria)
+    telemetria.suscribir(difusor.marcar)
+    return telemetria, difusor
+
+
+def test_entradas_posiciones_y_salidas_de_la_caja():
+    telemetria, difusor = _preparar()
+    caja = difusor.suscribir(CAJA)
+    todo = difusor.suscribir()
+    _mover(telemetria, difusor, {0: (-2.5, -79.5), 1: (-2.5, -79.5), 2: (0.0, -79.5)}, 1)
+    fragmentos, entradas, salidas = caja.tomar()
+    assert (fragmentos, entradas, salidas) == ([], [0, 1], [])
+    assert len(todo.tomar()[0]) == 3
+
+    # "a" se mueve dentro, "b" sale y "c" entra
+    _mover(telemetria, difusor, {0: (-2.4, -79.5), 1: (0.0, -79.5), 2: (-2.6, -79.4)}, 2)
+    fragmentos, entradas, salidas = caja.tomar()
+    assert [json.loads(f)["id"] for f in fragmentos] == ["a"]
+    assert entradas == [2]
+    assert salidas == ["b"]
+    assert todo.tomar()[2] == []
+
+
+def test_entrar_y_salir_sin_leer_no_avisa_nada():
+    telemetria, difusor = _preparar()
+    caja = difusor.suscribir(CAJA)
+    _mover(telemetria, difusor, {0: (-2.5, -79.5)}, 1)
+    _mover(telemetria, difusor, {0: (0.0, -79.5)}, 2)
+    assert caja.tomar() == ([], [], [])
+    assert not caja.dentro
+
+
+def test_salir_y_volver_reemplaza_la_salida():
+    telemetria, difusor = _preparar()
+    caja = difusor.suscribir(CAJA)
+    caja.dentro.update([0])
+    _mover(telemetria, difusor, {0: (0.0, -79.5)}, 1)
+    _mover(telemetria, difusor, {0: (-2.5, -79.5)}, 2)
+    assert caja.tomar() == ([], [0], [])
+
+
+
+def test_ejecutar_sobrevive_a_un_tick_fallido(caplog):
+    _, difusor = _preparar()
+    difusor.intervalo = 0
+    llamadas, tareas = [], []
+
+    def tick():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            raise OverflowError("marca de tiempo")
+        if len(llamadas) == 3:
+            tareas[0].cancel()
+
+    difusor.tick = tick
+
+    async def correr():
+        tareas.append(asyncio.ensure_future(difusor.ejecutar()))
+        with contextlib.suppress(asyncio.CancelledError):
+            await tareas[0]
+
+    asyncio.run(correr())
+    assert len(llamadas) == 3
+    assert "Falló el tick" in caplog.text
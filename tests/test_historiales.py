@@ -0,0 +1,46 @@
+from historiales import ESQUEMA_COMBUSTIBLE, AlmacenHistorial
+
+
+def _carga(numero, fecha, vehiculo_id="v1", galones=10.0):
+    return {
+        "id": f"c{numero}", "vehiculo_id": vehiculo_id, "fecha": fecha, "galones": galones,
+        "costo_galon": 2.5, "kilometraje_actual": 1000 * numero, "estacion": "Base", "autorizado_por": "CPNV",
+    }
+
+
+def test_registros_atrasados_se_insertan_en_orden():
+    historial = AlmacenHistorial(ESQUEMA_COMBUSTIBLE, [
+        _carga(1, "2026-01-01T08:00:00+00:00"),
+        _carga(3, "2026-01-03T08:00:00+00:00"),
+    ])
+    historial.agregar(_carga(2, "2026-01-02T08:00:00+00:00"))
+    historial.agregar_varios([_carga(0, "2025-12-31T08:00:00+00:00"), _carga(4, "2026-01-04T08:00:00+00:00")])
+    assert [r["id"] for r in historial.consultar("v1")] == ["c4", "c3", "c2", "c1", "c0"]
+    assert len(historial) == 5
+
+
+def test_consultar_por_rango_y_periodo():
+    historial = AlmacenHistorial(ESQUEMA_COMBUSTIBLE, [
+        _carga(1, "2026-01-05T08:00:00+00:00", galones=10),  # lunes
+        _carga(2, "2026-01-05T18:00:00+00:00", galones=5),
+        _carga(3, "2026-01-11T08:00:00+00:00", galones=7),  # domingo, misma semana
+        _carga(4, "2026-01-12T08:00:00+00:00", galones=1),
+    ])
+    rango = historial.consultar("v1", desde="2026-01-05T12:00:00+00:00", hasta="2026-01-11T23:59:59+00:00")
+    assert [r["id"] for r in rango] == ["c3", "c2"]
+    dias = historial.consultar("v1", periodo="dia")
+    assert [(d["inicio"][:10], d["registros"], d["galones"]) for d in dias] == [
+        ("2026-01-12", 1, 1.0), ("2026-01-11", 1, 7.0), ("2026-01-05", 2, 15.0),
+    ]
+    semanas = historial.consultar("v1", periodo="semana")
+    assert [(s["inicio"][:10], s["registros"]) for s in semanas] == [("2026-01-12", 1), ("2026-01-05", 3)]
+    assert historial.consultar("otro") == []
+
+
+def test_recorrer_en_bloques_acotados():
+    historial = AlmacenHistorial(ESQUEMA_COMBUSTIBLE, [
+        _carga(n, f"2026-01-{n:02d}T00:00:00+00:00", vehiculo_id=f"v{n % 2}") for n in range(1, 11)
+    ])
+    bloques = list(historial.recorrer(bloque=3))
+    assert [len(b) for b in bloques] == [3, 3, 3, 1]
+    assert sorted(r["id"] for b in bloques for r in b) == sorted(f"c{n}" for n in range(1, 11))
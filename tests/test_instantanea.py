@@ -0,0 +1,67 @@
+import math
+
+from instantanea import Instantanea, escribir
+
+
+def test_ida_y_vuelta_por_tipo_de_columna(tmp_path):
+    registros = [
+        {"n": 1, "x": 0.5, "b": True, "t": "Núñez", "c": {"lat": -2.1}},
+        {"n": 2, "x": 3, "b": False, "t": "", "c": {"lat": -2.1}},
+        {"n": 3, "x": -1.25, "b": True, "t": "GSA-1234", "c": None},
+    ]
+    ruta = tmp_path / "datos.snap"
+    escribir(ruta, {"tabla": registros}, {"clave": 1})
+    instantanea = Instantanea(ruta)
+    try:
+        assert instantanea.metadatos == {"clave": 1}
+        assert instantanea.filas("tabla") == 3
+        assert instantanea.columna("tabla", "n").tolist() == [1, 2, 3]
+        leidos = instantanea.registros("tabla")
+    finally:
+        instantanea.cerrar()
+    assert [r["t"] for r in leidos] == ["Núñez", "", "GSA-1234"]
+    assert [r["c"] for r in leidos] == [{"lat": -2.1}, {"lat": -2.1}, None]
+    assert all(math.isclose(a["x"], b["x"]) for a, b in zip(leidos, registros))
+
+
+def test_sin_reemplazar_conserva_la_primera(tmp_path):
+    ruta = tmp_path / "datos.snap"
+    assert escribir(ruta, {"t": [{"a": 1}]}, reemplazar=False)
+    assert not escribir(ruta, {"t": [{"a": 2}]}, reemplazar=False)
+    instantanea = Instantanea(ruta)
+    assert instantanea.registros("t") == [{"a": 1}]
+    instantanea.cerrar()
+
+
+def test_cargar_datos_regenera_y_descarta_las_anteriores(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(servidor, "INSTANTANEAS_DIR", str(tmp_path))
+    vieja = tmp_path / "flota-120-2024-20000101.snap"
+    escribir(vieja, {"vehiculos": [{"id": "x"}]})
+    datos = servidor.cargar_datos()
+    assert not vieja.exists()
+    (actual,) = tmp_path.glob("flota-*.snap")
+    assert f"-{servidor.HISTORIAL_VEHICULOS}-" in actual.name
+
+    # Otro HISTORIAL_VEHICULOS produce otra instantánea
+    monkeypatch.setattr(servidor, "HISTORIAL_VEHICULOS", 1)
+    con_menos = servidor.cargar_datos()
+    assert not actual.exists()
+    assert len(con_menos["mantenimientos"]) < len(datos["mantenimientos"])
+
+    # Una instantánea con el nombre correcto pero metadatos ajenos se regenera
+    (ruta,) = tmp_path.glob("flota-*.snap")
+    escribir(ruta, {"vehiculos": [{"id": "x"}]}, {"cantidad": 1})
+    assert servidor.cargar_datos()["vehiculos"] == con_menos["vehiculos"]
+
+
+def test_generar_datos_no_toca_el_generador_global(servidor):
+    servidor.random.seed(7)
+    esperado = servidor.random.random()
+    servidor.random.seed(7)
+    primeros = servidor.generar_datos()
+    assert servidor.random.random() == esperado
+    segundos = servidor.generar_datos()
+    # Las alertas llevan la hora de la evaluación; el resto solo depende de la semilla
+    sin_fecha = lambda alertas: [{**a, "fecha": None} for a in alertas]
+    assert sin_fecha(segundos.pop("alertas")) == sin_fecha(primeros.pop("alertas"))
+    assert segundos == primeros
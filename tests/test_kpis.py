@@ -0,0 +1,36 @@
+from almacen import AlmacenAlertas, AlmacenFlota
+from kpis import AcumuladorKPI
+
+
+def _preparar(vehiculo, k=2):
+    flota = AlmacenFlota(vehiculo(n) for n in range(1, 8))
+    alertas = AlmacenAlertas()
+    kpis = AcumuladorKPI(flota, alertas, k=k)
+    flota.suscribir(kpis.sincronizar_vehiculo)
+    alertas.suscribir(kpis.sincronizar_alerta)
+    return flota, alertas, kpis
+
+
+def test_incremental_coincide_con_recalculo(vehiculo):
+    flota, alertas, kpis = _preparar(vehiculo)
+    flota.actualizar("v7", {"kilometraje": 5})
+    flota.actualizar("v2", {"estado": "Crítico", "consumo_promedio": 9.9})
+    flota.eliminar("v6")
+    flota.agregar(vehiculo(9))
+    alertas.agregar({"id": "a1", "fecha": "2026-01-01", "severidad": "alta", "atendida": False})
+    alertas.agregar({"id": "a2", "fecha": "2026-01-02", "severidad": "alta", "atendida": False})
+    alertas.actualizar("a1", {"atendida": True})
+    assert kpis.verificar(alertas) == {}
+    resumen = kpis.resumen()
+    assert resumen["alertas_criticas"] == 1
+    assert resumen["por_estado"] == {"Operativo": 6, "Crítico": 1}
+    assert [v["kilometraje"] for v in resumen["mas_utilizados"]] == [90000, 50000]
+
+
+def test_verificar_detecta_deriva(vehiculo):
+    flota, alertas, kpis = _preparar(vehiculo)
+    # Una mutación que no pasó por el almacén deja el acumulador desfasado
+    flota._por_id["v1"] = {**flota.obtener("v1"), "kilometraje": 999999}
+    diferencias = kpis.verificar(alertas)
+    assert set(diferencias) == {"suma_kilometraje"}
+    assert diferencias["suma_kilometraje"]["recalculado"] - diferencias["suma_kilometraje"]["incremental"] == 999999 - 10000
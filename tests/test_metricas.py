@@ -0,0 +1,19 @@
+import logging
+
+from metricas import FiltroToken, ocultar_token
+
+
+def test_ocultar_token_en_ruta_y_consulta():
+    assert ocultar_token("/api/stream?bbox=1,2&token=a.b.c") == "/api/stream?bbox=1,2&token=***"
+    assert ocultar_token("token=a.b.c&bbox=1") == "token=***&bbox=1"
+    assert ocultar_token("/api/x?mitoken=1") == "/api/x?mitoken=1"
+
+
+def test_filtro_del_log_de_accesos():
+    registro = logging.LogRecord(
+        "uvicorn.access", logging.INFO, __file__, 1, '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:1", "GET", "/api/ubicaciones-gps/stream?token=a.b.c", "1.1", 200), None,
+    )
+    assert FiltroToken().filter(registro)
+    assert "a.b.c" not in registro.getMessage()
+    assert "token=***" in registro.getMessage()
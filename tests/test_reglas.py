@@ -0,0 +1,98 @@
+import asyncio
+import contextlib
+
+from almacen import AlmacenAlertas, AlmacenFlota
+from historiales import a_micros
+from reglas import MotorReglas
+
+DIA = 86400
+
+
+class Reloj:
+    def __init__(self, ahora):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def _preparar(vehiculos, ahora="2026-01-10T00:00:00+00:00"):
+    flota = AlmacenFlota(vehiculos)
+    alertas = AlmacenAlertas()
+    reloj = Reloj(a_micros(ahora) / 1_000_000)
+    motor = MotorReglas(flota, alertas, reloj=reloj)
+    motor.evaluar_todos()
+    flota.suscribir(motor.sincronizar)
+    return flota, alertas, motor, reloj
+
+
+def _abiertas(alertas):
+    return sorted((a["vehiculo_id"], a["regla"]) for a in alertas if not a["atendida"])
+
+
+def test_plazo_vencido_dispara_al_revisar(vehiculo):
+    flota, alertas, motor, reloj = _preparar([
+        vehiculo(1, proximo_mantenimiento="2026-01-05T00:00:00+00:00"),
+        vehiculo(2, proximo_mantenimiento="2026-01-12T00:00:00+00:00"),
+        vehiculo(3, proximo_mantenimiento="2026-01-20T00:00:00+00:00"),
+    ])
+    assert _abiertas(alertas) == [("v1", "mantenimiento_vencido")]
+    assert motor.espera(10 * DIA) == 2 * DIA
+
+    reloj.ahora += 3 * DIA
+    assert motor.revisar() == 1
+    assert _abiertas(alertas) == [("v1", "mantenimiento_vencido"), ("v2", "mantenimiento_vencido")]
+    alerta = next(a for a in alertas if a["vehiculo_id"] == "v2")
+    assert alerta["fecha"].startswith("2026-01-12")
+    assert motor.revisar() == 0
+
+
+def test_plazo_reprogramado_descarta_el_anterior(vehiculo):
+    flota, alertas, motor, reloj = _preparar([vehiculo(1, proximo_mantenimiento="2026-01-12T00:00:00+00:00")])
+    flota.actualizar("v1", {"proximo_mantenimiento": "2026-02-01T00:00:00+00:00"})
+    reloj.ahora += 5 * DIA
+    assert motor.revisar() == 0
+    assert _abiertas(alertas) == []
+    reloj.ahora += 30 * DIA
+    assert motor.revisar() == 1
+
+
+def test_condicion_resuelta_marca_la_alerta_atendida(vehiculo):
+    flota, alertas, motor, _ = _preparar([vehiculo(1, nivel_combustible=10)])
+    assert _abiertas(alertas) == [("v1", "combustible_bajo")]
+    flota.actualizar("v1", {"nivel_combustible": 90})
+    assert _abiertas(alertas) == []
+    assert [a["atendida"] for a in alertas] == [True]
+    flota.actualizar("v1", {"nivel_combustible": 5})
+    assert len(alertas) == 2 and len(motor) == 1
+
+
+def test_restaurar_reencola_los_plazos_pendientes(vehiculo):
+    flota, alertas, _, reloj = _preparar([vehiculo(1, proximo_mantenimiento="2026-01-12T00:00:00+00:00")])
+    motor = MotorReglas(flota, alertas, reloj=reloj)
+    motor.restaurar()
+    reloj.ahora += 3 * DIA
+    assert motor.revisar() == 1
+
+
+def test_ejecutar_sobrevive_a_una_revision_fallida(vehiculo, caplog):
+    _, _, motor, _ = _preparar([vehiculo(1)])
+    llamadas, tareas = [], []
+
+    def revisar():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            raise RuntimeError("falla")
+        if len(llamadas) == 3:
+            tareas[0].cancel()
+
+    motor.revisar = revisar
+
+    async def correr():
+        tareas.append(asyncio.ensure_future(motor.ejecutar(intervalo=0)))
+        with contextlib.suppress(asyncio.CancelledError):
+            await tareas[0]
+
+    asyncio.run(correr())
+    assert len(llamadas) == 3
+    assert "plazos" in caplog.text
@@ -0,0 +1,16 @@
+import time
+
+
+def test_resumen_cacheado_con_fecha_de_cada_peticion(servidor, cliente):
+    primero = cliente.get("/api/reportes/resumen").json()
+    aciertos = servidor.CACHE.aciertos
+    time.sleep(0.01)
+    segundo = cliente.get("/api/reportes/resumen").json()
+    assert servidor.CACHE.aciertos == aciertos + 1
+    assert segundo["fecha_generacion"] > primero["fecha_generacion"]
+    assert {**segundo, "fecha_generacion": None} == {**primero, "fecha_generacion": None}
+
+
+def test_resumen_cuenta_alertas_atendidas(servidor, cliente):
+    esperado = sum(1 for a in servidor.ALERTAS if a["atendida"])
+    assert cliente.get("/api/reportes/resumen").json()["alertas_atendidas"] == esperado
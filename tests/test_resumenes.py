@@ -0,0 +1,26 @@
+from almacen import AlmacenFlota
+from resumenes import ResumenMensual
+
+
+def test_totales_mensuales_por_unidad_y_tipo(vehiculo):
+    flota = AlmacenFlota([
+        vehiculo(1),
+        vehiculo(2, unidad_operativa="Capitanía Manta", tipo="SUV"),
+    ])
+    resumen = ResumenMensual(flota, ("costo",), lambda r: {"costo": r["costo"]})
+    for vehiculo_id, fecha, costo in [
+        ("v1", "2026-01-10T00:00:00+00:00", 100),
+        ("v1", "2026-03-01T00:00:00+00:00", 10),
+        ("v2", "2026-01-20T00:00:00+00:00", 50),
+        ("v2", "2025-01-20T00:00:00+00:00", 999),
+    ]:
+        resumen.sincronizar({"vehiculo_id": vehiculo_id, "fecha": fecha, "costo": costo})
+
+    def costos(**filtros):
+        return [m["costo"] for m in resumen.mensual(2026, **filtros)][:3]
+
+    assert costos() == [150, 0, 10]
+    assert costos(unidad="base") == [100, 0, 10]
+    assert costos(tipo="suv") == [50, 0, 0]
+    assert costos(unidad="manta", tipo="CAMIONETA") == [0, 0, 0]
+    assert resumen.mensual(2025)[0] == {"mes": "Ene", "costo": 999}
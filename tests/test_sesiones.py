@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import jwt
+import mongomock
+import pytest
+
+from repositorio import VersionesSesionMongo
+from sesiones import Sesiones
+
+SECRETO = "secreto-de-pruebas-con-al-menos-32-bytes"
+
+
+def correr(corrutina):
+    return asyncio.run(corrutina)
+
+
+def test_token_valido_y_cacheado():
+    sesiones = Sesiones(SECRETO)
+    token = correr(sesiones.emitir("admin", "Administrador", "Comandancia"))
+    sesion = correr(sesiones.verificar(token))
+    assert (sesion["sub"], sesion["rol"], sesion["unidad"]) == ("admin", "Administrador", "Comandancia")
+    assert correr(sesiones.verificar(token)) is sesion
+    assert (sesiones.aciertos, sesiones.fallos) == (1, 1)
+
+
+def test_token_invalido():
+    sesiones = Sesiones(SECRETO)
+    with pytest.raises(ValueError, match="Token inválido"):
+        correr(sesiones.verificar("x.y.z"))
+
+
+def test_revocar_invalida_tokens_cacheados_y_el_nuevo_login_vale():
+    sesiones = Sesiones(SECRETO)
+    viejo = correr(sesiones.emitir("operador", "Operador", "COP"))
+    correr(sesiones.verificar(viejo))
+    correr(sesiones.revocar("operador"))
+    with pytest.raises(ValueError, match="revocada"):
+        correr(sesiones.verificar(viejo))
+    nuevo = correr(sesiones.emitir("operador", "Operador", "COP"))
+    assert correr(sesiones.verificar(nuevo))["ver"] == 1
+    otro = correr(sesiones.emitir("admin", "Administrador", "Comandancia"))
+    assert correr(sesiones.verificar(otro))["ver"] == 0
+
+
+def test_token_expirado():
+    sesiones = Sesiones(SECRETO, duracion=-1)
+    token = correr(sesiones.emitir("admin", "Administrador", "Comandancia"))
+    with pytest.raises(ValueError, match="expirada"):
+        correr(sesiones.verificar(token))
+
+
+def test_expira_en_cache():
+    sesiones = Sesiones(SECRETO, duracion=1)
+    token = correr(sesiones.emitir("admin", "Administrador", "Comandancia"))
+    correr(sesiones.verificar(token))
+    time.sleep(1.1)
+    with pytest.raises(ValueError, match="expirada"):
+        correr(sesiones.verificar(token))
+
+
+def test_en_memoria_los_tokens_de_otro_arranque_no_valen():
+    token = correr(Sesiones(SECRETO).emitir("admin", "Administrador", "Comandancia"))
+    with pytest.raises(ValueError, match="Token inválido"):
+        correr(Sesiones(SECRETO).verificar(token))
+
+
+def test_lru_acotada():
+    sesiones = Sesiones(SECRETO, max_cache=2)
+    for usuario in ("a", "b", "c"):
+        correr(sesiones.verificar(correr(sesiones.emitir(usuario, "Operador", "COP"))))
+    assert len(sesiones) == 2
+
+
+def test_versiones_compartidas_entre_workers():
+    base = mongomock.MongoClient().db
+    uno = Sesiones(SECRETO, VersionesSesionMongo(base))
+    otro = Sesiones(SECRETO, VersionesSesionMongo(base))
+    viejo = correr(uno.emitir("operador", "Operador", "COP"))
+    assert correr(otro.verificar(viejo))["sub"] == "operador"
+
+    # Logout atendido por el primer worker: el segundo lo ve al refrescar su réplica
+    correr(uno.revocar("operador"))
+    correr(otro.sincronizar())
+    with pytest.raises(ValueError, match="revocada"):
+        correr(otro.verificar(viejo))
+
+    # Un token emitido tras la revocación vale aunque la réplica del otro worker esté atrasada
+    tercero = Sesiones(SECRETO, VersionesSesionMongo(base))
+    correr(uno.revocar("operador"))
+    nuevo = correr(uno.emitir("operador", "Operador", "COP"))
+    assert correr(tercero.verificar(nuevo))["ver"] == 2
+
+
+def test_versiones_compartidas_sobreviven_al_reinicio():
+    base = mongomock.MongoClient().db
+    antes = Sesiones(SECRETO, VersionesSesionMongo(base))
+    token = correr(antes.emitir("admin", "Administrador", "Comandancia"))
+    correr(antes.revocar("admin"))
+    despues = Sesiones(SECRETO, VersionesSesionMongo(base))
+    with pytest.raises(ValueError, match="revocada"):
+        correr(despues.verificar(token))
+
+
+def test_claims_obligatorios():
+    sesiones = Sesiones(SECRETO, VersionesSesionMongo(mongomock.MongoClient().db))
+    token = jwt.encode({"sub": "admin", "exp": int(time.time()) + 60}, SECRETO, algorithm="HS256")
+    with pytest.raises(ValueError, match="Token inválido"):
+        correr(sesiones.verificar(token))
@@ -0,0 +1,101 @@
+import json
+import math
+
+import numpy as np
+
+from telemetria import DTYPE_REPORTE, BufferTelemetria
+
+
+def _buffer(vehiculos=("a", "b")):
+    telemetria = BufferTelemetria(fijaciones=4, capacidad=2)
+    for vehiculo_id in vehiculos:
+        telemetria.registrar(vehiculo_id)
+    return telemetria
+
+
+def test_ingerir_descarta_coordenadas_invalidas():
+    telemetria = _buffer()
+    nan, inf = math.nan, math.inf
+    lat = [-2.1, nan, 91.0, -2.2, -2.3, -2.4, -2.5]
+    lng = [-79.9, -79.9, -79.9, 181.0, -inf, -79.9, -79.9]
+    velocidad = [10, 10, 10, 10, 10, nan, -1]
+    aceptados = telemetria.ingerir([0] * 7, lat, lng, velocidad, [1.0] * 7)
+    assert aceptados == 1
+    assert telemetria.recorrido(0)["lat"] == [-2.1]
+
+
+def test_ingerir_ndjson_cuenta_los_rechazados():
+    telemetria = _buffer()
+    lineas = [
+        {"id": "a", "lat": -2.1, "lng": -79.9, "marca_tiempo": 1},
+        {"id": "a", "lat": float("nan"), "lng": -79.9, "marca_tiempo": 2},
+        {"id": "b", "lat": -2.1, "lng": 200, "marca_tiempo": 3},
+        {"id": "x", "lat": -2.1, "lng": -79.9, "marca_tiempo": 4},
+    ]
+    datos = "\n".join(json.dumps(l) for l in lineas) + "\nno es json\n"
+    assert telemetria.ingerir_ndjson(datos) == (1, 4)
+    assert telemetria.reportes_ingeridos == 1
+
+
+def test_ingerir_binario_cuenta_los_rechazados():
+    telemetria = _buffer()
+    registros = np.zeros(3, DTYPE_REPORTE)
+    registros["indice"] = [0, 1, 7]
+    registros["lat"] = [-2.1, np.nan, -2.1]
+    registros["lng"] = -79.9
+    registros["marca_tiempo"] = 1
+    assert telemetria.ingerir_binario(registros.tobytes()) == (1, 2)
+    _, _, _, _, hay_dato = telemetria.ultimas([0, 1])
+    assert hay_dato.tolist() == [True, False]
+
+
+def test_lote_via_api_informa_rechazados(cliente):
+    datos = '{"indice": 0, "lat": NaN, "lng": -79.9, "marca_tiempo": 1}\n'
+    respuesta = cliente.post("/api/telemetria/lote", content=datos)
+    assert respuesta.json() == {"aceptados": 0, "rechazados": 1}
+
+
+def test_anillo_conserva_las_ultimas_fijaciones():
+    telemetria = _buffer()
+    # 6 fijaciones de "a" en desorden dentro del lote y luego 3 más: el anillo de 4 da la vuelta
+    telemetria.ingerir([0] * 6, [-2.0 - t / 10 for t in (5, 0, 3, 1, 4, 2)], [-79.0] * 6, [1] * 6, [5, 0, 3, 1, 4, 2])
+    assert telemetria.recorrido(0)["marca_tiempo"] == [2, 3, 4, 5]
+    for t in (6, 7, 8):
+        telemetria.ingerir([0], [-2.0], [-79.0], [1], [t])
+    recorrido = telemetria.recorrido(0)
+    assert recorrido["marca_tiempo"] == [5, 6, 7, 8]
+    assert telemetria.ultimas([0, 1])[3].tolist() == [8, 0]
+    assert telemetria.recorrido(1)["lat"] == []
+
+
+def test_registrar_crece_la_capacidad():
+    telemetria = _buffer()
+    filas = [telemetria.registrar(f"x{n}") for n in range(5)]
+    assert filas == [2, 3, 4, 5, 6]
+    assert telemetria.registrar("x0") == 2
+    telemetria.ingerir([6], [1.0], [2.0], [3], [4])
+    assert telemetria.recorrido(6)["lat"] == [1.0]
+
+
+def test_ingerir_descarta_marcas_de_tiempo_fuera_de_rango():
+    telemetria = _buffer()
+    marcas = [1e20, -1.0, math.inf, 253402300800.0, 1.7e9]
+    assert telemetria.ingerir([0] * 5, [-2.1] * 5, [-79.9] * 5, [0] * 5, marcas) == 1
+    assert telemetria.recorrido(0)["marca_tiempo"] == [1.7e9]
+
+
+def test_ingerir_ndjson_rechaza_indices_desbordados():
+    telemetria = _buffer()
+    datos = "\n".join([
+        '{"indice": 99999999999999999999999, "lat": -2.1, "lng": -79.9, "marca_tiempo": 1}',
+        '{"indice": -1, "lat": -2.1, "lng": -79.9, "marca_tiempo": 1}',
+        '{"indice": 1e999, "lat": -2.1, "lng": -79.9, "marca_tiempo": 1}',
+        '{"indice": 1, "lat": -2.1, "lng": -79.9, "marca_tiempo": 1}',
+    ])
+    assert telemetria.ingerir_ndjson(datos) == (1, 3)
+
+
+def test_marca_de_tiempo_desbordada_no_rompe_el_mapa(cliente):
+    datos = '{"indice": 0, "lat": -2.1, "lng": -79.9, "marca_tiempo": 1e20}\n'
+    assert cliente.post("/api/telemetria/lote", content=datos).json() == {"aceptados": 0, "rechazados": 1}
+    assert cliente.get("/api/ubicaciones-gps").status_code == 200
@@ -0,0 +1,53 @@
+from versiones import TRAMO_VERSIONES, RegistroVersiones, version_inicial
+
+
+def test_cambios_desde_una_version():
+    registro = RegistroVersiones()
+    v1 = registro.marcar(["a", "b"])
+    registro.marcar(["a"])
+    with registro.lote():
+        registro.marcar(["c"])
+        registro.marcar([], ["b"])
+    assert registro.version == v1 + 2
+    assert registro.cambios_desde(v1) == (["a", "c"], ["b"])
+    assert registro.cambios_desde(registro.version) == ([], [])
+    assert registro.cambios_desde(registro.version + 1) is None
+
+
+def test_sincronizar_solo_con_campos_relevantes():
+    registro = RegistroVersiones(campos=("lat",))
+    registro.sincronizar({"id": "a", "lat": 1, "otro": 1}, {"id": "a", "lat": 1, "otro": 2})
+    assert registro.version == 0
+    registro.sincronizar({"id": "a", "lat": 1}, {"id": "a", "lat": 2})
+    assert registro.cambios_desde(0) == (["a"], [])
+
+
+def test_horizonte_tras_compactar_lapidas():
+    registro = RegistroVersiones(max_lapidas=2)
+    inicial = registro.version
+    # Solo eliminaciones de ids distintos: el log nunca dobla a los vigentes
+    for n in range(5):
+        registro.marcar([], [f"e{n}"])
+    assert registro.horizonte > inicial
+    assert len(registro._lapidas) <= 2 * registro.max_lapidas
+    assert registro.cambios_desde(inicial) is None
+    assert registro.cambios_desde(registro.horizonte) is not None
+
+
+def test_desde_anterior_al_horizonte_responde_410(cliente):
+    # La numeración arranca al inicio de un tramo (>= 2**32): 0 queda bajo el horizonte
+    for ruta in ("/api/vehiculos", "/api/alertas", "/api/ubicaciones-gps"):
+        respuesta = cliente.get(ruta, params={"desde": 0})
+        assert respuesta.status_code == 410, ruta
+
+
+def test_version_de_otro_proceso_no_sirve_como_desde():
+    inicial = version_inicial()
+    assert inicial % TRAMO_VERSIONES == 0 and TRAMO_VERSIONES <= inicial < 2**53
+    propio = RegistroVersiones(inicial)
+    ajeno = RegistroVersiones(inicial + TRAMO_VERSIONES)
+    for n in range(5):
+        propio.marcar([f"v{n}"])
+        ajeno.marcar([f"v{n}"])
+    assert propio.cambios_desde(ajeno.version) is None
+    assert ajeno.cambios_desde(propio.version) is None